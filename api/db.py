@@ -4,11 +4,13 @@ Uses Supabase with the secret key for server-side operations.
 """
 
 import os
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from embedding_providers import to_pgvector
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -139,13 +141,51 @@ def search_documents_text(tenant_id: str, query_text: str, limit: int = 10) -> L
     return result.data
 
 
-def search_documents_semantic(tenant_id: str, embedding: List[float], threshold: float = 0.7, limit: int = 10) -> List[Dict[str, Any]]:
-    """Semantic search using vector embeddings."""
+def search_documents_semantic(
+    tenant_id: str,
+    embedding: Sequence[float],
+    threshold: float = 0.7,
+    limit: int = 10,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    app_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Semantic search within a tenant (and optionally one application).
+
+    ef_search / probes override the index defaults for this query; small
+    scopes are ranked exactly without the ANN index.
+    """
     result = supabase.rpc("search_documents", {
-        "query_embedding": embedding,
+        "query_embedding": to_pgvector(embedding),
+        "query_tenant_id": tenant_id,
+        "match_threshold": threshold,
+        "match_count": limit,
+        "ef_search": ef_search,
+        "probes": probes,
+        "query_app_id": app_id,
+    }).execute()
+    return result.data
+
+
+def search_document_chunks_semantic(
+    tenant_id: str,
+    embedding: Sequence[float],
+    threshold: float = 0.7,
+    limit: int = 10,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    app_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Semantic search over document passages; returns the matching passage, not the whole page."""
+    result = supabase.rpc("search_document_chunks", {
+        "query_embedding": to_pgvector(embedding),
         "query_tenant_id": tenant_id,
         "match_threshold": threshold,
-        "match_count": limit
+        "match_count": limit,
+        "ef_search": ef_search,
+        "probes": probes,
+        "query_app_id": app_id,
     }).execute()
     return result.data
 
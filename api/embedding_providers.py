@@ -0,0 +1,238 @@
+"""
+Knowledge Reset - Embedding Providers
+One interface for every embedding backend: Gemini, a local ONNX model on CPU, and a deterministic fake.
+
+The crawler and the API deploy from their own directories, so api/embedding_providers.py
+is an identical copy of crawler/embedding_providers.py; change both together.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from typing import Optional, Dict, List, Sequence, Union
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini").lower()  # gemini, local or fake
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))  # Must match the vector columns
+EMBEDDING_MAX_CHARS = 8000  # ~2048 tokens, the Gemini input limit
+
+# Local backend: a sentence-embedding model exported to ONNX, with its tokenizer.json
+EMBEDDING_LOCAL_MODEL_DIR = os.getenv("EMBEDDING_LOCAL_MODEL_DIR", "models/all-MiniLM-L6-v2")
+EMBEDDING_LOCAL_MAX_TOKENS = int(os.getenv("EMBEDDING_LOCAL_MAX_TOKENS", "256"))
+EMBEDDING_LOCAL_THREADS = int(os.getenv("EMBEDDING_LOCAL_THREADS", "0"))  # 0 lets onnxruntime decide
+
+
+def normalize_embedding(embedding: Sequence[float]) -> np.ndarray:
+    """Unit length, so cosine similarity is a dot product (Gemini only pre-normalizes 3072 dims)."""
+    embedding_array = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(embedding_array)
+    if norm == 0:
+        return embedding_array
+    return embedding_array / norm
+
+
+def fit_dimensions(embedding: Sequence[float], dimensions: int) -> np.ndarray:
+    """
+    Bring a vector to the stored size, then normalize it.
+
+    Longer vectors are truncated (Matryoshka-trained models keep their
+    quality); shorter ones are zero-padded, which leaves cosine
+    similarity between vectors of the same model unchanged.
+    """
+    embedding_array = np.asarray(embedding, dtype=np.float32)[:dimensions]
+    if len(embedding_array) < dimensions:
+        embedding_array = np.pad(embedding_array, (0, dimensions - len(embedding_array)))
+    return normalize_embedding(embedding_array)
+
+
+def to_pgvector(embedding: Sequence[float]) -> str:
+    """
+    pgvector text form ("[0.01234568,...]") at float32 precision.
+
+    About half the size of a JSON list of Python floats and twice as fast
+    to build; PostgREST passes it to vector and halfvec columns and
+    parameters unchanged.
+    """
+    return "[" + ",".join(["%.7g" % value for value in np.asarray(embedding, dtype=np.float32).tolist()]) + "]"
+
+
+def from_pgvector(value: Union[str, Sequence[float]]) -> np.ndarray:
+    """float32 vector from pgvector text, which is how PostgREST returns vector and halfvec columns."""
+    if isinstance(value, str):
+        return np.array(value[1:-1].split(","), dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+class EmbeddingProvider:
+    """
+    Base class: subclasses only implement _embed for one batch of non-empty,
+    truncated texts. embed() handles batching, truncation, empty texts
+    (zero vector, no request), dimensions and normalization, and returns
+    contiguous float32 arrays (6 KB per 1536-dim vector).
+    """
+
+    name = "base"
+    max_batch = 100
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model = self.name
+
+    def _embed(self, texts: List[str], task_type: str) -> List[Sequence[float]]:
+        raise NotImplementedError
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> List[np.ndarray]:
+        """Embeddings aligned with texts; raises if any provider request fails."""
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                embeddings[i] = np.zeros(self.dimensions, dtype=np.float32)
+            else:
+                pending.append((i, text[:EMBEDDING_MAX_CHARS]))
+
+        for start in range(0, len(pending), self.max_batch):
+            batch = pending[start:start + self.max_batch]
+            vectors = self._embed([text for _, text in batch], task_type)
+            for (i, _), vector in zip(batch, vectors):
+                embeddings[i] = fit_dimensions(vector, self.dimensions)
+        return embeddings
+
+    def embed_one(self, text: str, task_type: str = "retrieval_document") -> np.ndarray:
+        return self.embed([text], task_type)[0]
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        """True when the provider asks us to slow down (e.g. HTTP 429) rather than reporting a bad request."""
+        return False
+
+
+class GeminiProvider(EmbeddingProvider):
+    """Google Gemini gemini-embedding-001 through batchEmbedContents (up to 100 texts per request)."""
+
+    name = "gemini"
+    max_batch = 100
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        import google.generativeai as genai
+
+        super().__init__(dimensions)
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.genai = genai
+        self.model = "models/gemini-embedding-001"
+
+    def _embed(self, texts: List[str], task_type: str) -> List[Sequence[float]]:
+        result = self.genai.embed_content(
+            model=self.model,
+            content=texts,
+            task_type=task_type,
+            output_dimensionality=self.dimensions,
+        )
+        return result["embedding"]
+
+    def is_rate_limited(self, error: Exception) -> bool:
+        from google.api_core import exceptions as google_exceptions
+
+        return isinstance(error, google_exceptions.TooManyRequests) or "429" in str(error)
+
+
+class LocalProvider(EmbeddingProvider):
+    """
+    Sentence-embedding model run on CPU with onnxruntime (e.g. all-MiniLM-L6-v2).
+
+    EMBEDDING_LOCAL_MODEL_DIR holds model.onnx and tokenizer.json as
+    exported by Hugging Face Optimum. Token embeddings are mean-pooled
+    over the attention mask; models that already output a pooled
+    sentence embedding are used as is. Needs the optional onnxruntime
+    and tokenizers packages; no network access at all.
+    """
+
+    name = "local"
+    max_batch = 32
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS, model_dir: str = EMBEDDING_LOCAL_MODEL_DIR):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_PROVIDER=local needs onnxruntime and tokenizers (pip install onnxruntime tokenizers)") from e
+
+        super().__init__(dimensions)
+        options = onnxruntime.SessionOptions()
+        if EMBEDDING_LOCAL_THREADS:
+            options.intra_op_num_threads = EMBEDDING_LOCAL_THREADS
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_LOCAL_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+        self.lock = threading.Lock()  # The tokenizer's padding/truncation state is shared
+        self.model = f"local/{os.path.basename(os.path.normpath(model_dir))}"
+
+    def _embed(self, texts: List[str], task_type: str) -> List[Sequence[float]]:
+        with self.lock:
+            encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        outputs = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})
+        hidden = outputs[0]
+        if hidden.ndim == 2:
+            return list(hidden)
+
+        mask = inputs["attention_mask"][:, :, None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return list(pooled)
+
+
+class FakeProvider(EmbeddingProvider):
+    """
+    Deterministic, offline embeddings for tests, benchmarks and load tests.
+
+    Words are hashed into buckets (feature hashing) with a signed weight,
+    so the same text always gets the same vector and texts that share
+    words are similar, which keeps search results meaningful.
+    """
+
+    name = "fake"
+    max_batch = 1000
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        super().__init__(dimensions)
+        self.model = "fake/hashed-words-v1"
+
+    def _embed(self, texts: List[str], task_type: str) -> List[Sequence[float]]:
+        vectors = []
+        for text in texts:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+            vectors.append(vector)
+        return vectors
+
+
+PROVIDERS = {"gemini": GeminiProvider, "local": LocalProvider, "fake": FakeProvider}
+
+_providers: Dict[str, EmbeddingProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """Shared provider instance for name (default EMBEDDING_PROVIDER), created on first use."""
+    name = (name or EMBEDDING_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER: {name} (expected one of {', '.join(PROVIDERS)})")
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = PROVIDERS[name]()
+        return _providers[name]
@@ -6,10 +6,8 @@ Query and Mutation resolvers for the GraphQL API.
 import os
 import httpx
 import strawberry
-from typing import Optional, List
+from typing import Optional, List, Sequence
 from strawberry.types import Info
-import google.generativeai as genai
-import numpy as np
 from dotenv import load_dotenv
 
 from schema import (
@@ -20,19 +18,16 @@ from schema import (
 from db import (
     get_tenant, list_tenants, create_tenant,
     get_application, list_applications, create_application, delete_application,
-    get_document, list_documents, search_documents_text, search_documents_semantic,
+    get_document, list_documents, search_documents_text, search_documents_semantic, search_document_chunks_semantic,
     get_crawl_job, list_crawl_jobs, create_crawl_job, create_audit_log, list_users, create_user, update_user, delete_user,
     get_crawler_settings, update_crawler_setting, get_setting_value,
     get_user_role, assign_role, list_roles, create_role
 )
 from auth import AuthContext
+from embedding_providers import get_provider
 
 load_dotenv()
 
-# Google Gemini client for embeddings
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-EMBEDDING_MODEL = "models/gemini-embedding-001"
-OUTPUT_DIMENSIONS = 1536
 CRAWLER_URL = os.getenv("CRAWLER_URL", "https://knowledge-reset-crawler-639493422168.us-west1.run.app").strip()
 
 
@@ -42,28 +37,13 @@ def get_auth(info: Info) -> AuthContext:
     return getattr(request.state, "auth", AuthContext())
 
 
-def normalize_embedding(embedding: List[float]) -> List[float]:
-    """Normalize embedding for accurate cosine similarity."""
-    embedding_array = np.array(embedding)
-    norm = np.linalg.norm(embedding_array)
-    if norm == 0:
-        return embedding
-    return (embedding_array / norm).tolist()
-
-
-def generate_embedding(text: str) -> List[float]:
-    """Generate embedding for search query using Google Gemini."""
+def generate_embedding(text: str) -> Sequence[float]:
+    """Generate embedding for search query with the configured provider (must match the crawler's)."""
     try:
-        result = genai.embed_content(
-            model=EMBEDDING_MODEL,
-            content=text[:8000],  # Truncate if too long
-            task_type="retrieval_query",  # Optimized for queries
-            output_dimensionality=OUTPUT_DIMENSIONS
-        )
-        # Normalize for accurate cosine similarity
-        return normalize_embedding(result['embedding'])
+        # retrieval_query is optimized for queries; truncation and normalization happen in the provider
+        return get_provider().embed_one(text, "retrieval_query")
     except Exception as e:
-        print(f"DEBUG: Gemini embedding generation failed: {str(e)}")
+        print(f"DEBUG: Query embedding generation failed: {str(e)}")
         raise e
 
 
@@ -161,15 +141,24 @@ class Query:
         if not auth.is_authenticated or not auth.tenant_id:
             raise Exception(f"Tenant context required: {auth.error or 'Missing tenant_id'}")
         
+        if input.ef_search is not None and not 1 <= input.ef_search <= 1000:
+            raise Exception("ef_search must be between 1 and 1000")
+        if input.probes is not None and input.probes < 1:
+            raise Exception("probes must be at least 1")
+        
         # Generate embedding for query
         embedding = generate_embedding(input.query)
         
-        # Semantic search
-        results = search_documents_semantic(
+        # Semantic search (over passages when requested)
+        search = search_document_chunks_semantic if input.passages else search_documents_semantic
+        results = search(
             auth.tenant_id,
             embedding,
             threshold=0.5,
-            limit=input.limit
+            limit=input.limit,
+            ef_search=input.ef_search,
+            probes=input.probes,
+            app_id=str(input.app_id) if input.app_id else None,
         )
         
         # Log search
@@ -178,15 +167,45 @@ class Query:
             action="search",
             tenant_id=auth.tenant_id,
             actor_id=auth.user_id,
-            metadata={"query_length": len(input.query), "results_count": len(results)}
+            metadata={
+                "query_length": len(input.query),
+                "results_count": len(results),
+                "passages": input.passages,
+                "app_id": str(input.app_id) if input.app_id else None,
+            }
         )
         
+        if input.passages:
+            return [
+                SearchResult(
+                    document=Document(
+                        id=r["document_id"],
+                        tenant_id=auth.tenant_id,
+                        app_id=r["app_id"],
+                        job_id=None,
+                        parent_id=None,
+                        title=r["title"],
+                        content_text=None,  # The passage stands in for the whole page
+                        source_url=r["source_url"],
+                        breadcrumbs=[],
+                        created_at=None,
+                        updated_at=None,
+                    ),
+                    score=r["similarity"],
+                    passage=r["content_text"],
+                    heading_path=r.get("heading_path") or [],
+                    anchor=r.get("anchor"),
+                )
+                for r in results
+            ]
+        
         return [
             SearchResult(
                 document=Document(
                     id=r["id"],
                     tenant_id=auth.tenant_id,
-                    app_id="",  # Not returned by search function
+                    app_id=r["app_id"],
+                    job_id=None,
                     parent_id=None,
                     title=r["title"],
                     content_text=r.get("content_text"),
@@ -444,7 +463,8 @@ class Mutation:
         max_depth: int = 3,
         max_pages: int = 10000,
         timeout_ms: int = 30000,
-        max_runtime_seconds: int = 3600
+        max_runtime_seconds: int = 3600,
+        concurrency: int = 4
     ) -> CrawlResponse:
         """Start a crawl job for an application."""
         auth = get_auth(info)
@@ -471,7 +491,8 @@ class Mutation:
                         "max_depth": max_depth,
                         "max_pages": max_pages,
                         "timeout_ms": timeout_ms,
-                        "max_runtime_seconds": max_runtime_seconds
+                        "max_runtime_seconds": max_runtime_seconds,
+                        "concurrency": concurrency
                     },
                     timeout=30.0
                 )
@@ -131,6 +131,10 @@ class Document:
 class SearchResult:
     document: Document
     score: float
+    # Set for passage search: the matching chunk and where it sits on the page
+    passage: Optional[str] = None
+    heading_path: Optional[List[str]] = None
+    anchor: Optional[str] = None
 
 
 @strawberry.type
@@ -303,8 +307,11 @@ class CreateApplicationInput:
 @strawberry.input
 class SearchInput:
     query: str
-    app_id: Optional[strawberry.ID] = None
+    app_id: Optional[strawberry.ID] = None  # Only this application's documents
     limit: int = 10
+    passages: bool = False  # Match heading-aware chunks and return the passage instead of content_text
+    ef_search: Optional[int] = None  # HNSW candidates per query (1-1000, default 40): higher is better recall, slower
+    probes: Optional[int] = None  # ivfflat lists scanned, for indexes still on ivfflat
 
 
 @strawberry.input
@@ -0,0 +1,201 @@
+"""
+Knowledge Reset Crawler - Extractor Benchmark
+Times the extractors on the saved page corpus in bench/corpus and checks their output against bench/golden.
+
+Usage:
+    python bench_extractors.py                  # golden check + timings
+    python bench_extractors.py --check          # golden check only (exit 1 on any difference)
+    python bench_extractors.py --update-golden  # accept the current output as golden
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Optional, Dict, Any, List, Callable
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+from extractors import (
+    extract_title,
+    extract_breadcrumbs,
+    extract_main_content,
+    extract_internal_links,
+    extract_metadata,
+    extract_page,
+)
+from parse_pool import parse_page
+
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench")
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+
+# Golden fields; content_html is covered by content_hash
+GOLDEN_FIELDS = ["title", "breadcrumbs", "content_text", "content_hash", "links", "metadata"]
+
+
+def load_corpus(names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    with open(os.path.join(CORPUS_DIR, "manifest.json")) as f:
+        pages = json.load(f)
+    if names:
+        pages = [page for page in pages if page["name"] in names]
+    for page in pages:
+        with open(os.path.join(CORPUS_DIR, page["file"]), encoding="utf-8") as f:
+            page["html"] = f.read()
+        page["allowed_domain"] = urlparse(page["url"]).netloc
+    return pages
+
+
+def golden_output(page: Dict[str, Any]) -> Dict[str, Any]:
+    """What the crawler stores for a page (parse_page is what build_result runs)."""
+    result = parse_page(page["html"], page["url"], page["allowed_domain"])
+    result["links"] = sorted(result["links"])
+    return {field: result[field] for field in GOLDEN_FIELDS}
+
+
+def legacy_output(page: Dict[str, Any]) -> Dict[str, Any]:
+    """Same fields through the individual extract_* functions, in the crawler's original order."""
+    soup = BeautifulSoup(page["html"], "lxml")
+    title = extract_title(soup)
+    breadcrumbs = extract_breadcrumbs(soup, page["url"])
+    content_text, content_html = extract_main_content(soup)
+    links = extract_internal_links(soup, page["url"], page["allowed_domain"])
+    return {
+        "title": title,
+        "breadcrumbs": breadcrumbs,
+        "content_text": content_text,
+        "content_hash": hashlib.sha256(content_html.encode()).hexdigest(),
+        "links": sorted(links),
+        "metadata": extract_metadata(soup),
+    }
+
+
+def golden_path(page: Dict[str, Any]) -> str:
+    return os.path.join(GOLDEN_DIR, f"{page['name']}.json")
+
+
+def check_golden(pages: List[Dict[str, Any]]) -> List[str]:
+    """Compare engine and legacy output with the stored golden files; returns failure descriptions."""
+    failures = []
+    for page in pages:
+        try:
+            with open(golden_path(page)) as f:
+                expected = json.load(f)
+        except FileNotFoundError:
+            failures.append(f"{page['name']}: no golden file (run with --update-golden)")
+            continue
+
+        for label, actual in (("engine", golden_output(page)), ("legacy", legacy_output(page))):
+            for field in GOLDEN_FIELDS:
+                if actual[field] != expected.get(field):
+                    failures.append(f"{page['name']}: {label} {field} differs from golden")
+    return failures
+
+
+def update_golden(pages: List[Dict[str, Any]]) -> None:
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    for page in pages:
+        with open(golden_path(page), "w", encoding="utf-8") as f:
+            json.dump(golden_output(page), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"Updated {golden_path(page)}")
+
+
+def measure(fn: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    """Median wall time (ms) over iterations, then peak traced allocation (KB) of one more call."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ms": statistics.median(timings), "peak_kb": peak / 1024}
+
+
+def benchmark_page(page: Dict[str, Any], iterations: int) -> Dict[str, Dict[str, float]]:
+    """Per-stage cost for one page; each extractor gets a freshly parsed tree, as in a crawl."""
+    html, url, domain = page["html"], page["url"], page["allowed_domain"]
+    stages = {
+        "title": lambda soup: extract_title(soup),
+        "breadcrumbs": lambda soup: extract_breadcrumbs(soup, url),
+        "main_content": lambda soup: extract_main_content(soup),
+        "links": lambda soup: extract_internal_links(soup, url, domain),
+        "metadata": lambda soup: extract_metadata(soup),
+        "extract_page": lambda soup: extract_page(soup, url, domain),
+    }
+
+    results = {"parse": measure(lambda: BeautifulSoup(html, "lxml"), iterations)}
+    for name, extractor in stages.items():
+        # Parse outside the timed region so each stage reports only its own cost
+        soups = [BeautifulSoup(html, "lxml") for _ in range(iterations + 1)]
+        results[name] = measure(lambda: extractor(soups.pop()), iterations)
+    results["legacy_total"] = {
+        "ms": sum(results[name]["ms"] for name in ("title", "breadcrumbs", "main_content", "links", "metadata")),
+        "peak_kb": max(results[name]["peak_kb"] for name in ("title", "breadcrumbs", "main_content", "links", "metadata")),
+    }
+    return results
+
+
+def print_table(pages: List[Dict[str, Any]], results: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    stages = ["parse", "title", "breadcrumbs", "main_content", "links", "metadata", "legacy_total", "extract_page"]
+    print(f"{'page':<18}{'KB':>7}  " + "".join(f"{stage:>14}" for stage in stages))
+    for page in pages:
+        row = results[page["name"]]
+        cells = "".join(f"{row[stage]['ms']:>9.2f} ms  " for stage in stages)
+        print(f"{page['name']:<18}{len(page['html']) / 1024:>7.1f}  {cells}")
+    print()
+    print(f"{'peak alloc (KB)':<27}" + "".join(f"{stage:>14}" for stage in stages))
+    for page in pages:
+        row = results[page["name"]]
+        print(f"{page['name']:<27}" + "".join(f"{row[stage]['peak_kb']:>14.0f}" for stage in stages))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark and regression-check the content extractors")
+    parser.add_argument("pages", nargs="*", help="Corpus page names (default: all)")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed runs per stage and page")
+    parser.add_argument("--check", action="store_true", help="Only run the golden-output check")
+    parser.add_argument("--update-golden", action="store_true", help="Write current output as the golden files")
+    parser.add_argument("--json", metavar="PATH", help="Also write timings to a JSON file for comparing runs")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.pages)
+    if not pages:
+        sys.exit("No corpus pages matched")
+
+    if args.update_golden:
+        update_golden(pages)
+        return
+
+    failures = check_golden(pages)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"Golden check: {len(pages) - len({f.split(':')[0] for f in failures})}/{len(pages)} pages match")
+    if args.check:
+        sys.exit(1 if failures else 0)
+
+    print()
+    results = {page["name"]: benchmark_page(page, args.iterations) for page in pages}
+    print_table(pages, results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
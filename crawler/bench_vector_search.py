@@ -0,0 +1,127 @@
+"""
+Knowledge Reset Crawler - Vector Search Benchmark
+Measures recall@k and latency of the serving search against exact search for one tenant's (or app's) vectors.
+
+Usage:
+    python bench_vector_search.py --tenant-id ID                           # documents, ef_search 40,100,200,400
+    python bench_vector_search.py --tenant-id ID --passages --k 20          # document_chunks
+    python bench_vector_search.py --tenant-id ID --ef-search "" --probes 1,10,30  # indexes still on ivfflat
+    python bench_vector_search.py --tenant-id ID --queries queries.txt      # embed real queries (one per line)
+    python bench_vector_search.py --tenant-id ID --app-id ID                # one app
+    python bench_vector_search.py --tenant-id ID --exact-max-rows 10000     # as served: small scopes ranked exactly
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Optional, Dict, Any, List, Callable
+
+from db import sample_embeddings, search_vectors, search_vectors_exact
+from embedding_providers import get_provider, to_pgvector
+
+
+def result_key(row: Dict[str, Any], passages: bool) -> tuple:
+    """Identity of a hit; search_documents returns id, search_vectors_exact document_id."""
+    if passages:
+        return (row["document_id"], row["chunk_index"])
+    return (row.get("id") or row["document_id"],)
+
+
+def timed(fn: Callable[[], List[Dict[str, Any]]]) -> tuple:
+    start = time.perf_counter()
+    rows = fn()
+    return rows, (time.perf_counter() - start) * 1000
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def load_queries(args: argparse.Namespace) -> List[str]:
+    """Query vectors as pgvector text: embedded query lines, or stored vectors sampled from the tenant."""
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        embeddings = get_provider().embed(lines[:args.count], "retrieval_query")
+        return [to_pgvector(embedding) for embedding in embeddings]
+    # A stored vector always finds itself; recall then measures the other k - 1 neighbours
+    return sample_embeddings(args.tenant_id, args.count, args.passages, args.app_id)
+
+
+def run_setting(
+    queries: List[str],
+    exact: List[set],
+    args: argparse.Namespace,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Dict[str, float]:
+    recalls, timings = [], []
+    for query, expected in zip(queries, exact):
+        rows, ms = timed(lambda: search_vectors(
+            query, args.tenant_id, args.k, args.passages, ef_search, probes, args.app_id, args.exact_max_rows
+        ))
+        timings.append(ms)
+        if expected:
+            found = {result_key(row, args.passages) for row in rows}
+            recalls.append(len(found & expected) / len(expected))
+    return {
+        "recall": statistics.mean(recalls) if recalls else 0.0,
+        "min_recall": min(recalls) if recalls else 0.0,
+        "p50_ms": statistics.median(timings),
+        "p95_ms": percentile(timings, 0.95),
+    }
+
+
+def parse_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ANN vector search recall@k and latency against exact search")
+    parser.add_argument("--tenant-id", required=True, help="Tenant whose vectors are searched")
+    parser.add_argument("--app-id", help="Only this application's vectors")
+    parser.add_argument("--passages", action="store_true", help="Search document_chunks instead of documents")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--count", type=int, default=50, help="Number of queries")
+    parser.add_argument("--queries", metavar="PATH", help="Text file of queries to embed (default: sample stored vectors)")
+    parser.add_argument("--ef-search", type=parse_list, default=[40, 100, 200, 400], help="Comma-separated hnsw.ef_search values")
+    parser.add_argument("--probes", type=parse_list, default=[], help="Comma-separated ivfflat.probes values")
+    parser.add_argument("--exact-max-rows", type=int, default=0, help="Scope size ranked exactly (default 0: always measure the ANN index)")
+    parser.add_argument("--json", metavar="PATH", help="Also write results to a JSON file for comparing runs")
+    args = parser.parse_args()
+
+    queries = load_queries(args)
+    if not queries:
+        sys.exit("No vectors found for this tenant")
+
+    exact, exact_timings = [], []
+    for query in queries:
+        rows, ms = timed(lambda: search_vectors_exact(query, args.tenant_id, args.k, args.passages, args.app_id))
+        exact.append({result_key(row, args.passages) for row in rows})
+        exact_timings.append(ms)
+
+    settings = [("ef_search", value) for value in args.ef_search] + [("probes", value) for value in args.probes]
+    results: Dict[str, Dict[str, float]] = {}
+    for knob, value in settings:
+        options = {"ef_search": value} if knob == "ef_search" else {"probes": value}
+        results[f"{knob}={value}"] = run_setting(queries, exact, args, **options)
+
+    target = "document_chunks" if args.passages else "documents"
+    scope = f"app {args.app_id}" if args.app_id else f"tenant {args.tenant_id}"
+    print(f"{len(queries)} queries, k={args.k}, {target} of {scope}")
+    print(f"{'setting':<16}{f'recall@{args.k}':>11}{'min':>8}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, row in results.items():
+        print(f"{name:<16}{row['recall']:>11.3f}{row['min_recall']:>8.2f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}")
+    print(f"{'exact':<16}{1.0:>11.3f}{1.0:>8.2f}{statistics.median(exact_timings):>10.1f}{percentile(exact_timings, 0.95):>10.1f}")
+
+    if args.json:
+        results["exact"] = {"p50_ms": statistics.median(exact_timings), "p95_ms": percentile(exact_timings, 0.95)}
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
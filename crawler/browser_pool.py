@@ -0,0 +1,197 @@
+"""
+Knowledge Reset Crawler - Shared Browser Pool
+Long-lived Chromium owned by the service; crawl jobs lease isolated browser contexts from it.
+"""
+
+import asyncio
+import os
+from typing import Optional, Dict, Any, List
+
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+
+BROWSER_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+]
+
+# Recycle the browser after it has rendered this many pages or the process tree exceeds this RSS
+RECYCLE_AFTER_PAGES = int(os.getenv("BROWSER_RECYCLE_PAGES", "2000"))
+RECYCLE_RSS_MB = int(os.getenv("BROWSER_RECYCLE_RSS_MB", "1500"))
+RSS_CHECK_PAGES = 25  # Memory is sampled every this many pages; walking /proc per page costs too much
+
+
+def process_tree_rss_mb() -> Optional[float]:
+    """Resident memory of this process and all its descendants (Linux /proc), in MB."""
+    try:
+        parents: Dict[int, int] = {}
+        rss_pages: Dict[int, int] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # Fields after the parenthesised command name: state ppid ... (rss is field 24)
+                    fields = f.read().rsplit(")", 1)[1].split()
+                parents[int(entry)] = int(fields[1])
+                rss_pages[int(entry)] = int(fields[21])
+            except (OSError, IndexError, ValueError):
+                continue
+    except OSError:
+        return None
+
+    root = os.getpid()
+    tree = {root}
+    changed = True
+    while changed:
+        changed = False
+        for pid, ppid in parents.items():
+            if ppid in tree and pid not in tree:
+                tree.add(pid)
+                changed = True
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    return sum(rss_pages.get(pid, 0) for pid in tree) * page_size / (1024 * 1024)
+
+
+class PooledBrowser:
+    """A launched browser plus its lease bookkeeping."""
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.active_leases = 0
+        self.pages_rendered = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """
+    Keeps one warm Chromium for the whole service.
+
+    Each job gets its own BrowserContext (separate cookies, cache and
+    routes) instead of launching a browser. When the current browser has
+    rendered RECYCLE_AFTER_PAGES pages or memory passes RECYCLE_RSS_MB,
+    it is retired: new leases go to a freshly launched browser, jobs move
+    their pages to a new lease (see is_retired), and the old browser is
+    closed once its last lease is returned, also in the middle of a job.
+    """
+
+    def __init__(self, recycle_after_pages: int = RECYCLE_AFTER_PAGES, recycle_rss_mb: int = RECYCLE_RSS_MB):
+        self.recycle_after_pages = recycle_after_pages
+        self.recycle_rss_mb = recycle_rss_mb
+        self.playwright = None
+        self.current: Optional[PooledBrowser] = None
+        self.browsers: List[PooledBrowser] = []
+        self.leases: Dict[BrowserContext, PooledBrowser] = {}
+        self.lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Start Playwright and launch the first browser."""
+        async with self.lock:
+            await self._ensure_browser()
+
+    async def _ensure_browser(self) -> PooledBrowser:
+        if self.playwright is None:
+            print("DEBUG: Starting Playwright for browser pool")
+            self.playwright = await async_playwright().start()
+
+        if self.current is None or self.current.retired or not self.current.browser.is_connected():
+            print("DEBUG: Launching pooled browser")
+            browser = await self.playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+            self.current = PooledBrowser(browser)
+            self.browsers.append(self.current)
+            print(f"DEBUG: Pooled browser launched ({len(self.browsers)} active)")
+        return self.current
+
+    def _needs_recycle(self, pooled: PooledBrowser) -> bool:
+        if pooled.pages_rendered >= self.recycle_after_pages:
+            return True
+        rss = process_tree_rss_mb()
+        return rss is not None and rss > self.recycle_rss_mb
+
+    def _retire(self, pooled: PooledBrowser) -> None:
+        if not pooled.retired:
+            print(f"DEBUG: Recycling pooled browser after {pooled.pages_rendered} pages")
+            pooled.retired = True
+
+    async def _close_if_idle(self, pooled: PooledBrowser) -> None:
+        if pooled.retired and pooled.active_leases == 0:
+            if pooled in self.browsers:
+                self.browsers.remove(pooled)
+            try:
+                await pooled.browser.close()
+            except Exception as e:
+                print(f"DEBUG: Error closing retired browser: {str(e)}")
+            print(f"DEBUG: Retired pooled browser closed after {pooled.pages_rendered} pages")
+
+    async def lease_context(self, **context_options: Any) -> BrowserContext:
+        """Create an isolated context on the current browser for one crawl job."""
+        async with self.lock:
+            pooled = await self._ensure_browser()
+            if pooled.pages_rendered and self._needs_recycle(pooled):
+                self._retire(pooled)
+                await self._close_if_idle(pooled)
+                pooled = await self._ensure_browser()
+
+            context = await pooled.browser.new_context(**context_options)
+            pooled.active_leases += 1
+            self.leases[context] = pooled
+            return context
+
+    def record_page(self, context: BrowserContext) -> None:
+        """Count a page rendered through a leased context, retiring its browser once it is due for recycling."""
+        pooled = self.leases.get(context)
+        if pooled is None:
+            return
+        pooled.pages_rendered += 1
+        if pooled.retired:
+            return
+        if pooled.pages_rendered >= self.recycle_after_pages or (
+            pooled.pages_rendered % RSS_CHECK_PAGES == 0 and self._needs_recycle(pooled)
+        ):
+            self._retire(pooled)
+
+    def is_retired(self, context: BrowserContext) -> bool:
+        """True once the context's browser is being recycled: the job should lease a new context and close this one."""
+        pooled = self.leases.get(context)
+        return pooled is not None and pooled.retired
+
+    async def release_context(self, context: BrowserContext) -> None:
+        """Close a leased context and retire its browser if it is due for recycling."""
+        try:
+            await context.close()
+        except Exception as e:
+            print(f"DEBUG: Error closing leased context: {str(e)}")
+
+        async with self.lock:
+            pooled = self.leases.pop(context, None)
+            if pooled is None:
+                return
+            pooled.active_leases -= 1
+            if pooled is not self.current or (pooled.pages_rendered and self._needs_recycle(pooled)):
+                self._retire(pooled)
+            await self._close_if_idle(pooled)
+
+    async def stop(self) -> None:
+        """Close every browser and stop Playwright (service shutdown)."""
+        async with self.lock:
+            for pooled in list(self.browsers):
+                try:
+                    await pooled.browser.close()
+                except Exception:
+                    pass
+            self.browsers = []
+            self.current = None
+            self.leases = {}
+            if self.playwright:
+                await self.playwright.stop()
+                self.playwright = None
+            print("DEBUG: Browser pool stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "browsers": len(self.browsers),
+            "active_leases": sum(p.active_leases for p in self.browsers),
+            "pages_rendered": self.current.pages_rendered if self.current else 0,
+            "rss_mb": process_tree_rss_mb(),
+        }
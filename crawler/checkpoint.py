@@ -0,0 +1,115 @@
+"""
+Knowledge Reset Crawler - Crawl Checkpoints
+Periodic, incremental snapshots of the frontier so bounded or interrupted crawls can resume where they stopped.
+"""
+
+import base64
+import gzip
+import json
+import time
+from typing import Optional, Dict, List, Set, Tuple
+
+from db import insert_crawl_checkpoint, list_crawl_checkpoints, get_latest_checkpoint
+
+
+CHECKPOINT_INTERVAL_SECONDS = 60
+
+
+def encode_payload(added: List[list], done: List[str]) -> str:
+    """Compress a checkpoint delta for storage."""
+    raw = json.dumps({"added": added, "done": done}, separators=(",", ":")).encode()
+    return base64.b64encode(gzip.compress(raw)).decode()
+
+
+def decode_payload(payload: str) -> Dict[str, list]:
+    return json.loads(gzip.decompress(base64.b64decode(payload)))
+
+
+class CheckpointState:
+    """Frontier state rebuilt from a job's checkpoint rows."""
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.added: Dict[str, Tuple[int, Optional[float]]] = {}  # url -> (depth, sitemap priority)
+        self.done: Set[str] = set()
+        self.max_seq = -1  # Highest seq read; a job resuming itself continues after it
+
+    @property
+    def pending(self) -> List[Tuple[str, int, Optional[float]]]:
+        """URLs that were queued (or in flight) but never finished, shallowest first."""
+        remaining = [(url, depth, priority) for url, (depth, priority) in self.added.items() if url not in self.done]
+        return sorted(remaining, key=lambda item: item[1])
+
+
+class CrawlCheckpointer:
+    """
+    Buffers frontier changes and writes them as delta rows.
+
+    Only URLs added to the frontier and URLs finished since the last flush
+    are written, so each checkpoint costs O(pages since last checkpoint)
+    regardless of how large the crawl has grown.
+    """
+
+    def __init__(self, job_id: str, app_id: str, interval_seconds: int = CHECKPOINT_INTERVAL_SECONDS):
+        self.job_id = job_id
+        self.app_id = app_id
+        self.interval_seconds = interval_seconds
+        self.seq = 0
+        self.added: List[list] = []
+        self.done: List[str] = []
+        self.last_flush = time.time()
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0
+
+    def record_added(self, url: str, depth: int, sitemap_priority: Optional[float] = None) -> None:
+        if self.enabled:
+            self.added.append([url, depth, sitemap_priority])
+
+    def record_done(self, url: str) -> None:
+        if self.enabled:
+            self.done.append(url)
+
+    def due(self) -> bool:
+        return self.enabled and time.time() - self.last_flush >= self.interval_seconds
+
+    def flush(self, final: bool = False) -> None:
+        """Write buffered changes (final marks the crawl as drained: nothing left to resume)."""
+        if not self.enabled or (not self.added and not self.done and not final):
+            return
+
+        added, done = self.added, self.done
+        self.added, self.done = [], []
+        self.last_flush = time.time()
+        try:
+            insert_crawl_checkpoint(self.job_id, self.app_id, self.seq, encode_payload(added, done), final)
+            self.seq += 1
+            print(f"DEBUG: Checkpoint {self.seq} for job {self.job_id}: +{len(added)} queued, {len(done)} done")
+        except Exception as e:
+            # Keep the delta for the next attempt rather than losing it
+            self.added, self.done = added + self.added, done + self.done
+            print(f"DEBUG: Checkpoint write failed for job {self.job_id}: {str(e)}")
+
+
+def load_checkpoint(job_id: str) -> Optional[CheckpointState]:
+    """Rebuild frontier state from all checkpoint rows of a job."""
+    rows = list_crawl_checkpoints(job_id)
+    if not rows:
+        return None
+
+    state = CheckpointState(job_id)
+    for row in rows:
+        delta = decode_payload(row["payload"])
+        for url, depth, priority in delta["added"]:
+            state.added.setdefault(url, (depth, priority))
+        state.done.update(delta["done"])
+        state.max_seq = max(state.max_seq, row["seq"])
+    return state
+
+
+def find_resumable_job(app_id: str) -> Optional[str]:
+    """Job id of the app's most recent checkpointed crawl, unless that crawl drained its queue."""
+    latest = get_latest_checkpoint(app_id)
+    if not latest or latest.get("is_final"):
+        return None
+    return latest["job_id"]
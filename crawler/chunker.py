@@ -0,0 +1,158 @@
+"""
+Knowledge Reset Crawler - Heading-Aware Chunking
+Splits a page's cleaned content into passages along its headings so long pages are indexed end to end.
+"""
+
+import hashlib
+import os
+from typing import Optional, Dict, Any, List
+
+from bs4 import BeautifulSoup, NavigableString, CData, Tag
+
+
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "2000"))  # Passage size; well under the 8,000-character embedding input
+CHUNK_MIN_CHARS = int(os.getenv("CHUNK_MIN_CHARS", "200"))  # Shorter sections are folded into the previous passage
+
+HEADING_LEVELS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+HEADING_MARKS = "¶#§ \n\t"  # Permalink glyphs that Sphinx, MkDocs and friends append to headings
+
+
+class Section:
+    """Text between one heading and the next, with the headings above it."""
+
+    def __init__(self, heading_path: List[str], anchor: Optional[str]):
+        self.heading_path = heading_path
+        self.anchor = anchor
+        self.lines: List[str] = []
+
+    def size(self) -> int:
+        return sum(len(line) + 1 for line in self.lines)
+
+
+def _heading_anchor(heading: Tag) -> Optional[str]:
+    """Fragment that links to a heading: its id, a named anchor inside it, or its <section>'s id."""
+    if heading.get("id"):
+        return heading["id"]
+    inner = heading.find(lambda el: el.name == "a" and (el.get("id") or el.get("name")))
+    if inner:
+        return inner.get("id") or inner.get("name")
+    parent = heading.parent
+    if parent is not None and parent.name in ("section", "div") and parent.get("id"):
+        return parent["id"]
+    return None
+
+
+def split_sections(content_html: str) -> List[Section]:
+    """Walk the content's text in document order, starting a section at every heading."""
+    soup = BeautifulSoup(content_html, "lxml")
+    path: List[tuple[int, str]] = []
+    sections = [Section([], None)]
+    heading_strings: set = set()  # ids of the current heading's own strings
+
+    for element in soup.descendants:
+        if isinstance(element, Tag):
+            level = HEADING_LEVELS.get(element.name)
+            if level is None:
+                continue
+            text = element.get_text(" ", strip=True).strip(HEADING_MARKS)
+            if not text:
+                continue
+            path = [entry for entry in path if entry[0] < level] + [(level, text)]
+            sections.append(Section([entry[1] for entry in path], _heading_anchor(element)))
+            sections[-1].lines.append(text)
+            heading_strings = {id(string) for string in element.strings}
+            continue
+
+        # Same strings get_text() uses for content_text (no comments, scripts or styles)
+        if type(element) not in (NavigableString, CData):
+            continue
+        if id(element) in heading_strings:
+            continue  # Already recorded as the section's heading line
+        line = element.strip()
+        if line:
+            sections[-1].lines.append(line)
+
+    return [section for section in sections if section.lines]
+
+
+def _split_long_line(line: str, max_chars: int) -> List[str]:
+    """Break an oversized line (e.g. a minified code block) on whitespace, or hard if there is none."""
+    pieces = []
+    while len(line) > max_chars:
+        cut = line.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(line[:cut].strip())
+        line = line[cut:].strip()
+    if line:
+        pieces.append(line)
+    return pieces
+
+
+def _pack_lines(lines: List[str], max_chars: int) -> List[List[str]]:
+    """Group lines into runs of at most max_chars, never splitting a line that fits."""
+    runs: List[List[str]] = [[]]
+    size = 0
+    for line in lines:
+        for piece in _split_long_line(line, max_chars):
+            if runs[-1] and size + len(piece) + 1 > max_chars:
+                runs.append([])
+                size = 0
+            runs[-1].append(piece)
+            size += len(piece) + 1
+    return [run for run in runs if run]
+
+
+def chunk_text(title: str, heading_path: List[str], text: str) -> str:
+    """What gets embedded for a passage: the page title and heading trail give it context."""
+    context = " > ".join([title] + [heading for heading in heading_path if heading != title])
+    return f"{context}\n\n{text}"
+
+
+def chunk_content(
+    content_html: str,
+    title: str,
+    max_chars: int = CHUNK_MAX_CHARS,
+    min_chars: int = CHUNK_MIN_CHARS,
+) -> List[Dict[str, Any]]:
+    """
+    Passages of a page, in order.
+
+    Each section becomes one passage; sections larger than max_chars are
+    split on line boundaries, and sections smaller than min_chars are
+    appended to the previous passage when it has room. content_hash
+    covers the embedded text, so a passage is re-embedded only when its
+    words, headings or page title change.
+    """
+    chunks: List[Dict[str, Any]] = []
+    for section in split_sections(content_html):
+        previous = chunks[-1] if chunks else None
+        if (
+            previous is not None
+            and section.size() < min_chars
+            and previous["size"] + section.size() <= max_chars
+        ):
+            previous["lines"].extend(section.lines)
+            previous["size"] += section.size()
+            continue
+        for run in _pack_lines(section.lines, max_chars):
+            chunks.append({
+                "heading_path": section.heading_path,
+                "anchor": section.anchor,
+                "lines": run,
+                "size": sum(len(line) + 1 for line in run),
+            })
+
+    passages = []
+    for index, chunk in enumerate(chunks):
+        text = "\n".join(chunk["lines"])
+        embed_text = chunk_text(title, chunk["heading_path"], text)
+        passages.append({
+            "chunk_index": index,
+            "heading_path": chunk["heading_path"],
+            "anchor": chunk["anchor"],
+            "content_text": text,
+            "embed_text": embed_text,
+            "content_hash": hashlib.sha256(embed_text.encode()).hexdigest(),
+        })
+    return passages
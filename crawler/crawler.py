@@ -1,41 +1,52 @@
 """
 Knowledge Reset Crawler - Main Crawler Logic
-Playwright-based web crawler with content extraction and hierarchy building.
+HTTP-first web crawler (Playwright for JS-rendered pages) with content extraction and hierarchy building.
 """
 
 import hashlib
 import asyncio
 import os
 import time
+import uuid
 from typing import Optional, Dict, Any, List, Set
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urlparse
 from datetime import datetime
 
 from playwright.async_api import async_playwright, Browser, Page
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
-from extractors import (
-    extract_title,
-    extract_breadcrumbs,
-    extract_main_content,
-    extract_internal_links,
-    extract_metadata,
-)
+from parse_pool import pool as parse_pool
 from db import (
-    get_document_by_url,
-    create_document,
-    update_document,
-    create_document_version,
-    update_document_embedding,
+    list_document_manifest,
+    get_document_outlinks,
+    get_document_revision,
     log_crawl_error,
     update_crawl_job_status,
     create_audit_log,
 )
-from embeddings import generate_embedding
+from frontier import CrawlFrontier
+from politeness import scheduler as politeness
+from sitemap import fetch_sitemap_entries, parse_timestamp
+from fetcher import HttpFetcher, needs_browser, HTTP_ESCALATE_STATUSES
+from interception import RequestInterceptor
+from checkpoint import CrawlCheckpointer, load_checkpoint, CHECKPOINT_INTERVAL_SECONDS
+from write_buffer import DocumentWriteBuffer
+from embedding_stage import EmbeddingStage
+from readiness import ReadinessTracker, DEFAULT_QUIET_MS, DEFAULT_MAX_WAIT_MS
 
 load_dotenv()
 
+MAX_CONCURRENCY = int(os.getenv("CRAWL_MAX_CONCURRENCY", "16"))  # Browser pages and connections one job may open
+STATIC_MISS_LIMIT = 5  # Escalations (with no static successes) before a job goes browser-only
+
+# Stop reasons where another worker takes over the job, so this one must not write a final status
+HANDOFF_STOP_REASONS = ("lease_lost", "shutdown")
+
+
+def clamp_concurrency(concurrency: int) -> int:
+    """Keep a job's worker count between 1 and MAX_CONCURRENCY."""
+    return min(max(1, int(concurrency)), MAX_CONCURRENCY)
+
 
 class CrawlerConfig:
     """Configuration for a crawl job."""
@@ -46,7 +57,19 @@ class CrawlerConfig:
         delay_ms: int = 1000,
         timeout_ms: int = 30000,
         max_runtime_seconds: int = 3600,  # 1 hour default
+        concurrency: int = 4,  # Pages fetched in parallel per job
+        frontier_priority: str = "depth",  # See frontier.FRONTIER_PRIORITIES
         respect_robots: bool = True,
+        use_sitemap: bool = True,  # Seed the frontier from sitemap.xml
+        fetch_mode: str = "auto",  # See fetcher.FETCH_MODES
+        conditional_requests: bool = True,  # Send If-None-Match / If-Modified-Since on recrawls
+        block_resources: bool = True,  # Abort browser requests for images, fonts, media and trackers
+        blocked_resource_types: Optional[List[str]] = None,  # Defaults to interception.DEFAULT_BLOCKED_RESOURCE_TYPES
+        block_third_party: bool = False,  # Also abort every request to another domain
+        checkpoint_interval_seconds: int = CHECKPOINT_INTERVAL_SECONDS,  # 0 disables checkpointing
+        readiness_quiet_ms: int = DEFAULT_QUIET_MS,  # DOM quiet window after main content appears
+        readiness_max_wait_ms: int = DEFAULT_MAX_WAIT_MS,  # Upper bound on the post-navigation wait
+        resume_from_job_id: Optional[str] = None,  # Continue from this job's last checkpoint
         user_agent: str = "KnowledgeReset-Crawler/1.0",
     ):
         self.max_depth = max_depth
@@ -54,7 +77,19 @@ class CrawlerConfig:
         self.delay_ms = delay_ms
         self.timeout_ms = timeout_ms
         self.max_runtime_seconds = max_runtime_seconds
+        self.concurrency = clamp_concurrency(concurrency)
+        self.frontier_priority = frontier_priority
         self.respect_robots = respect_robots
+        self.use_sitemap = use_sitemap
+        self.fetch_mode = fetch_mode
+        self.conditional_requests = conditional_requests
+        self.block_resources = block_resources
+        self.blocked_resource_types = blocked_resource_types
+        self.block_third_party = block_third_party
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+        self.readiness_quiet_ms = readiness_quiet_ms
+        self.readiness_max_wait_ms = readiness_max_wait_ms
+        self.resume_from_job_id = resume_from_job_id
         self.user_agent = user_agent
 
 
@@ -70,6 +105,9 @@ class CrawlResult:
         breadcrumbs: List[Dict[str, str]],
         discovered_links: List[str],
         metadata: Dict[str, Any],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        chunks: Optional[List[Dict[str, Any]]] = None,
     ):
         self.url = url
         self.title = title
@@ -79,6 +117,33 @@ class CrawlResult:
         self.breadcrumbs = breadcrumbs
         self.discovered_links = discovered_links
         self.metadata = metadata
+        self.etag = etag
+        self.last_modified = last_modified
+        self.chunks = chunks or []
+
+
+class UnchangedPage:
+    """A page the server answered with 304 Not Modified."""
+    def __init__(self, url: str):
+        self.url = url
+
+
+def outlinks_hash(links: Optional[List[str]]) -> str:
+    """Order-insensitive fingerprint of a page's internal links (documents.outlinks_hash, migration 019)."""
+    return hashlib.sha256("\n".join(sorted(set(links or []))).encode()).hexdigest()
+
+
+def manifest_entry(doc_id: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact in-memory state of a stored document, from a manifest row or the data just written."""
+    return {
+        "id": doc_id,
+        "updated_at": row.get("updated_at") or datetime.utcnow().isoformat(),
+        "content_hash": row.get("content_hash"),
+        "http_etag": row.get("http_etag"),
+        "http_last_modified": row.get("http_last_modified"),
+        "outlinks_hash": row.get("outlinks_hash"),
+        "chunk_count": row.get("chunk_count"),
+    }
 
 
 class Crawler:
@@ -93,12 +158,14 @@ class Crawler:
         job_id: str,
         base_url: str,
         config: CrawlerConfig = None,
+        browser_pool=None,
     ):
         self.tenant_id = tenant_id
         self.app_id = app_id
         self.job_id = job_id
         self.base_url = base_url
         self.config = config or CrawlerConfig()
+        self.browser_pool = browser_pool  # Shared BrowserPool; None launches a private browser
         
         # Parse base URL for domain filtering
         parsed = urlparse(base_url)
@@ -106,16 +173,172 @@ class Crawler:
         
         # Tracking
         self.visited_urls: Set[str] = set()
-        self.queued_urls: List[tuple[str, int]] = []  # (url, depth)
+        self.frontier = CrawlFrontier(priority=self.config.frontier_priority)
+        self.checkpointer = CrawlCheckpointer(job_id, app_id, self.config.checkpoint_interval_seconds)
+        self.write_buffer = DocumentWriteBuffer(job_id)
+        self.embedding_stage = EmbeddingStage(job_id, self.write_buffer)
+        self.resumed_urls = 0
         self.pages_crawled = 0
         self.errors_count = 0
+        self.robots_skipped = 0
+        self.sitemap_urls = 0
+        self.sitemap_unchanged = 0
+        self.static_hits = 0  # Pages served by the HTTP tier
+        self.static_misses = 0  # Pages escalated to the browser
+        self.pages_not_modified = 0  # Pages answered with 304 on recrawl
+        self.chunks_embedded = 0  # Passages sent for embedding
+        self.chunks_reused = 0  # Passages of changed pages whose stored vector still matches
         self.start_time = None  # Will be set when crawl starts
         
+        # Worker pool coordination
+        self.in_flight = 0  # Pages currently being fetched/saved by workers
+        self.dispatched = 0  # Total URLs handed out to workers
+        self.stop_reason: Optional[str] = None  # "timeout", "cancelled", "lease_lost" or "shutdown" once set
+        self.work_available = asyncio.Event()
+        
+        # Fetchers (the browser is only launched if a page needs it)
+        self.http_fetcher: Optional[HttpFetcher] = None
+        self.playwright_manager = None
+        self.browser: Optional[Browser] = None
+        self.browser_context = None
+        self.idle_pages: List[Page] = []
+        self.context_pages: Dict[Any, int] = {}  # Leased context -> pages open on it
+        self.browser_lock = asyncio.Lock()
+        self.readiness = ReadinessTracker(self.config.readiness_quiet_ms, self.config.readiness_max_wait_ms)
+        self.interceptor = RequestInterceptor(
+            self.allowed_domain,
+            blocked_resource_types=self.config.blocked_resource_types,
+            block_third_party=self.config.block_third_party,
+        )
+        
         # Document parent mapping (for hierarchy)
         self.url_to_doc_id: Dict[str, str] = {}
         
-    async def crawl_page(self, page: Page, url: str) -> Optional[CrawlResult]:
-        """Crawl a single page and extract content."""
+        # Stored documents of this app: source_url -> id, updated_at, content_hash, HTTP validators, outlinks_hash, chunk_count
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since headers from the stored document, if any."""
+        if not self.config.conditional_requests:
+            return {}
+        stored = self.manifest.get(url) or {}
+        headers = {}
+        if stored.get("http_etag"):
+            headers["If-None-Match"] = stored["http_etag"]
+        if stored.get("http_last_modified"):
+            headers["If-Modified-Since"] = stored["http_last_modified"]
+        return headers
+    
+    async def build_result(self, url: str, html: str, headers: Optional[Dict[str, str]] = None) -> CrawlResult:
+        """Parse HTML and extract content into a CrawlResult (off the event loop for large pages)."""
+        headers = headers or {}
+        page = await parse_pool.parse(html, url, self.allowed_domain)
+        
+        return CrawlResult(
+            url=url,
+            title=page["title"],
+            content_text=page["content_text"],
+            content_html=page["content_html"],
+            content_hash=page["content_hash"],
+            breadcrumbs=page["breadcrumbs"],
+            discovered_links=page["links"],
+            metadata=page["metadata"],
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            chunks=page["chunks"],
+        )
+    
+    async def revalidate(self, url: str) -> bool:
+        """Conditional GET before a browser render; True if the server answered 304."""
+        headers = self.conditional_headers(url)
+        if not headers:
+            return False
+        try:
+            response = await self.http_fetcher.fetch(url, headers=headers)
+        except Exception as e:
+            print(f"DEBUG: Revalidation failed for {url}: {str(e)}")
+            return False
+        return response.status == 304
+    
+    async def crawl_page(self, url: str):
+        """
+        Crawl a single page over HTTP, falling back to the browser when needed.
+        Returns a CrawlResult, an UnchangedPage for 304 responses, or None on error.
+        """
+        mode = self.config.fetch_mode
+        if mode == "auto" and self.static_misses >= STATIC_MISS_LIMIT and self.static_hits == 0:
+            # Site is evidently client-rendered: stop paying for the extra HTTP fetch
+            mode = "browser"
+        
+        if mode != "browser":
+            escalate, result = await self.crawl_page_http(url)
+            if not escalate or mode == "http":
+                return result
+            self.static_misses += 1
+            print(f"DEBUG: Escalating {url} to browser for job {self.job_id}")
+        elif await self.revalidate(url):
+            return UnchangedPage(url)
+        
+        page = await self.acquire_page()
+        try:
+            return await self.crawl_page_browser(page, url)
+        finally:
+            await self.release_page(page)
+    
+    async def crawl_page_http(self, url: str) -> tuple[bool, Any]:
+        """
+        Fetch and extract a page without a browser.
+        
+        Returns (escalate, result); escalate is True when the page should be
+        re-fetched with Playwright instead (fetch failure, 403 or no usable static content).
+        """
+        MAX_RETRIES = 3
+        response = None
+        
+        for attempt in range(MAX_RETRIES):
+            try:
+                response = await self.http_fetcher.fetch(url, headers=self.conditional_headers(url))
+                break
+            except Exception as e:
+                print(f"DEBUG: HTTP fetch error for {url} (Attempt {attempt + 1}/{MAX_RETRIES}): {str(e)}")
+                if attempt == MAX_RETRIES - 1:
+                    if self.config.fetch_mode == "http":
+                        log_crawl_error(self.job_id, url, "MAX_RETRIES_EXCEEDED", f"Failed after {MAX_RETRIES} attempts: {str(e)}")
+                        self.errors_count += 1
+                    return True, None
+                await asyncio.sleep(2 * (attempt + 1))
+        
+        if response.status == 304:
+            return False, UnchangedPage(url)
+        
+        if response.status in HTTP_ESCALATE_STATUSES and self.config.fetch_mode != "http":
+            return True, None
+        
+        if response.status >= 400:
+            log_crawl_error(self.job_id, url, str(response.status), f"HTTP {response.status}")
+            self.errors_count += 1
+            return False, None
+        
+        if not response.is_html:
+            log_crawl_error(self.job_id, url, "UNSUPPORTED_CONTENT", f"Content-Type {response.headers.get('content-type')}")
+            self.errors_count += 1
+            return False, None
+        
+        try:
+            result = await self.build_result(url, response.html, response.headers)
+        except Exception as e:
+            log_crawl_error(self.job_id, url, "EXCEPTION", str(e))
+            self.errors_count += 1
+            return False, None
+        
+        if self.config.fetch_mode == "auto" and needs_browser(result.content_text):
+            return True, None
+        
+        self.static_hits += 1
+        return False, result
+    
+    async def crawl_page_browser(self, page: Page, url: str) -> Optional[CrawlResult]:
+        """Crawl a single page with Playwright and extract content."""
         MAX_RETRIES = 3
         response = None
         
@@ -131,6 +354,8 @@ class Crawler:
                 
                 if response:
                     print(f"DEBUG: Navigation to {url} finished for job {self.job_id} with status {response.status}")
+                    if self.browser_pool:
+                        self.browser_pool.record_page(page.context)
                     break
                 else:
                     print(f"DEBUG: Navigation return None for {url} (Attempt {attempt + 1}/{MAX_RETRIES})")
@@ -158,36 +383,16 @@ class Crawler:
             return None
         
         try:
-            # Optional additional wait for network to settle, but don't fail if it doesn't
-            try:
-                await page.wait_for_load_state("networkidle", timeout=5000)
-            except Exception:
-                pass
+            # Wait until the main content exists and the DOM has gone quiet (capped per host)
+            ready = await self.readiness.wait_until_ready(page, urlparse(url).netloc)
             
             # Get page HTML
             html = await page.content()
-            soup = BeautifulSoup(html, "lxml")
-            
-            # Extract content
-            title = extract_title(soup)
-            breadcrumbs = extract_breadcrumbs(soup, url)
-            content_text, content_html = extract_main_content(soup)
-            discovered_links = extract_internal_links(soup, url, self.allowed_domain)
-            metadata = extract_metadata(soup)
-            
-            # Calculate content hash
-            content_hash = hashlib.sha256(content_html.encode()).hexdigest()
-            
-            return CrawlResult(
-                url=url,
-                title=title,
-                content_text=content_text,
-                content_html=content_html,
-                content_hash=content_hash,
-                breadcrumbs=breadcrumbs,
-                discovered_links=discovered_links,
-                metadata=metadata,
-            )
+            result = await self.build_result(url, html, response.headers)
+            if ready:
+                print(f"DEBUG: {url} ready after {ready['waitedMs']}ms (cap {ready['capMs']}ms, content={ready['contentFound']})")
+                result.metadata["render_wait_ms"] = ready["waitedMs"]
+            return result
             
         except Exception as e:
             log_crawl_error(self.job_id, url, "EXCEPTION", str(e))
@@ -207,11 +412,10 @@ class Crawler:
         return None
     
     async def save_page(self, result: CrawlResult) -> str:
-        """Save or update a crawled page in the database."""
+        """Save or update a crawled page (written through the job's write-behind buffer)."""
         print(f"DEBUG: Saving page {result.url} for job {self.job_id}")
-        # Check if document already exists
-        existing = get_document_by_url(self.tenant_id, self.app_id, result.url)
-        print(f"DEBUG: Document existence check finished for {result.url}, existing={existing is not None}")
+        # Check if document already exists (manifest loaded at job start, no database read)
+        existing = self.manifest.get(result.url)
         
         parent_id = self.determine_parent_id(result.breadcrumbs)
         
@@ -227,42 +431,408 @@ class Crawler:
             "source_url": result.url,
             "breadcrumbs": result.breadcrumbs,
             "metadata": result.metadata,
+            "http_etag": result.etag,
+            "http_last_modified": result.last_modified,
+            "outlinks": result.discovered_links,
+            "outlinks_hash": outlinks_hash(result.discovered_links),
+            "chunk_count": len(result.chunks),
         }
         
         if existing:
+            doc_id = existing["id"]
+            
             # Check if content changed
             if existing.get("content_hash") != result.content_hash:
-                # Save version history
-                create_document_version(
-                    existing["id"],
-                    existing.get("content_html", ""),
-                    existing.get("content_hash", ""),
-                    f"Updated on {datetime.utcnow().isoformat()}"
-                )
+                # The only read: the previous HTML (for version history) and chunk hashes of a changed page
+                revision = get_document_revision(doc_id)
+                self.write_buffer.add_version({
+                    "document_id": doc_id,
+                    "content_html": revision["content_html"],
+                    "content_hash": existing.get("content_hash", ""),
+                    "diff_summary": f"Updated on {datetime.utcnow().isoformat()}",
+                })
                 
-                # Update document
-                doc = update_document(existing["id"], doc_data)
-                doc_id = existing["id"]
-                
-                # Regenerate embedding
-                embedding = generate_embedding(result.content_text)
-                update_document_embedding(doc_id, embedding)
+                # Update document; the embedding is regenerated in the next batch
+                await self.embedding_stage.submit({"id": doc_id, **doc_data}, result.content_text)
+                await self.submit_chunks(doc_id, result, stored_hashes=set(revision["chunk_hashes"]))
+                existing.update(manifest_entry(doc_id, doc_data))
+            elif existing.get("chunk_count") is None:
+                # Stored before chunk search existed: index its passages once
+                await self.embedding_stage.submit({"id": doc_id, **doc_data})
+                await self.submit_chunks(doc_id, result)
+                existing.update(manifest_entry(doc_id, doc_data))
             else:
-                doc_id = existing["id"]
+                # Content unchanged, but keep validators and links current for the next recrawl
+                if (
+                    existing.get("http_etag") != result.etag
+                    or existing.get("http_last_modified") != result.last_modified
+                    or existing.get("outlinks_hash") != outlinks_hash(result.discovered_links)
+                ):
+                    # Full row: a bulk upsert cannot carry partial rows (NOT NULL columns)
+                    await self.embedding_stage.submit({"id": doc_id, **doc_data})
+                    existing.update(manifest_entry(doc_id, doc_data))
         else:
-            # Create new document
-            doc = create_document(doc_data)
-            doc_id = doc["id"]
-            
-            # Generate embedding
-            embedding = generate_embedding(result.content_text)
-            update_document_embedding(doc_id, embedding)
+            # Create new document; the id is assigned here so children can reference it before the flush
+            doc_id = str(uuid.uuid4())
+            await self.embedding_stage.submit({"id": doc_id, **doc_data}, result.content_text)
+            await self.submit_chunks(doc_id, result)
+            self.manifest[result.url] = manifest_entry(doc_id, doc_data)
         
         # Track for hierarchy
         self.url_to_doc_id[result.url] = doc_id
         
         return doc_id
     
+    async def submit_chunks(self, doc_id: str, result: CrawlResult, stored_hashes: Optional[Set[str]] = None) -> None:
+        """
+        Queue a page's new chunk set. Only passages whose hash has no stored
+        vector are embedded; the others reuse the stored vector when the set
+        replaces the old one.
+        """
+        stored_hashes = stored_hashes or set()
+        self.write_buffer.expect_chunks(doc_id, len(result.chunks))
+        for chunk in result.chunks:
+            reuse = chunk["content_hash"] in stored_hashes
+            await self.embedding_stage.submit({
+                "document_id": doc_id,
+                "chunk_index": chunk["chunk_index"],
+                "tenant_id": self.tenant_id,
+                "app_id": self.app_id,
+                "heading_path": chunk["heading_path"],
+                "anchor": chunk["anchor"],
+                "content_text": chunk["content_text"],
+                "content_hash": chunk["content_hash"],
+                "embedding": None,  # Set by the stage, or filled from the stored chunk with the same hash
+            }, None if reuse else chunk["embed_text"], table="document_chunks")
+            if reuse:
+                self.chunks_reused += 1
+            else:
+                self.chunks_embedded += 1
+    
+    def enqueue(self, url: str, depth: int, sitemap_priority: Optional[float] = None) -> bool:
+        """Add a URL to the frontier, recording it for the next checkpoint."""
+        if not self.frontier.add(url, depth, sitemap_priority=sitemap_priority):
+            return False
+        self.checkpointer.record_added(url, depth, sitemap_priority)
+        return True
+    
+    def flush_writes(self) -> None:
+        """Write buffered documents; rows that could not be written count as errors."""
+        self.errors_count += self.write_buffer.flush()
+    
+    async def finish_url(self, url: str) -> None:
+        """Mark a URL as done (saved, unchanged, skipped or failed) for checkpointing."""
+        self.checkpointer.record_done(url)
+        if self.embedding_stage.due():
+            await self.embedding_stage.dispatch()
+        if self.write_buffer.due():
+            self.flush_writes()
+        if self.checkpointer.due():
+            # A checkpoint must never mark a page done before its document is written
+            await self.embedding_stage.drain()
+            self.flush_writes()
+            self.checkpointer.flush()
+    
+    def restore_checkpoint(self) -> bool:
+        """Rebuild the frontier and visited set from resume_from_job_id's checkpoints."""
+        state = load_checkpoint(self.config.resume_from_job_id)
+        if not state:
+            print(f"DEBUG: No checkpoint found for job {self.config.resume_from_job_id}, starting fresh")
+            return False
+        
+        if state.job_id == self.job_id:
+            # A reclaimed job appends to its own checkpoints; seq is unique per job
+            self.checkpointer.seq = state.max_seq + 1
+        
+        for url in state.done:
+            self.frontier.mark_visited(url)
+            self.visited_urls.add(url)
+            self.checkpointer.record_done(url)
+            if url in self.manifest:
+                self.url_to_doc_id[url] = self.manifest[url]["id"]
+        
+        for url, depth, priority in state.pending:
+            if self.enqueue(url, depth, sitemap_priority=priority):
+                self.resumed_urls += 1
+        
+        # First checkpoint of this job carries the restored state, so later resumes chain
+        self.checkpointer.flush()
+        print(f"DEBUG: Resumed job {self.job_id} from {state.job_id}: {len(state.done)} done, {self.resumed_urls} queued")
+        return True
+    
+    async def seed_from_sitemaps(self) -> None:
+        """
+        Queue URLs listed in the site's sitemaps.
+        
+        On recrawls, URLs whose <lastmod> is not newer than the stored
+        document's updated_at are marked visited without being fetched.
+        """
+        entries = await fetch_sitemap_entries(
+            self.base_url,
+            self.allowed_domain,
+            self.config.user_agent,
+            timeout_ms=self.config.timeout_ms,
+            delay_ms=self.config.delay_ms,
+        )
+        if not entries:
+            return
+        
+        for entry in entries:
+            existing = self.manifest.get(entry.url)
+            if existing and entry.lastmod:
+                updated_at = parse_timestamp(existing.get("updated_at"))
+                if updated_at and entry.lastmod <= updated_at:
+                    # Unchanged since our last save: keep it out of the frontier
+                    self.frontier.mark_visited(entry.url)
+                    self.checkpointer.record_done(entry.url)
+                    self.url_to_doc_id[entry.url] = existing["id"]
+                    self.sitemap_unchanged += 1
+                    continue
+            
+            if self.enqueue(entry.url, 1, sitemap_priority=entry.priority):
+                self.sitemap_urls += 1
+        
+        print(f"DEBUG: Seeded {self.sitemap_urls} sitemap URLs ({self.sitemap_unchanged} unchanged) for job {self.job_id}")
+    
+    async def ensure_browser(self) -> None:
+        """Lease a context from the shared pool (or launch a private browser) on first use, or when the pool retires its browser."""
+        async with self.browser_lock:
+            if self.browser_context and not self.context_retired(self.browser_context):
+                return
+            retired_context = self.browser_context
+            
+            context_options = {
+                "user_agent": self.config.user_agent,
+                "extra_http_headers": {
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+                    "Accept-Language": "en-US,en;q=0.9",
+                    "Upgrade-Insecure-Requests": "1",
+                },
+            }
+            
+            if self.browser_pool:
+                print(f"DEBUG: Leasing browser context for job {self.job_id}")
+                self.browser_context = await self.browser_pool.lease_context(**context_options)
+            else:
+                print(f"DEBUG: Initializing async_playwright for job {self.job_id}")
+                self.playwright_manager = async_playwright()
+                p = await self.playwright_manager.__aenter__()
+                print(f"DEBUG: async_playwright __aenter__ finished for job {self.job_id}")
+                
+                print(f"DEBUG: Launching browser for job {self.job_id}")
+                self.browser = await p.chromium.launch(
+                    headless=True,
+                    args=[
+                        "--no-sandbox",
+                        "--disable-dev-shm-usage",
+                        "--disable-gpu",
+                    ]
+                )
+                print(f"DEBUG: Browser launched for job {self.job_id}")
+                self.browser_context = await self.browser.new_context(**context_options)
+            
+            if self.config.block_resources:
+                await self.browser_context.route("**/*", self.interceptor.handle)
+                self.browser_context.on("response", self.interceptor.record_response)
+            
+            if retired_context:
+                print(f"DEBUG: Moved job {self.job_id} to a new browser context (pooled browser recycled)")
+                await self.release_context_if_unused(retired_context)
+    
+    def context_retired(self, context) -> bool:
+        return self.browser_pool is not None and self.browser_pool.is_retired(context)
+    
+    async def release_context_if_unused(self, context) -> None:
+        """Return a replaced context to the pool once its last page is closed."""
+        if context is self.browser_context or self.context_pages.get(context, 0):
+            return
+        self.context_pages.pop(context, None)
+        await self.browser_pool.release_context(context)
+    
+    async def acquire_page(self) -> Page:
+        """Take an idle browser page (at most one per worker is ever created)."""
+        while self.idle_pages:
+            page = self.idle_pages.pop()
+            if not self.context_retired(page.context):
+                return page
+            await self.close_page(page)
+        await self.ensure_browser()
+        page = await self.browser_context.new_page()
+        self.context_pages[self.browser_context] = self.context_pages.get(self.browser_context, 0) + 1
+        return page
+    
+    async def release_page(self, page: Page) -> None:
+        """Keep a page for reuse, or close it if its browser is being recycled."""
+        if self.context_retired(page.context):
+            await self.close_page(page)
+        else:
+            self.idle_pages.append(page)
+    
+    async def close_page(self, page: Page) -> None:
+        context = page.context
+        try:
+            await page.close()
+        except Exception as e:
+            print(f"DEBUG: Error closing page for job {self.job_id}: {str(e)}")
+        self.context_pages[context] = self.context_pages.get(context, 1) - 1
+        await self.release_context_if_unused(context)
+    
+    async def close_fetchers(self) -> None:
+        """Close the HTTP client and, if it was launched, the browser."""
+        if self.http_fetcher:
+            await self.http_fetcher.close()
+        if self.browser_pool and self.browser_context:
+            for context in [c for c in self.context_pages if c is not self.browser_context]:
+                await self.browser_pool.release_context(context)
+            await self.browser_pool.release_context(self.browser_context)
+            print(f"DEBUG: Browser context returned to pool for job {self.job_id}")
+        if self.browser:
+            await self.browser.close()
+        if self.playwright_manager:
+            await self.playwright_manager.__aexit__(None, None, None)
+            print(f"DEBUG: Playwright closed for job {self.job_id}")
+    
+    def stop(self, reason: str) -> None:
+        """Stop handing out new URLs; workers finish their current page and exit."""
+        if not self.stop_reason:
+            self.stop_reason = reason
+        self.work_available.set()
+    
+    def check_limits(self) -> None:
+        """Stop the crawl on timeout or cancellation (checked before each dispatch)."""
+        # Check for timeout
+        elapsed_time = time.time() - self.start_time
+        if elapsed_time > self.config.max_runtime_seconds:
+            print(f"DEBUG: Crawler timeout after {elapsed_time}s for job {self.job_id}")
+            stats = {
+                "pages_crawled": self.pages_crawled,
+                "errors_count": self.errors_count,
+                "urls_visited": len(self.visited_urls),
+                "timeout": True,
+                "elapsed_seconds": int(elapsed_time)
+            }
+            update_crawl_job_status(self.job_id, "timeout", stats)
+            self.stop("timeout")
+            return
+        
+        # Check for cancellation every 10 dispatched pages
+        if self.dispatched % 10 == 0:
+            from db import get_crawl_job
+            job = get_crawl_job(self.job_id)
+            if job and job.get("status") == "cancelled":
+                print(f"DEBUG: Crawler cancelled for job {self.job_id}")
+                stats = {
+                    "pages_crawled": self.pages_crawled,
+                    "errors_count": self.errors_count,
+                    "urls_visited": len(self.visited_urls),
+                    "cancelled": True
+                }
+                update_crawl_job_status(self.job_id, "cancelled", stats)
+                self.stop("cancelled")
+    
+    async def next_url(self) -> Optional[tuple[str, int]]:
+        """
+        Hand out the next (url, depth) to a worker.
+        
+        Waits while the queue is empty but other workers are still in flight
+        (they may discover more links), and while in-flight pages could still
+        fill the remaining max_pages budget. Returns None when the crawl is done.
+        """
+        while True:
+            if self.stop_reason or self.pages_crawled >= self.config.max_pages:
+                return None
+            
+            if self.frontier and self.pages_crawled + self.in_flight < self.config.max_pages:
+                self.check_limits()
+                if self.stop_reason:
+                    return None
+                
+                url, depth = self.frontier.pop()
+                self.visited_urls.add(url)
+                self.in_flight += 1
+                self.dispatched += 1
+                return url, depth
+            
+            if self.in_flight == 0:
+                return None
+            
+            self.work_available.clear()
+            await self.work_available.wait()
+    
+    async def wait_politely(self, url: str) -> bool:
+        """
+        Apply robots.txt rules and per-host request spacing before a fetch.
+        
+        Returns False if robots.txt disallows the URL, so no navigation is spent on it.
+        """
+        interval = self.config.delay_ms / 1000
+        
+        if self.config.respect_robots:
+            if not await politeness.can_fetch(url, self.config.user_agent):
+                print(f"DEBUG: Skipping {url} disallowed by robots.txt for job {self.job_id}")
+                self.robots_skipped += 1
+                return False
+            
+            crawl_delay = await politeness.crawl_delay(url, self.config.user_agent)
+            if crawl_delay is not None:
+                interval = max(interval, crawl_delay)
+        
+        await politeness.wait_for_slot(url, interval)
+        return True
+    
+    async def worker(self) -> None:
+        """Fetch, extract and save pages from the shared queue until it drains."""
+        while True:
+            item = await self.next_url()
+            if item is None:
+                # Wake any siblings waiting on the queue so they can exit too
+                self.work_available.set()
+                return
+            
+            url, depth = item
+            try:
+                if not await self.wait_politely(url):
+                    continue
+                
+                # Crawl the page
+                result = await self.crawl_page(url)
+                if not result:
+                    continue
+                
+                if isinstance(result, UnchangedPage):
+                    # 304: nothing to render or save, follow the links stored last time
+                    # (one read, and only when the links will be followed; the manifest only has their hash)
+                    doc_id = self.manifest[url]["id"]
+                    self.url_to_doc_id[url] = doc_id
+                    self.pages_not_modified += 1
+                    discovered_links = get_document_outlinks(doc_id) if depth < self.config.max_depth else []
+                else:
+                    # Save to database
+                    await self.save_page(result)
+                    discovered_links = result.discovered_links
+                
+                self.pages_crawled += 1
+                
+                # Update progress every 10 pages
+                if self.pages_crawled % 10 == 0:
+                    progress_stats = {
+                        "pages_crawled": self.pages_crawled,
+                        "errors_count": self.errors_count,
+                        "urls_visited": len(self.visited_urls),
+                        "current_url": url,
+                        "elapsed_seconds": int(time.time() - self.start_time)
+                    }
+                    update_crawl_job_status(self.job_id, "running", progress_stats)
+                
+                # Queue discovered links (if within depth)
+                if depth < self.config.max_depth:
+                    for link in discovered_links:
+                        self.enqueue(link, depth + 1)
+            finally:
+                self.in_flight -= 1
+                await self.finish_url(url)
+                self.work_available.set()
+    
     async def run(self) -> Dict[str, Any]:
         """Run the crawler."""
         update_crawl_job_status(self.job_id, "running")
@@ -276,121 +846,85 @@ class Crawler:
             metadata={"base_url": self.base_url}
         )
         
-        # Initialize queue with base URL
-        self.queued_urls.append((self.base_url, 0))
+        # Load what we already have for this app once: change detection, recrawl skipping, conditional GETs, resume hierarchy
+        self.manifest = {
+            row["source_url"]: manifest_entry(row["id"], row)
+            for row in list_document_manifest(self.tenant_id, self.app_id)
+        }
+        print(f"DEBUG: Loaded manifest of {len(self.manifest)} documents for job {self.job_id}")
+        
+        # Initialize queue from a checkpoint, or with the base URL
+        resumed = bool(self.config.resume_from_job_id) and self.restore_checkpoint()
+        if not resumed:
+            self.enqueue(self.base_url, 0)
+        if self.config.use_sitemap and not resumed:
+            try:
+                await self.seed_from_sitemaps()
+            except Exception as e:
+                print(f"DEBUG: Sitemap seeding failed for job {self.job_id}: {str(e)}")
+        
+        # Also used in browser mode for conditional revalidation
+        self.http_fetcher = HttpFetcher(
+            self.config.user_agent,
+            timeout_ms=self.config.timeout_ms,
+            max_connections=self.config.concurrency * 2,
+        )
         
-        print(f"DEBUG: Initializing async_playwright for job {self.job_id}")
-        pw_manager = async_playwright()
         try:
-            p = await pw_manager.__aenter__()
-            print(f"DEBUG: async_playwright __aenter__ finished for job {self.job_id}")
-            
-            print(f"DEBUG: Launching browser for job {self.job_id}")
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    "--no-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-gpu",
-                ]
-            )
-            print(f"DEBUG: Browser launched for job {self.job_id}")
-            context = await browser.new_context(
-                user_agent=self.config.user_agent,
-                extra_http_headers={
-                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "Upgrade-Insecure-Requests": "1",
-                }
-            )
-            page = await context.new_page()
+            print(f"DEBUG: Starting {self.config.concurrency} crawl workers for job {self.job_id}")
             
             # Set start time for timeout tracking
             self.start_time = time.time()
             
+            workers = [asyncio.create_task(self.worker()) for _ in range(self.config.concurrency)]
             try:
-                while self.queued_urls and self.pages_crawled < self.config.max_pages:
-                    url, depth = self.queued_urls.pop(0)
-                    
-                    # Check for timeout
-                    elapsed_time = time.time() - self.start_time
-                    if elapsed_time > self.config.max_runtime_seconds:
-                        print(f"DEBUG: Crawler timeout after {elapsed_time}s for job {self.job_id}")
-                        stats = {
-                            "pages_crawled": self.pages_crawled,
-                            "errors_count": self.errors_count,
-                            "urls_visited": len(self.visited_urls),
-                            "timeout": True,
-                            "elapsed_seconds": int(elapsed_time)
-                        }
-                        update_crawl_job_status(self.job_id, "timeout", stats)
-                        break
-                    
-                    # Check for cancellation every 10 pages
-                    if self.pages_crawled % 10 == 0:
-                        from db import get_crawl_job
-                        job = get_crawl_job(self.job_id)
-                        if job and job.get("status") == "cancelled":
-                            print(f"DEBUG: Crawler cancelled for job {self.job_id}")
-                            stats = {
-                                "pages_crawled": self.pages_crawled,
-                                "errors_count": self.errors_count,
-                                "urls_visited": len(self.visited_urls),
-                                "cancelled": True
-                            }
-                            update_crawl_job_status(self.job_id, "cancelled", stats)
-                            break
-                    
-                    # Skip if already visited
-                    if url in self.visited_urls:
-                        continue
-                    
-                    self.visited_urls.add(url)
-                    
-                    # Crawl the page
-                    result = await self.crawl_page(page, url)
-                    
-                    if result:
-                        # Save to database
-                        await self.save_page(result)
-                        self.pages_crawled += 1
-                        
-                        # Update progress every 10 pages
-                        if self.pages_crawled % 10 == 0:
-                            progress_stats = {
-                                "pages_crawled": self.pages_crawled,
-                                "errors_count": self.errors_count,
-                                "urls_visited": len(self.visited_urls),
-                                "current_url": url,
-                                "elapsed_seconds": int(time.time() - self.start_time)
-                            }
-                            update_crawl_job_status(self.job_id, "running", progress_stats)
-                        
-                        # Queue discovered links (if within depth)
-                        if depth < self.config.max_depth:
-                            for link in result.discovered_links:
-                                if link not in self.visited_urls:
-                                    self.queued_urls.append((link, depth + 1))
-                    
-                    # Delay between requests
-                    await asyncio.sleep(self.config.delay_ms / 1000)
-                    
-            finally:
-                await browser.close()
+                await asyncio.gather(*workers)
+            except BaseException:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
         except Exception as e:
             print(f"DEBUG: Error in crawler run: {str(e)}")
             update_crawl_job_status(self.job_id, "failed", {"error": str(e)})
             raise e
         finally:
-            await pw_manager.__aexit__(None, None, None)
-            print(f"DEBUG: Playwright closed for job {self.job_id}")
+            # Runs on completion, cancellation, timeout, handoff and errors alike
+            await self.embedding_stage.drain()
+            self.flush_writes()
+            await self.close_fetchers()
+            # Final only if the queue drained; otherwise a later run can resume from here
+            drained = self.stop_reason is None and not self.frontier and self.in_flight == 0
+            self.checkpointer.flush(final=drained)
         
         # Update job status
         stats = {
             "pages_crawled": self.pages_crawled,
             "errors_count": self.errors_count,
             "urls_visited": len(self.visited_urls),
+            "robots_skipped": self.robots_skipped,
+            "sitemap_urls": self.sitemap_urls,
+            "sitemap_unchanged": self.sitemap_unchanged,
+            "static_pages": self.static_hits,
+            "browser_escalations": self.static_misses,
+            "not_modified": self.pages_not_modified,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_reused": self.chunks_reused,
+            **self.embedding_stage.stats(),
+            **self.write_buffer.stats(),
         }
+        if self.config.resume_from_job_id:
+            stats["resumed_from_job_id"] = self.config.resume_from_job_id
+            stats["resumed_urls"] = self.resumed_urls
+        if self.browser_context:
+            stats.update(self.readiness.stats())
+        if self.browser_context and self.config.block_resources:
+            stats.update(self.interceptor.stats())
+        
+        if self.stop_reason in HANDOFF_STOP_REASONS:
+            print(f"DEBUG: Job {self.job_id} handed off ({self.stop_reason}) after {self.pages_crawled} pages")
+            stats[self.stop_reason] = True
+            return stats
         
         # If we didn't crawl any pages and we have errors, it's a failure
         if self.pages_crawled == 0 and self.errors_count > 0:
@@ -413,21 +947,40 @@ class Crawler:
         return stats
 
 
+def config_from_dict(config: Dict[str, Any] = None) -> CrawlerConfig:
+    """Build a CrawlerConfig from a crawl job's config JSON."""
+    return CrawlerConfig(
+        max_depth=config.get("max_depth", 3) if config else 3,
+        max_pages=config.get("max_pages", 10000) if config else 10000,
+        delay_ms=config.get("delay_ms", 1000) if config else 1000,
+        timeout_ms=config.get("timeout_ms", 30000) if config else 30000,
+        max_runtime_seconds=config.get("max_runtime_seconds", 3600) if config else 3600,
+        respect_robots=config.get("respect_robots", True) if config else True,
+        use_sitemap=config.get("use_sitemap", True) if config else True,
+        fetch_mode=config.get("fetch_mode", "auto") if config else "auto",
+        conditional_requests=config.get("conditional_requests", True) if config else True,
+        block_resources=config.get("block_resources", True) if config else True,
+        blocked_resource_types=config.get("blocked_resource_types") if config else None,
+        block_third_party=config.get("block_third_party", False) if config else False,
+        concurrency=clamp_concurrency(config.get("concurrency", 4)) if config else 4,
+        frontier_priority=config.get("frontier_priority", "depth") if config else "depth",
+        checkpoint_interval_seconds=config.get("checkpoint_interval_seconds", CHECKPOINT_INTERVAL_SECONDS) if config else CHECKPOINT_INTERVAL_SECONDS,
+        readiness_quiet_ms=config.get("readiness_quiet_ms", DEFAULT_QUIET_MS) if config else DEFAULT_QUIET_MS,
+        readiness_max_wait_ms=config.get("readiness_max_wait_ms", DEFAULT_MAX_WAIT_MS) if config else DEFAULT_MAX_WAIT_MS,
+        resume_from_job_id=config.get("resume_from_job_id") if config else None,
+    )
+
+
 async def start_crawl(
     tenant_id: str,
     app_id: str,
     job_id: str,
     base_url: str,
     config: Dict[str, Any] = None,
+    browser_pool=None,
 ) -> Dict[str, Any]:
-    """Start a crawl job."""
-    crawler_config = CrawlerConfig(
-        max_depth=config.get("max_depth", 3) if config else 3,
-        max_pages=config.get("max_pages", 10000) if config else 10000,
-        delay_ms=config.get("delay_ms", 1000) if config else 1000,
-        timeout_ms=config.get("timeout_ms", 30000) if config else 30000,
-        max_runtime_seconds=config.get("max_runtime_seconds", 3600) if config else 3600,
-    )
+    """Start a crawl job (rendering through browser_pool when the service provides one)."""
+    crawler_config = config_from_dict(config)
     
     crawler = Crawler(
         tenant_id=tenant_id,
@@ -435,6 +988,7 @@ async def start_crawl(
         job_id=job_id,
         base_url=base_url,
         config=crawler_config,
+        browser_pool=browser_pool,
     )
     
     return await crawler.run()
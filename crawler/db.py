@@ -4,10 +4,14 @@ Uses Supabase with the secret key for server-side operations.
 """
 
 import os
-from typing import Optional, Dict, Any, List
+import random
+from typing import Optional, Dict, Any, List, Sequence
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
 from dotenv import load_dotenv
 
+from embedding_providers import to_pgvector
+
 load_dotenv()
 
 # Initialize Supabase client with secret key (service_role equivalent)
@@ -45,13 +49,14 @@ def update_application_last_crawl(app_id: str) -> None:
 
 # ==================== CRAWL JOBS ====================
 
-def create_crawl_job(tenant_id: str, app_id: str, config: Dict[str, Any]) -> Dict[str, Any]:
-    """Create a new crawl job."""
+def create_crawl_job(tenant_id: str, app_id: str, config: Dict[str, Any], execution_mode: str = "inline") -> Dict[str, Any]:
+    """Create a new crawl job ("queue" jobs are picked up by worker processes)."""
     result = supabase.table("crawl_jobs").insert({
         "tenant_id": tenant_id,
         "app_id": app_id,
         "status": "pending",
-        "config": config
+        "config": config,
+        "execution_mode": execution_mode
     }).execute()
     return result.data[0]
 
@@ -75,30 +80,103 @@ def get_crawl_job(job_id: str) -> Optional[Dict[str, Any]]:
     return result.data[0] if result.data else None
 
 
-# ==================== DOCUMENTS ====================
+def claim_crawl_job(worker_id: str, lease_seconds: int, max_attempts: int) -> Optional[Dict[str, Any]]:
+    """Claim the next pending (or lease-expired) queue job for a worker."""
+    result = supabase.rpc("claim_crawl_job", {
+        "p_worker_id": worker_id,
+        "p_lease_seconds": lease_seconds,
+        "p_max_attempts": max_attempts
+    }).execute()
+    return result.data[0] if result.data else None
+
+
+def heartbeat_crawl_job(job_id: str, worker_id: str, lease_seconds: int) -> bool:
+    """Extend a job lease. False means the worker no longer owns the job."""
+    result = supabase.rpc("heartbeat_crawl_job", {
+        "p_job_id": job_id,
+        "p_worker_id": worker_id,
+        "p_lease_seconds": lease_seconds
+    }).execute()
+    return bool(result.data)
+
+
+def release_crawl_job(job_id: str, worker_id: str, requeue: bool = False) -> None:
+    """Drop a worker's lease; requeue puts an unfinished job back to pending."""
+    update_data = {"worker_id": None, "lease_expires_at": None}
+    query = supabase.table("crawl_jobs")
+    if requeue:
+        update_data["status"] = "pending"
+        query = query.update(update_data).eq("id", job_id).eq("worker_id", worker_id).eq("status", "running")
+    else:
+        query = query.update(update_data).eq("id", job_id).eq("worker_id", worker_id)
+    query.execute()
+
+
+# ==================== CRAWL CHECKPOINTS ====================
+
+def insert_crawl_checkpoint(job_id: str, app_id: str, seq: int, payload: str, is_final: bool = False) -> None:
+    """Append a checkpoint delta for a crawl job."""
+    supabase.table("crawl_checkpoints").insert({
+        "job_id": job_id,
+        "app_id": app_id,
+        "seq": seq,
+        "payload": payload,
+        "is_final": is_final
+    }).execute()
 
-def get_document_by_url(tenant_id: str, app_id: str, source_url: str) -> Optional[Dict[str, Any]]:
-    """Get document by source URL."""
-    result = supabase.table("documents").select("*").eq(
-        "tenant_id", tenant_id
-    ).eq(
+
+def list_crawl_checkpoints(job_id: str) -> List[Dict[str, Any]]:
+    """Get all checkpoint deltas of a job in write order."""
+    result = supabase.table("crawl_checkpoints").select("seq, payload, is_final").eq(
+        "job_id", job_id
+    ).order("seq").execute()
+    return result.data
+
+
+def get_latest_checkpoint(app_id: str) -> Optional[Dict[str, Any]]:
+    """Get the most recent checkpoint row (without payload) for an application."""
+    result = supabase.table("crawl_checkpoints").select("job_id, seq, is_final, created_at").eq(
         "app_id", app_id
-    ).eq(
-        "source_url", source_url
-    ).execute()
+    ).order("created_at", desc=True).order("seq", desc=True).limit(1).execute()
     return result.data[0] if result.data else None
 
 
-def create_document(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Create a new document."""
-    result = supabase.table("documents").insert(data).execute()
-    return result.data[0]
-
+# ==================== DOCUMENTS ====================
 
-def update_document(doc_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    """Update an existing document."""
-    result = supabase.table("documents").update(data).eq("id", doc_id).execute()
-    return result.data[0]
+def list_document_manifest(tenant_id: str, app_id: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+    """List the compact per-document state the crawler compares against (no content or embedding)."""
+    rows = []
+    offset = 0
+    while True:
+        result = supabase.table("documents").select(
+            "id, source_url, updated_at, content_hash, http_etag, http_last_modified, outlinks_hash, chunk_count"
+        ).eq(
+            "tenant_id", tenant_id
+        ).eq(
+            "app_id", app_id
+        ).order("id").range(offset, offset + page_size - 1).execute()
+        rows.extend(result.data)
+        if len(result.data) < page_size:
+            return rows
+        offset += page_size
+
+
+def get_document_outlinks(doc_id: str) -> List[str]:
+    """Get the stored internal links of a document."""
+    result = supabase.table("documents").select("outlinks").eq("id", doc_id).execute()
+    return (result.data[0].get("outlinks") or []) if result.data else []
+
+
+def get_document_revision(doc_id: str) -> Dict[str, Any]:
+    """Get what a changed document is compared against: its stored HTML (kept as version history) and embedded chunk hashes."""
+    result = supabase.table("documents").select(
+        "content_html, document_chunks(content_hash)"
+    ).eq("id", doc_id).filter("document_chunks.embedding", "not.is", "null").execute()
+    row = result.data[0] if result.data else {}
+    return {
+        "content_html": row.get("content_html") or "",
+        "chunk_hashes": [chunk["content_hash"] for chunk in row.get("document_chunks") or []],
+    }
 
 
 def create_document_version(document_id: str, content_html: str, content_hash: str, diff_summary: str = None) -> Dict[str, Any]:
@@ -112,13 +190,168 @@ def create_document_version(document_id: str, content_html: str, content_hash: s
     return result.data[0]
 
 
-def update_document_embedding(doc_id: str, embedding: List[float]) -> None:
+def upsert_documents(rows: List[Dict[str, Any]]) -> None:
+    """Insert or update documents by id in one request (every row must have the same keys)."""
+    supabase.table("documents").upsert(rows, on_conflict="id", returning=ReturnMethod.minimal).execute()
+
+
+def create_document_versions(rows: List[Dict[str, Any]]) -> None:
+    """Insert several document versions in one request."""
+    supabase.table("document_versions").insert(rows, returning=ReturnMethod.minimal).execute()
+
+
+def update_document_embedding(doc_id: str, embedding: Sequence[float]) -> None:
     """Update the vector embedding for a document."""
     supabase.table("documents").update({
-        "embedding": embedding
+        "embedding": to_pgvector(embedding)
     }).eq("id", doc_id).execute()
 
 
+# ==================== DOCUMENT CHUNKS ====================
+
+def replace_document_chunks(rows: List[Dict[str, Any]], chunk_counts: Dict[str, int]) -> int:
+    """
+    Write the complete chunk sets of several documents in one transaction.
+
+    Rows without an embedding reuse the stored vector of the same document's
+    chunk with the same content_hash; chunks at or past each document's count
+    are deleted. Returns the number of vectors reused.
+    """
+    result = supabase.rpc("replace_document_chunks", {
+        "p_chunks": rows,
+        "p_document_ids": list(chunk_counts),
+        "p_chunk_counts": list(chunk_counts.values()),
+    }).execute()
+    return result.data or 0
+
+
+# ==================== EMBEDDING QUEUE ====================
+
+def enqueue_embedding_work(items: List[Dict[str, Any]]) -> int:
+    """Add or replace work items (document_id, chunk_index (-1 for the document), tenant_id, content_hash)."""
+    result = supabase.rpc("enqueue_embedding_work", {"p_items": items}).execute()
+    return result.data or 0
+
+
+def claim_embedding_work(worker_id: str, limit: int, lease_seconds: int, max_attempts: int) -> List[Dict[str, Any]]:
+    """Lease up to limit available work items, with the text to embed."""
+    result = supabase.rpc("claim_embedding_work", {
+        "p_worker_id": worker_id,
+        "p_limit": limit,
+        "p_lease_seconds": lease_seconds,
+        "p_max_attempts": max_attempts,
+    }).execute()
+    return result.data or []
+
+
+def complete_embedding_work(items: List[Dict[str, Any]]) -> int:
+    """Store finished vectors (only onto targets whose hash still matches) and remove the items; returns vectors stored."""
+    result = supabase.rpc("complete_embedding_work", {"p_items": items}).execute()
+    return result.data or 0
+
+
+def fail_embedding_work(items: List[Dict[str, Any]], error: str, retry_seconds: int, count_attempt: bool = True) -> None:
+    """Release leased items for a later retry."""
+    supabase.rpc("fail_embedding_work", {
+        "p_items": [{"document_id": item["document_id"], "chunk_index": item["chunk_index"]} for item in items],
+        "p_error": error[:1000],
+        "p_retry_seconds": retry_seconds,
+        "p_count_attempt": count_attempt,
+    }).execute()
+
+
+def enqueue_embedding_backfill(tenant_id: Optional[str] = None, app_id: Optional[str] = None, limit: int = 10000) -> int:
+    """Queue documents with a missing or stale embedding and chunks without one; returns items queued."""
+    result = supabase.rpc("enqueue_embedding_backfill", {
+        "p_tenant_id": tenant_id,
+        "p_app_id": app_id,
+        "p_limit": limit,
+    }).execute()
+    return result.data or 0
+
+
+# ==================== VECTOR SEARCH ====================
+
+def sample_embeddings(tenant_id: str, count: int, passages: bool = False, app_id: Optional[str] = None) -> List[str]:
+    """Stored vectors (pgvector text) from random rows of a tenant or app, for use as benchmark queries."""
+    def scoped(query):
+        query = query.eq("tenant_id", tenant_id).filter("embedding", "not.is", "null")
+        return query.eq("app_id", app_id) if app_id else query
+
+    table = "document_chunks" if passages else "documents"
+    total = scoped(supabase.table(table).select("tenant_id", count="exact")).limit(1).execute().count or 0
+
+    vectors = []
+    for offset in random.sample(range(total), min(count, total)):
+        result = scoped(supabase.table(table).select("embedding")).range(offset, offset).execute()
+        vectors.extend(row["embedding"] for row in result.data)
+    return vectors
+
+
+def search_vectors(
+    embedding: str,
+    tenant_id: str,
+    limit: int,
+    passages: bool = False,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+    app_id: Optional[str] = None,
+    exact_max_rows: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Top-k through the serving search functions, without a similarity threshold.
+
+    exact_max_rows=0 forces the ANN index even for scopes small enough to be ranked exactly.
+    """
+    options = {"exact_max_rows": exact_max_rows} if exact_max_rows is not None else {}
+    result = supabase.rpc("search_document_chunks" if passages else "search_documents", {
+        "query_embedding": embedding,
+        "query_tenant_id": tenant_id,
+        "match_threshold": -1,
+        "match_count": limit,
+        "ef_search": ef_search,
+        "probes": probes,
+        "query_app_id": app_id,
+        **options,
+    }).execute()
+    return result.data or []
+
+
+def search_vectors_exact(
+    embedding: str, tenant_id: str, limit: int, passages: bool = False, app_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Exact top-k by full scan (document_id, chunk_index, similarity); chunk_index is -1 for documents."""
+    result = supabase.rpc("search_vectors_exact", {
+        "query_embedding": embedding,
+        "query_tenant_id": tenant_id,
+        "match_count": limit,
+        "passages": passages,
+        "query_app_id": app_id,
+    }).execute()
+    return result.data or []
+
+
+# ==================== EMBEDDING CACHE ====================
+
+def get_cached_embeddings(cache_keys: List[str]) -> List[Dict[str, Any]]:
+    """Get cached vectors by key (marks them as recently used)."""
+    result = supabase.rpc("get_cached_embeddings", {"p_keys": cache_keys}).execute()
+    return result.data or []
+
+
+def put_cached_embeddings(rows: List[Dict[str, Any]]) -> None:
+    """Store vectors; keys that already exist are left untouched."""
+    supabase.table("embedding_cache").upsert(
+        rows, on_conflict="cache_key", ignore_duplicates=True, returning=ReturnMethod.minimal
+    ).execute()
+
+
+def evict_embedding_cache(max_rows: int) -> int:
+    """Delete the least recently used entries beyond max_rows; returns how many were deleted."""
+    result = supabase.rpc("evict_embedding_cache", {"p_max_rows": max_rows}).execute()
+    return result.data or 0
+
+
 # ==================== CRAWL ERRORS ====================
 
 def log_crawl_error(job_id: str, url: str, error_code: str, error_message: str) -> None:
@@ -0,0 +1,134 @@
+"""
+Knowledge Reset Crawler - Embedding Cache
+Content-addressed cache of embedding vectors so identical text is only sent to the provider once.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List
+
+import numpy as np
+
+from db import get_cached_embeddings, put_cached_embeddings, evict_embedding_cache
+from embedding_providers import to_pgvector, from_pgvector
+
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "2000"))  # In-process LRU in front of the table
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))  # ~1.2 GB of 1536-dim vectors
+EVICT_EVERY_INSERTS = 1000  # Run table eviction after this many new entries from this process
+
+
+def cache_key(model: str, dimensions: int, task_type: str, text: str) -> str:
+    """Key for an embedding request; text must already be truncated the way it is sent."""
+    return hashlib.sha256(f"{model}\n{dimensions}\n{task_type}\n{text}".encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-level cache: an in-process LRU backed by the embedding_cache table.
+
+    Lookups and stores are batched (one request per embedding batch).
+    Cache failures never fail an embedding; they only count as misses.
+    The table is trimmed to EMBEDDING_CACHE_MAX_ROWS least-recently-used
+    entries every EVICT_EVERY_INSERTS inserts.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = EMBEDDING_CACHE_ENABLED,
+        memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES,
+        max_rows: int = EMBEDDING_CACHE_MAX_ROWS,
+    ):
+        self.enabled = enabled
+        self.memory_entries = memory_entries
+        self.max_rows = max_rows
+        self.memory: "OrderedDict[str, np.ndarray]" = OrderedDict()  # float32 vectors, 6 KB each at 1536 dims
+        self.lock = threading.Lock()  # Batches are embedded from worker threads
+        self.inserts_since_eviction = 0
+
+        # Process-wide counters
+        self.memory_hits = 0
+        self.table_hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _remember(self, key: str, embedding: np.ndarray) -> None:
+        with self.lock:
+            self.memory[key] = embedding
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for whichever keys are known."""
+        if not self.enabled or not keys:
+            return {}
+
+        found: Dict[str, np.ndarray] = {}
+        missing = []
+        with self.lock:
+            for key in dict.fromkeys(keys):
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+                    self.memory_hits += 1
+                else:
+                    missing.append(key)
+
+        if missing:
+            try:
+                for row in get_cached_embeddings(missing):
+                    embedding = from_pgvector(row["embedding"])
+                    found[row["cache_key"]] = embedding
+                    self._remember(row["cache_key"], embedding)
+                    self.table_hits += 1
+            except Exception as e:
+                print(f"DEBUG: Embedding cache lookup failed: {str(e)}")
+
+        self.misses += sum(1 for key in missing if key not in found)
+        return found
+
+    def put_many(self, entries: Dict[str, np.ndarray], model: str, dimensions: int, task_type: str) -> None:
+        if not self.enabled or not entries:
+            return
+
+        for key, embedding in entries.items():
+            self._remember(key, embedding)
+        rows = [
+            {"cache_key": key, "model": model, "dimensions": dimensions, "task_type": task_type, "embedding": to_pgvector(embedding)}
+            for key, embedding in entries.items()
+        ]
+        try:
+            put_cached_embeddings(rows)
+        except Exception as e:
+            print(f"DEBUG: Embedding cache store failed: {str(e)}")
+            return
+
+        self.inserts_since_eviction += len(rows)
+        if self.inserts_since_eviction >= EVICT_EVERY_INSERTS:
+            self.inserts_since_eviction = 0
+            try:
+                deleted = evict_embedding_cache(self.max_rows)
+                self.evicted += deleted
+                if deleted:
+                    print(f"DEBUG: Evicted {deleted} embedding cache entries")
+            except Exception as e:
+                print(f"DEBUG: Embedding cache eviction failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.table_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "table_hits": self.table_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.table_hits) / lookups, 3) if lookups else None,
+            "evicted": self.evicted,
+        }
+
+
+cache = EmbeddingCache()
@@ -0,0 +1,170 @@
+"""
+Knowledge Reset Crawler - Embedding Stage
+Accumulates document rows from many pages and embeds their text in batches, off the page loop.
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+from embeddings import generate_embeddings_batch, EMBEDDING_BATCH_SIZE
+from embedding_providers import to_pgvector
+from db import log_crawl_error
+from write_buffer import DocumentWriteBuffer
+
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", str(EMBEDDING_BATCH_SIZE)))
+EMBED_MAX_WAIT_SECONDS = float(os.getenv("EMBED_MAX_WAIT_SECONDS", "2"))  # Send a partial batch after this long
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "2"))  # Batches embedding at once before pages wait
+# "inline" embeds during the crawl; "queue" only enqueues work for embedding_worker.py
+EMBEDDING_MODE = os.getenv("EMBEDDING_MODE", "inline").lower()
+
+
+def work_item(table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+    """embedding_queue item for a document or chunk row."""
+    if table == "document_chunks":
+        return {
+            "document_id": row["document_id"],
+            "chunk_index": row["chunk_index"],
+            "tenant_id": row["tenant_id"],
+            "content_hash": row["content_hash"],
+        }
+    return {"document_id": row["id"], "chunk_index": -1, "tenant_id": row["tenant_id"], "content_hash": row["content_hash"]}
+
+
+class EmbeddingStage:
+    """
+    Pipeline stage between save_page and the write buffer.
+
+    Rows are queued with the text to embed (or None for rows that only
+    refresh stored fields). A batch goes to the provider when it holds
+    EMBED_BATCH_SIZE texts or its oldest row has waited
+    EMBED_MAX_WAIT_SECONDS; the provider call runs in a thread so pages
+    keep flowing. Batches hand their rows to the write buffer in
+    submission order, so a parent document is always written before its
+    children, and a document before its chunks. A text that fails to embed
+    is written without a new embedding, logged, and handed to the embedding
+    queue for the workers to retry: document rows keep the stored (now
+    stale) one, chunk rows carry "embedding": None so a changed passage is
+    never searched with its old vector.
+
+    With EMBEDDING_MODE=queue the provider is never called here: rows are
+    written straight away and every text becomes a queue item, so crawl
+    throughput does not depend on the provider's latency or quota.
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        write_buffer: DocumentWriteBuffer,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_wait_seconds: float = EMBED_MAX_WAIT_SECONDS,
+        max_in_flight: int = EMBED_MAX_IN_FLIGHT,
+        mode: str = EMBEDDING_MODE,
+    ):
+        self.job_id = job_id
+        self.mode = mode
+        self.write_buffer = write_buffer
+        self.batch_size = batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.pending: List[Tuple[str, Dict[str, Any], Optional[str]]] = []
+        self.pending_texts = 0
+        self.oldest: Optional[float] = None
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.last_task: Optional[asyncio.Task] = None
+
+        # Per-job counters
+        self.batches = 0
+        self.embedded = 0
+        self.failed = 0
+        self.queued = 0
+
+    def idle(self) -> bool:
+        return not self.pending and (self.last_task is None or self.last_task.done())
+
+    async def submit(self, row: Dict[str, Any], text: Optional[str] = None, table: str = "documents") -> None:
+        """Queue a document or chunk row; text is embedded into row["embedding"] before the row is written."""
+        if self.mode == "queue":
+            self.write_buffer.add(table, row)
+            if text is not None:
+                self.write_buffer.add_embedding_work(work_item(table, row))
+                self.queued += 1
+            return
+
+        if text is None and self.idle():
+            # Nothing ahead of it: no reason to hold the row back
+            self.write_buffer.add(table, row)
+            return
+
+        self.pending.append((table, row, text))
+        if text is not None:
+            self.pending_texts += 1
+        if self.oldest is None:
+            self.oldest = time.time()
+        if self.pending_texts >= self.batch_size:
+            await self.dispatch()
+
+    def due(self) -> bool:
+        return bool(self.pending) and time.time() - self.oldest >= self.max_wait_seconds
+
+    async def dispatch(self) -> None:
+        """Start embedding the pending rows; waits only while EMBED_MAX_IN_FLIGHT batches are running."""
+        if not self.pending:
+            return
+        batch = self.pending
+        self.pending, self.pending_texts, self.oldest = [], 0, None
+
+        await self.slots.acquire()
+        self.last_task = asyncio.create_task(self._process(batch, self.last_task))
+
+    async def _process(self, batch: List[Tuple[str, Dict[str, Any], Optional[str]]], previous: Optional[asyncio.Task]) -> None:
+        texts = [text for _, _, text in batch if text is not None]
+        try:
+            embeddings = await asyncio.to_thread(generate_embeddings_batch, texts) if texts else []
+        except Exception as e:
+            print(f"DEBUG: Embedding batch failed for job {self.job_id}: {str(e)}")
+            embeddings = [None] * len(texts)
+        finally:
+            self.slots.release()
+        if texts:
+            self.batches += 1
+
+        # Keep submission order in the write buffer
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+
+        vectors = iter(embeddings)
+        for table, row, text in batch:
+            if text is not None:
+                embedding = next(vectors)
+                if embedding is None:
+                    self.failed += 1
+                    try:
+                        url = row.get("source_url") or row.get("document_id")
+                        log_crawl_error(self.job_id, url, "EMBEDDING_FAILED", "Stored without a new embedding; queued for retry")
+                    except Exception:
+                        pass
+                    self.write_buffer.add(table, row)
+                    self.write_buffer.add_embedding_work(work_item(table, row))
+                    self.queued += 1
+                    continue
+                row["embedding"] = to_pgvector(embedding)
+                if table == "documents":
+                    row["embedding_hash"] = row["content_hash"]
+                self.embedded += 1
+            self.write_buffer.add(table, row)
+
+    async def drain(self) -> None:
+        """Embed everything pending and wait until every row has reached the write buffer."""
+        await self.dispatch()
+        if self.last_task is not None:
+            await asyncio.gather(self.last_task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedding_batches": self.batches,
+            "embedded_texts": self.embedded,
+            "embedding_failures": self.failed,
+            "embeddings_queued": self.queued,
+        }
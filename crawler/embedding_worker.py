@@ -0,0 +1,199 @@
+"""
+Knowledge Reset Crawler - Embedding Queue Worker
+Drains embedding_queue with bounded concurrency and rate-limit backoff, and backfills missing or stale embeddings.
+
+Usage:
+    python embedding_worker.py --concurrency 2                 # run until stopped
+    python embedding_worker.py backfill [--app-id ID] [--drain] # queue NULL / stale embeddings
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import socket
+import time
+from typing import Optional, Dict, Any, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBED_WORKER_CONCURRENCY = int(os.getenv("EMBED_WORKER_CONCURRENCY", "2"))  # Provider requests in flight per worker
+EMBED_WORKER_BATCH_SIZE = int(os.getenv("EMBED_WORKER_BATCH_SIZE", "100"))  # Items per claim (one batchEmbedContents request)
+EMBED_LEASE_SECONDS = int(os.getenv("EMBED_LEASE_SECONDS", "300"))
+EMBED_POLL_SECONDS = float(os.getenv("EMBED_POLL_SECONDS", "5"))
+EMBED_MAX_ATTEMPTS = int(os.getenv("EMBED_MAX_ATTEMPTS", "5"))  # Failed tries before an item is left for inspection
+EMBED_RETRY_SECONDS = int(os.getenv("EMBED_RETRY_SECONDS", "30"))  # First retry after a failure; doubles per attempt
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "5"))  # First pause after a 429; doubles while they continue
+EMBED_BACKOFF_MAX_SECONDS = float(os.getenv("EMBED_BACKOFF_MAX_SECONDS", "300"))
+
+
+def item_text(item: Dict[str, Any]) -> Optional[str]:
+    """Text to embed for a claimed item, or None if the item is obsolete (target gone or changed since)."""
+    from chunker import chunk_text
+
+    if item.get("content_text") is None or item.get("current_hash") != item["content_hash"]:
+        return None
+    if item["chunk_index"] < 0:
+        return item["content_text"]
+    return chunk_text(item.get("title") or "", item.get("heading_path") or [], item["content_text"])
+
+
+class EmbeddingWorker:
+    """
+    Claims batches of embedding work and stores the vectors.
+
+    Each of the concurrency lanes claims up to EMBED_WORKER_BATCH_SIZE
+    items with a lease, embeds them in one provider request (in a thread)
+    and completes them in one transaction. A 429 pauses every lane with
+    exponential backoff and hands the items back without using up an
+    attempt; other failures retry with per-item exponential backoff until
+    EMBED_MAX_ATTEMPTS. A worker that dies just lets its leases lapse.
+    """
+
+    def __init__(self, worker_id: str, concurrency: int = EMBED_WORKER_CONCURRENCY, batch_size: int = EMBED_WORKER_BATCH_SIZE):
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.shutting_down = False
+        self.backoff = 0.0
+        self.paused_until = 0.0
+
+        # Process-wide counters
+        self.embedded = 0
+        self.obsolete = 0
+        self.failed = 0
+        self.rate_limited = 0
+
+    def shutdown(self) -> None:
+        """Stop claiming; lanes finish the batch they are embedding."""
+        print(f"DEBUG: Embedding worker {self.worker_id} shutting down")
+        self.shutting_down = True
+
+    def slow_down(self) -> float:
+        """Record a 429: pause all lanes, doubling the pause while rate limits continue."""
+        self.rate_limited += 1
+        self.backoff = min(max(self.backoff * 2, EMBED_BACKOFF_SECONDS), EMBED_BACKOFF_MAX_SECONDS)
+        self.paused_until = max(self.paused_until, time.time() + self.backoff * (1 + random.random() * 0.25))
+        print(f"DEBUG: Embedding worker {self.worker_id} rate limited, pausing {self.backoff:.0f}s")
+        return self.backoff
+
+    async def wait_for_quota(self) -> None:
+        while not self.shutting_down and time.time() < self.paused_until:
+            await asyncio.sleep(min(self.paused_until - time.time(), 1.0))
+
+    async def process(self, items: List[Dict[str, Any]]) -> None:
+        from embeddings import generate_embeddings_batch, is_rate_limited
+        from embedding_providers import to_pgvector
+        from db import complete_embedding_work, fail_embedding_work
+
+        texts = {i: item_text(item) for i, item in enumerate(items)}
+        live = [i for i, text in texts.items() if text is not None]
+        done = [
+            {"document_id": item["document_id"], "chunk_index": item["chunk_index"], "content_hash": item["content_hash"]}
+            for item in items
+        ]
+        self.obsolete += len(items) - len(live)
+
+        if live:
+            try:
+                embeddings = await asyncio.to_thread(
+                    generate_embeddings_batch, [texts[i] for i in live], raise_errors=True
+                )
+            except Exception as e:
+                if is_rate_limited(e):
+                    retry_seconds, count_attempt = max(1, int(self.slow_down())), False
+                else:
+                    self.failed += len(live)
+                    retry_seconds, count_attempt = EMBED_RETRY_SECONDS, True
+                    print(f"DEBUG: Embedding batch of {len(live)} items failed: {str(e)}")
+                fail_embedding_work([items[i] for i in live], str(e), retry_seconds, count_attempt)
+                # Obsolete items in the batch are still done
+                done = [done[i] for i in range(len(items)) if i not in live]
+                if done:
+                    complete_embedding_work(done)
+                return
+
+            self.backoff = 0.0
+            for i, embedding in zip(live, embeddings):
+                done[i]["embedding"] = to_pgvector(embedding)
+            self.embedded += len(live)
+
+        complete_embedding_work(done)
+
+    async def lane(self, index: int) -> None:
+        from db import claim_embedding_work
+
+        while not self.shutting_down:
+            await self.wait_for_quota()
+            if self.shutting_down:
+                return
+            try:
+                items = claim_embedding_work(self.worker_id, self.batch_size, EMBED_LEASE_SECONDS, EMBED_MAX_ATTEMPTS)
+            except Exception as e:
+                print(f"DEBUG: Embedding claim failed for worker {self.worker_id}: {str(e)}")
+                items = []
+
+            if not items:
+                await asyncio.sleep(EMBED_POLL_SECONDS)
+                continue
+            try:
+                await self.process(items)
+            except Exception as e:
+                # Items stay leased and are retried once the lease lapses
+                print(f"DEBUG: Embedding lane {index} of worker {self.worker_id} failed: {str(e)}")
+                await asyncio.sleep(EMBED_POLL_SECONDS)
+
+    async def run(self) -> None:
+        print(f"DEBUG: Embedding worker {self.worker_id} started ({self.concurrency} lanes of {self.batch_size})")
+        await asyncio.gather(*(self.lane(i) for i in range(self.concurrency)))
+        print(f"DEBUG: Embedding worker {self.worker_id} stopped: {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedded": self.embedded,
+            "obsolete": self.obsolete,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def run_backfill(tenant_id: Optional[str], app_id: Optional[str], limit: int) -> int:
+    from db import enqueue_embedding_backfill
+
+    queued = enqueue_embedding_backfill(tenant_id, app_id, limit)
+    scope = f"app {app_id}" if app_id else f"tenant {tenant_id}" if tenant_id else "all tenants"
+    print(f"Queued {queued} missing or stale embeddings for {scope}")
+    return queued
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Knowledge Reset embedding queue workers")
+    parser.add_argument("command", nargs="?", choices=["work", "backfill"], default="work")
+    parser.add_argument("--concurrency", type=int, default=EMBED_WORKER_CONCURRENCY, help="Provider requests in flight")
+    parser.add_argument("--tenant-id", help="backfill: only this tenant")
+    parser.add_argument("--app-id", help="backfill: only this application")
+    parser.add_argument("--limit", type=int, default=10000, help="backfill: documents and chunks to queue at most")
+    parser.add_argument("--drain", action="store_true", help="backfill: also run a worker until stopped")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        run_backfill(args.tenant_id, args.app_id, args.limit)
+        if not args.drain:
+            return
+
+    worker = EmbeddingWorker(f"{socket.gethostname()}:{os.getpid()}", concurrency=args.concurrency)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.shutdown)
+    try:
+        loop.run_until_complete(worker.run())
+    finally:
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
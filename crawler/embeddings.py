@@ -1,114 +1,109 @@
 """
 Knowledge Reset Crawler - Embeddings Generator
-Generates vector embeddings for document content using Google Gemini.
-Using gemini-embedding-001 (state-of-the-art, launched mid-2025).
+Generates vector embeddings for document content with the configured embedding provider.
+Gemini gemini-embedding-001 by default; see embedding_providers.py for the local and fake backends.
 """
 
-import os
-from typing import List
+from typing import Optional, Dict, List
 import numpy as np
-import google.generativeai as genai
-from dotenv import load_dotenv
 
-load_dotenv()
+from embedding_cache import cache as embedding_cache, cache_key
+from embedding_providers import get_provider, EMBEDDING_MAX_CHARS
 
-# Initialize Google Generative AI
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+provider = get_provider()
+EMBEDDING_BATCH_SIZE = provider.max_batch  # Texts per provider request (batchEmbedContents allows 100)
+TASK_TYPE = "retrieval_document"  # Optimized for document indexing
 
-# Model for embeddings - newer generation model (mid-2025)
-# Supports up to 3072 dimensions, but we use 1536 for indexing compatibility
-EMBEDDING_MODEL = "models/gemini-embedding-001"
-OUTPUT_DIMENSIONS = 1536  # Optimized for accuracy and indexing support
 
-
-def normalize_embedding(embedding: List[float]) -> List[float]:
-    """
-    Normalize embeddings for accurate semantic similarity.
-    Required for dimensions other than 3072 (which are pre-normalized).
-    
-    Args:
-        embedding: Raw embedding vector
-        
-    Returns:
-        Normalized embedding vector
-    """
-    embedding_array = np.array(embedding)
-    norm = np.linalg.norm(embedding_array)
-    if norm == 0:
-        return embedding
-    return (embedding_array / norm).tolist()
+def is_rate_limited(error: Exception) -> bool:
+    """True for quota / rate-limit errors (HTTP 429): the request was fine, the provider wants us to slow down."""
+    return provider.is_rate_limited(error)
 
 
-def generate_embedding(text: str) -> List[float]:
+def generate_embedding(text: str) -> np.ndarray:
     """
-    Generate a vector embedding for the given text using Google Gemini.
+    Generate a vector embedding for the given text with the configured provider.
     
     Args:
         text: The text to embed (will be truncated if too long)
         
     Returns:
-        List of 768 floats representing the normalized embedding
+        Normalized float32 embedding of provider.dimensions values
     """
     # Validate input
     if not text or not text.strip():
         print("WARNING: Empty text provided for embedding, returning zero vector")
-        return [0.0] * OUTPUT_DIMENSIONS
+        return np.zeros(provider.dimensions, dtype=np.float32)
+    
+    # Truncate here too so the cache key matches what is sent
+    text = text[:EMBEDDING_MAX_CHARS]
     
-    # Truncate text if too long (Gemini supports up to 2048 tokens)
-    max_chars = 8000  # Conservative estimate: ~4 chars per token
-    if len(text) > max_chars:
-        text = text[:max_chars]
+    # Identical text (same model and settings) is only embedded once
+    key = cache_key(provider.model, provider.dimensions, TASK_TYPE, text)
+    cached = embedding_cache.get_many([key])
+    if key in cached:
+        return cached[key]
     
-    print(f"DEBUG: Generating Gemini embedding for text ({len(text)} chars)")
+    print(f"DEBUG: Generating {provider.name} embedding for text ({len(text)} chars)")
     try:
-        result = genai.embed_content(
-            model=EMBEDDING_MODEL,
-            content=text,
-            task_type="retrieval_document",  # Optimized for document indexing
-            output_dimensionality=OUTPUT_DIMENSIONS
-        )
+        embedding = provider.embed_one(text, TASK_TYPE)
+        embedding_cache.put_many({key: embedding}, provider.model, provider.dimensions, TASK_TYPE)
         
-        # Normalize for accurate cosine similarity (required for non-3072 dimensions)
-        embedding = normalize_embedding(result['embedding'])
-        
-        print(f"DEBUG: Gemini embedding generation finished ({len(embedding)} dims)")
+        print(f"DEBUG: {provider.name} embedding generation finished ({len(embedding)} dims)")
         return embedding
     except Exception as e:
-        print(f"DEBUG: Gemini embedding generation failed: {str(e)}")
+        print(f"DEBUG: {provider.name} embedding generation failed: {str(e)}")
         raise e
 
 
-def generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
+def generate_embeddings_batch(texts: List[str], raise_errors: bool = False) -> List[Optional[np.ndarray]]:
     """
-    Generate embeddings for multiple texts.
+    Generate embeddings for multiple texts with the batch endpoint.
     
-    Note: Processing individually for now. Could optimize with batch API later.
+    Cached texts are served from the embedding cache; the rest are sent once
+    each (duplicates share a request slot), one provider request per
+    EMBEDDING_BATCH_SIZE texts. Empty texts get the zero vector without
+    a request, like generate_embedding.
     
     Args:
         texts: List of texts to embed
+        raise_errors: Raise the provider error instead of returning None for a failed batch
         
     Returns:
-        List of embeddings (each is a list of 768 floats)
+        List of normalized float32 embeddings, aligned with texts; None where a batch failed
     """
-    embeddings = []
-    max_chars = 8000
+    embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
     
+    # cache key -> (truncated text, indexes of texts with that content)
+    pending: Dict[str, tuple] = {}
     for i, text in enumerate(texts):
-        truncated_text = text[:max_chars] if len(text) > max_chars else text
+        if not text or not text.strip():
+            embeddings[i] = np.zeros(provider.dimensions, dtype=np.float32)
+            continue
+        truncated_text = text[:EMBEDDING_MAX_CHARS]
+        key = cache_key(provider.model, provider.dimensions, TASK_TYPE, truncated_text)
+        pending.setdefault(key, (truncated_text, []))[1].append(i)
+    
+    for key, embedding in embedding_cache.get_many(list(pending)).items():
+        for i in pending.pop(key)[1]:
+            embeddings[i] = embedding
+    
+    requests = list(pending.items())
+    for start in range(0, len(requests), EMBEDDING_BATCH_SIZE):
+        batch = requests[start:start + EMBEDDING_BATCH_SIZE]
         try:
-            result = genai.embed_content(
-                model=EMBEDDING_MODEL,
-                content=truncated_text,
-                task_type="retrieval_document",
-                output_dimensionality=OUTPUT_DIMENSIONS
-            )
-            # Normalize each embedding
-            embedding = normalize_embedding(result['embedding'])
-            embeddings.append(embedding)
-            print(f"DEBUG: Batch embedding {i+1}/{len(texts)} completed")
+            vectors = provider.embed([text for _, (text, _) in batch], TASK_TYPE)
+            fresh = {}
+            for (key, (_, indexes)), embedding in zip(batch, vectors):
+                fresh[key] = embedding
+                for i in indexes:
+                    embeddings[i] = embedding
+            embedding_cache.put_many(fresh, provider.model, provider.dimensions, TASK_TYPE)
+            print(f"DEBUG: Batch embedding of {len(batch)} texts completed")
         except Exception as e:
-            print(f"DEBUG: Batch embedding {i+1} failed: {str(e)}")
-            # Append None to maintain index alignment
-            embeddings.append(None)
+            # Leave None to maintain index alignment
+            print(f"DEBUG: Batch embedding of {len(batch)} texts failed: {str(e)}")
+            if raise_errors:
+                raise
     
     return embeddings
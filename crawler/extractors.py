@@ -4,21 +4,26 @@ Implements multiple fallback strategies for extracting content from various docu
 """
 
 import re
-from typing import Optional, List, Dict, Any
-from bs4 import BeautifulSoup
+import bisect
+from typing import Optional, List, Dict, Any, Tuple
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup, Tag
 
 
 # ==================== TITLE EXTRACTION ====================
 
 def extract_title(soup: BeautifulSoup) -> str:
     """Extract page title with fallback strategies."""
+    return _title_from(soup.find("h1"), soup.find("title"))
+
+
+def _title_from(h1: Optional[Tag], title_tag: Optional[Tag]) -> str:
     # Strategy 1: h1 element
-    h1 = soup.find("h1")
     if h1:
         return h1.get_text(strip=True)
     
     # Strategy 2: title tag
-    title_tag = soup.find("title")
     if title_tag:
         title_text = title_tag.get_text(strip=True)
         # Remove common suffixes like " | Docs" or " - Documentation"
@@ -42,23 +47,28 @@ BREADCRUMB_SELECTORS = [
 ]
 
 
+def _build_breadcrumbs(elements: List[Tag], base_url: str) -> List[Dict[str, str]]:
+    """Turn matched breadcrumb links into [{"text", "href"}], skipping empty labels."""
+    breadcrumbs = []
+    for el in elements:
+        href = el.get("href", "")
+        text = el.get_text(strip=True)
+        if text:
+            # Make relative URLs absolute
+            if href and not href.startswith(("http://", "https://")):
+                if href.startswith("/"):
+                    href = urljoin(base_url, href)
+            breadcrumbs.append({"text": text, "href": href})
+    return breadcrumbs
+
+
 def extract_breadcrumbs(soup: BeautifulSoup, base_url: str) -> List[Dict[str, str]]:
     """Extract breadcrumbs with fallback selectors."""
     for selector in BREADCRUMB_SELECTORS:
         try:
             elements = soup.select(selector)
             if elements:
-                breadcrumbs = []
-                for el in elements:
-                    href = el.get("href", "")
-                    text = el.get_text(strip=True)
-                    if text:
-                        # Make relative URLs absolute
-                        if href and not href.startswith(("http://", "https://")):
-                            if href.startswith("/"):
-                                from urllib.parse import urljoin
-                                href = urljoin(base_url, href)
-                        breadcrumbs.append({"text": text, "href": href})
+                breadcrumbs = _build_breadcrumbs(elements, base_url)
                 if breadcrumbs:
                     return breadcrumbs
         except Exception:
@@ -134,6 +144,11 @@ def extract_main_content(soup: BeautifulSoup) -> tuple[str, str]:
         except Exception:
             continue
     
+    return _serialize_content(content_element)
+
+
+def _serialize_content(content_element) -> tuple[str, str]:
+    """Return (content_text, content_html) for the cleaned content element."""
     # Get HTML and text
     content_html = str(content_element)
     content_text = content_element.get_text(separator="\n", strip=True)
@@ -147,51 +162,56 @@ def extract_main_content(soup: BeautifulSoup) -> tuple[str, str]:
 
 # ==================== LINK EXTRACTION ====================
 
+# Skip common non-documentation paths
+LINK_SKIP_PATTERNS = [
+    "/api/",
+    "/auth/",
+    "/login",
+    "/signup",
+    "/search",
+    ".pdf",
+    ".zip",
+    ".tar",
+    ".png",
+    ".jpg",
+    ".gif",
+    ".svg",
+]
+
+
+def _normalize_link(href: str, base_url: str, allowed_domain: str) -> Optional[str]:
+    """Absolute, fragment-free URL for an internal documentation link, or None to skip it."""
+    # Skip anchors, javascript, mailto, etc.
+    if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+        return None
+    
+    # Make absolute
+    absolute_url = urljoin(base_url, href)
+    
+    # Parse and validate
+    parsed = urlparse(absolute_url)
+    
+    # Must be same domain
+    if allowed_domain not in parsed.netloc:
+        return None
+    
+    # Remove fragment
+    clean_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    
+    if any(pattern in clean_url.lower() for pattern in LINK_SKIP_PATTERNS):
+        return None
+    
+    return clean_url
+
+
 def extract_internal_links(soup: BeautifulSoup, base_url: str, allowed_domain: str) -> List[str]:
     """Extract internal documentation links."""
-    from urllib.parse import urljoin, urlparse
-    
     links = set()
     
     for a_tag in soup.find_all("a", href=True):
-        href = a_tag.get("href", "")
-        
-        # Skip anchors, javascript, mailto, etc.
-        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
-            continue
-        
-        # Make absolute
-        absolute_url = urljoin(base_url, href)
-        
-        # Parse and validate
-        parsed = urlparse(absolute_url)
-        
-        # Must be same domain
-        if allowed_domain not in parsed.netloc:
-            continue
-        
-        # Remove fragment
-        clean_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-        
-        # Skip common non-documentation paths
-        skip_patterns = [
-            "/api/",
-            "/auth/",
-            "/login",
-            "/signup",
-            "/search",
-            ".pdf",
-            ".zip",
-            ".tar",
-            ".png",
-            ".jpg",
-            ".gif",
-            ".svg",
-        ]
-        if any(pattern in clean_url.lower() for pattern in skip_patterns):
-            continue
-        
-        links.add(clean_url)
+        clean_url = _normalize_link(a_tag.get("href", ""), base_url, allowed_domain)
+        if clean_url:
+            links.add(clean_url)
     
     return list(links)
 
@@ -231,28 +251,357 @@ def extract_table_of_contents(soup: BeautifulSoup) -> List[Dict[str, Any]]:
 
 def extract_metadata(soup: BeautifulSoup) -> Dict[str, Any]:
     """Extract page metadata."""
+    return _metadata_from(soup.find_all("meta"))
+
+
+def _find_meta(metas: List[Tag], attr: str, value: str) -> Optional[Tag]:
+    for tag in metas:
+        if tag.get(attr) == value:
+            return tag
+    return None
+
+
+def _metadata_from(metas: List[Tag]) -> Dict[str, Any]:
+    """Metadata from the page's <meta> tags (in document order)."""
     metadata = {}
     
     # Description
-    desc_tag = soup.find("meta", attrs={"name": "description"})
+    desc_tag = _find_meta(metas, "name", "description")
     if desc_tag:
         metadata["description"] = desc_tag.get("content", "")
     
     # Keywords
-    keywords_tag = soup.find("meta", attrs={"name": "keywords"})
+    keywords_tag = _find_meta(metas, "name", "keywords")
     if keywords_tag:
         metadata["keywords"] = keywords_tag.get("content", "")
     
     # Last modified
     for attr in ["dateModified", "date-modified", "last-modified"]:
-        mod_tag = soup.find("meta", attrs={"name": attr}) or soup.find("meta", attrs={"property": attr})
+        mod_tag = _find_meta(metas, "name", attr) or _find_meta(metas, "property", attr)
         if mod_tag:
             metadata["last_modified"] = mod_tag.get("content", "")
             break
     
     # Author
-    author_tag = soup.find("meta", attrs={"name": "author"})
+    author_tag = _find_meta(metas, "name", "author")
     if author_tag:
         metadata["author"] = author_tag.get("content", "")
     
     return metadata
+
+
+# ==================== SINGLE-PASS EXTRACTION ====================
+
+# Simple CSS selector: optional tag, then any number of .class / #id / [attr='value'] parts
+_SIMPLE_SELECTOR_RE = re.compile(
+    r"^(?P<tag>[a-zA-Z][\w-]*)?(?P<rest>(?:[.#][\w-]+|\[[\w-]+=(?:'[^']*'|\"[^\"]*\"|[\w-]+)\])*)$"
+)
+_SELECTOR_PART_RE = re.compile(r"([.#])([\w-]+)|\[([\w-]+)=(?:'([^']*)'|\"([^\"]*)\"|([\w-]+))\]")
+
+
+class SimpleSelector:
+    """A compound selector (tag, classes, id, exact attribute values) matched without soupsieve."""
+
+    def __init__(self, tag: Optional[str], classes: List[str], ids: List[str], attrs: List[Tuple[str, str]]):
+        self.tag = tag
+        self.classes = classes
+        self.ids = ids
+        self.attrs = attrs
+
+    @classmethod
+    def parse(cls, selector: str) -> Optional["SimpleSelector"]:
+        match = _SIMPLE_SELECTOR_RE.match(selector)
+        if not match or not selector:
+            return None
+        classes, ids, attrs = [], [], []
+        for prefix, name, attr, quoted, dquoted, bare in _SELECTOR_PART_RE.findall(match.group("rest") or ""):
+            if prefix == ".":
+                classes.append(name)
+            elif prefix == "#":
+                ids.append(name)
+            else:
+                attrs.append((attr.lower(), quoted or dquoted or bare))
+        tag = match.group("tag")
+        return cls(tag.lower() if tag else None, classes, ids, attrs)
+
+    def matches(self, name: str, attrs: Dict[str, Any]) -> bool:
+        if self.tag is not None and name != self.tag:
+            return False
+        if self.classes:
+            tag_classes = attrs.get("class") or ()
+            if any(c not in tag_classes for c in self.classes):
+                return False
+        for value in self.ids:
+            if attrs.get("id") != value:
+                return False
+        for attr, value in self.attrs:
+            actual = attrs.get(attr)
+            if isinstance(actual, list):
+                actual = " ".join(actual)
+            if actual != value:
+                return False
+        return True
+
+
+class CompiledSelector:
+    """`subject` or `ancestor subject`; anything more complex is left to soupsieve (compiled is False)."""
+
+    def __init__(self, selector: str):
+        self.selector = selector
+        self.ancestor: Optional[SimpleSelector] = None
+        self.subject: Optional[SimpleSelector] = None
+        parts = selector.split()
+        if len(parts) == 1:
+            self.subject = SimpleSelector.parse(parts[0])
+        elif len(parts) == 2:
+            self.ancestor = SimpleSelector.parse(parts[0])
+            self.subject = SimpleSelector.parse(parts[1]) if self.ancestor else None
+        self.compiled = self.subject is not None
+
+
+def compile_selectors(selectors: List[str]) -> List[CompiledSelector]:
+    return [CompiledSelector(selector) for selector in selectors]
+
+
+class SelectorIndex:
+    """
+    Buckets simple selectors by their most selective key (id, class,
+    attribute name or tag) so each element is only tested against the
+    few selectors that could possibly match it.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[str, List[Tuple[SimpleSelector, Any]]] = {}
+        self.by_class: Dict[str, List[Tuple[SimpleSelector, Any]]] = {}
+        self.by_attr: Dict[str, List[Tuple[SimpleSelector, Any]]] = {}
+        self.by_tag: Dict[str, List[Tuple[SimpleSelector, Any]]] = {}
+        self.universal: List[Tuple[SimpleSelector, Any]] = []
+
+    def add(self, selector: SimpleSelector, payload: Any) -> None:
+        entry = (selector, payload)
+        if selector.ids:
+            self.by_id.setdefault(selector.ids[0], []).append(entry)
+        elif selector.classes:
+            self.by_class.setdefault(selector.classes[0], []).append(entry)
+        elif selector.attrs:
+            self.by_attr.setdefault(selector.attrs[0][0], []).append(entry)
+        elif selector.tag:
+            self.by_tag.setdefault(selector.tag, []).append(entry)
+        else:
+            self.universal.append(entry)
+
+    def matches(self, name: str, attrs: Dict[str, Any]) -> List[Any]:
+        """Payloads of every indexed selector matching the element."""
+        candidates = list(self.universal)
+        candidates.extend(self.by_tag.get(name, ()))
+        if attrs:
+            if self.by_id and "id" in attrs:
+                candidates.extend(self.by_id.get(attrs["id"], ()))
+            classes = attrs.get("class")
+            if classes:
+                for cls in classes:
+                    candidates.extend(self.by_class.get(cls, ()))
+            for attr in attrs:
+                if attr in self.by_attr:
+                    candidates.extend(self.by_attr[attr])
+        return [payload for selector, payload in candidates if selector.matches(name, attrs)]
+
+
+class PageExtraction:
+    """Everything the crawler extracts from one page."""
+    def __init__(
+        self,
+        title: str,
+        breadcrumbs: List[Dict[str, str]],
+        content_text: str,
+        content_html: str,
+        links: List[str],
+        metadata: Dict[str, Any],
+    ):
+        self.title = title
+        self.breadcrumbs = breadcrumbs
+        self.content_text = content_text
+        self.content_html = content_html
+        self.links = links
+        self.metadata = metadata
+
+
+class ExtractionEngine:
+    """
+    Extracts title, breadcrumbs, main content, links and metadata in one walk.
+
+    The individual extract_* functions each re-scan the tree once per
+    selector (40+ full scans per page). The engine compiles the selector
+    lists once and classifies every element during a single pre-order
+    walk, then applies the same precedence rules as those functions, so
+    the output (including content_html, and therefore content_hash) is
+    identical to calling them in the crawler's order.
+    """
+
+    def __init__(
+        self,
+        breadcrumb_selectors: List[str] = BREADCRUMB_SELECTORS,
+        content_selectors: List[str] = CONTENT_SELECTORS,
+        unwanted_selectors: List[str] = UNWANTED_SELECTORS,
+    ):
+        self.breadcrumb_selectors = compile_selectors(breadcrumb_selectors)
+        self.content_selectors = compile_selectors(content_selectors)
+        self.unwanted_selectors = compile_selectors(unwanted_selectors)
+
+        # Payloads: ("crumb", i) / ("content", i) / ("unwanted", i) for subjects,
+        # ("open", i) for the ancestor part of a compiled breadcrumb selector
+        self.index = SelectorIndex()
+        for kind, selectors in (
+            ("crumb", self.breadcrumb_selectors),
+            ("content", self.content_selectors),
+            ("unwanted", self.unwanted_selectors),
+        ):
+            for i, sel in enumerate(selectors):
+                if sel.compiled:
+                    self.index.add(sel.subject, (kind, i))
+                    if sel.ancestor:
+                        self.index.add(sel.ancestor, ("open", i))
+
+    def extract(self, soup: BeautifulSoup, base_url: str, allowed_domain: str) -> PageExtraction:
+        breadcrumb_matches: List[List[Tag]] = [[] for _ in self.breadcrumb_selectors]
+        content_first: List[Optional[Tag]] = [None] * len(self.content_selectors)
+        unwanted: List[Tag] = []
+        anchors: List[Tag] = []
+        metas: List[Tag] = []
+        first: Dict[str, Tag] = {}
+
+        # Pre-order position of each element and of its last descendant, for "is inside" checks
+        start: Dict[int, int] = {}
+        end: Dict[int, int] = {}
+        open_ancestors = [0] * len(self.breadcrumb_selectors)
+
+        position = 0
+        stack: List[Any] = [(soup, None)]
+        while stack:
+            node, opened = stack.pop()
+            if opened is not None:
+                # Leaving a subtree
+                end[id(node)] = position - 1
+                for i in opened:
+                    open_ancestors[i] -= 1
+                continue
+
+            if node is not soup:
+                name = node.name
+                attrs = node.attrs
+                start[id(node)] = position
+                position += 1
+
+                if name not in first and name in ("h1", "title", "body"):
+                    first[name] = node
+                if name == "a":
+                    if attrs.get("href") is not None:
+                        anchors.append(node)
+                elif name == "meta":
+                    metas.append(node)
+
+                opened = []
+                is_unwanted = False
+                for kind, i in self.index.matches(name, attrs):
+                    if kind == "crumb":
+                        if self.breadcrumb_selectors[i].ancestor is None or open_ancestors[i]:
+                            breadcrumb_matches[i].append(node)
+                    elif kind == "content":
+                        if content_first[i] is None:
+                            content_first[i] = node
+                    elif kind == "unwanted":
+                        is_unwanted = True
+                    else:
+                        opened.append(i)
+                if is_unwanted:
+                    unwanted.append(node)
+                for i in opened:
+                    open_ancestors[i] += 1
+            else:
+                opened = []
+
+            stack.append((node, opened))
+            stack.extend((child, None) for child in reversed(node.contents) if isinstance(child, Tag))
+        end[id(soup)] = position - 1
+        start[id(soup)] = -1
+
+        # Title, as extract_title
+        title = _title_from(first.get("h1"), first.get("title"))
+
+        # Breadcrumbs, as extract_breadcrumbs: first selector whose matches carry text
+        breadcrumbs: List[Dict[str, str]] = []
+        for i, sel in enumerate(self.breadcrumb_selectors):
+            try:
+                elements = breadcrumb_matches[i] if sel.compiled else soup.select(sel.selector)
+                if elements:
+                    breadcrumbs = _build_breadcrumbs(elements, base_url)
+                    if breadcrumbs:
+                        break
+            except Exception:
+                continue
+
+        # Content container, as extract_main_content
+        content_element = None
+        for i, sel in enumerate(self.content_selectors):
+            try:
+                element = content_first[i] if sel.compiled else soup.select_one(sel.selector)
+            except Exception:
+                continue
+            if element:
+                content_element = element
+                break
+        if not content_element:
+            content_element = first.get("body") or soup
+
+        # Unwanted elements strictly inside the container; only the outermost ones need removing
+        for sel in self.unwanted_selectors:
+            if not sel.compiled:
+                try:
+                    unwanted.extend(content_element.select(sel.selector))
+                except Exception:
+                    continue
+        lo, hi = start[id(content_element)], end[id(content_element)]
+        removed: List[Tag] = []
+        removed_starts: List[int] = []
+        removed_ends: List[int] = []
+        for el in sorted(unwanted, key=lambda el: start[id(el)]):
+            pos = start[id(el)]
+            if not lo < pos <= hi or (removed_ends and pos <= removed_ends[-1]):
+                continue
+            removed.append(el)
+            removed_starts.append(pos)
+            removed_ends.append(end[id(el)])
+
+        def is_removed(el: Tag) -> bool:
+            pos = start[id(el)]
+            i = bisect.bisect_right(removed_starts, pos) - 1
+            return i >= 0 and pos <= removed_ends[i]
+
+        # Links and metadata are read after the removal in the crawler, so skip removed subtrees
+        links = set()
+        for a_tag in anchors:
+            if removed and is_removed(a_tag):
+                continue
+            clean_url = _normalize_link(a_tag.get("href", ""), base_url, allowed_domain)
+            if clean_url:
+                links.add(clean_url)
+        metadata = _metadata_from([m for m in metas if not (removed and is_removed(m))])
+
+        for el in removed:
+            el.decompose()
+        content_text, content_html = _serialize_content(content_element)
+
+        return PageExtraction(title, breadcrumbs, content_text, content_html, list(links), metadata)
+
+
+engine = ExtractionEngine()
+
+
+def extract_page(soup: BeautifulSoup, base_url: str, allowed_domain: str) -> PageExtraction:
+    """
+    Single-pass equivalent of extract_title, extract_breadcrumbs,
+    extract_main_content, extract_internal_links and extract_metadata
+    (called in that order). Like extract_main_content, it removes the
+    unwanted elements from the soup.
+    """
+    return engine.extract(soup, base_url, allowed_domain)
@@ -0,0 +1,82 @@
+"""
+Knowledge Reset Crawler - HTTP Fetch Tier
+Plain HTTP fetching with pooled keep-alive connections; Playwright is only needed for JS-rendered pages.
+"""
+
+import re
+from typing import Optional, Dict
+
+import httpx
+
+
+# How pages are fetched:
+#   auto    - HTTP first, escalate to the browser when the static HTML has no usable content
+#   http    - HTTP only (never launches Chromium)
+#   browser - always render with Playwright
+FETCH_MODES = ("auto", "http", "browser")
+
+MIN_STATIC_CONTENT_CHARS = 200  # Less main-content text than this suggests client-side rendering
+HTTP_ESCALATE_STATUSES = (403,)  # Often bot protection that a real browser gets past
+
+JS_REQUIRED_PATTERN = re.compile(
+    r"(enable|requires?)\s+javascript|javascript\s+(is\s+)?(required|disabled)",
+    re.IGNORECASE,
+)
+
+DEFAULT_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+class FetchResponse:
+    """Raw result of an HTTP fetch."""
+    def __init__(self, url: str, status: int, html: str, headers: Dict[str, str]):
+        self.url = url
+        self.status = status
+        self.html = html
+        self.headers = headers
+
+    @property
+    def is_html(self) -> bool:
+        content_type = self.headers.get("content-type", "text/html").lower()
+        return "html" in content_type
+
+
+class HttpFetcher:
+    """Async HTTP client shared by all workers of a crawl job."""
+
+    def __init__(self, user_agent: str, timeout_ms: int = 30000, max_connections: int = 10):
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": user_agent, **DEFAULT_HEADERS},
+            timeout=timeout_ms / 1000,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResponse:
+        """GET a URL. Network errors propagate to the caller."""
+        response = await self.client.get(url, headers=headers)
+        return FetchResponse(
+            url=str(response.url),
+            status=response.status_code,
+            html=response.text,
+            headers={k.lower(): v for k, v in response.headers.items()},
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def needs_browser(content_text: str) -> bool:
+    """
+    Heuristic: does statically fetched HTML need JavaScript rendering?
+    True when the extracted main content is (nearly) empty or is a "please enable JavaScript" notice.
+    """
+    text = content_text.strip()
+    if len(text) < MIN_STATIC_CONTENT_CHARS:
+        return True
+    return len(text) < 1000 and bool(JS_REQUIRED_PATTERN.search(text))
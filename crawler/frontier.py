@@ -0,0 +1,110 @@
+"""
+Knowledge Reset Crawler - Crawl Frontier
+Deduplicated URL frontier with pluggable priority ordering.
+"""
+
+import heapq
+import itertools
+from collections import deque
+from typing import Optional, Dict, List, Set, Tuple
+
+
+# Supported priority strategies:
+#   depth    - breadth-first, shallow pages first (FIFO deque, O(1) dequeue)
+#   sitemap  - highest sitemap <priority> first, then shallowest
+#   inlinks  - most-linked-to pages first, then shallowest
+FRONTIER_PRIORITIES = ("depth", "sitemap", "inlinks")
+
+DEFAULT_SITEMAP_PRIORITY = 0.5  # Sitemap protocol default when <priority> is absent
+
+
+class CrawlFrontier:
+    """
+    Queue of URLs waiting to be crawled.
+
+    Every URL is admitted at most once: the seen-set covers both queued and
+    already visited URLs, so re-discovering a link from another page never
+    grows the queue. Memory stays proportional to the number of distinct URLs.
+    """
+
+    def __init__(self, priority: str = "depth"):
+        if priority not in FRONTIER_PRIORITIES:
+            raise ValueError(f"Unknown frontier priority: {priority}")
+        self.priority = priority
+
+        self.seen: Set[str] = set()  # Queued or visited
+        self.depths: Dict[str, int] = {}  # Depth of URLs still queued
+        self.inlinks: Dict[str, int] = {}  # In-link counts of URLs still queued
+        self.sitemap_priorities: Dict[str, float] = {}
+
+        self._fifo: deque = deque()
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()  # Tie-breaker keeps insertion order stable
+
+    def __len__(self) -> int:
+        return len(self.depths)
+
+    def __bool__(self) -> bool:
+        return bool(self.depths)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.seen
+
+    def _push(self, url: str) -> None:
+        depth = self.depths[url]
+        if self.priority == "depth":
+            self._fifo.append(url)
+            return
+
+        if self.priority == "sitemap":
+            rank = -self.sitemap_priorities.get(url, DEFAULT_SITEMAP_PRIORITY)
+        else:
+            rank = -self.inlinks.get(url, 0)
+        heapq.heappush(self._heap, (rank, depth, next(self._counter), url))
+
+    def add(self, url: str, depth: int, sitemap_priority: Optional[float] = None) -> bool:
+        """
+        Queue a URL unless it has already been queued or visited.
+
+        Returns True when the URL was newly queued. Re-discovering a queued URL
+        only bumps its in-link count (and its rank under "inlinks").
+        """
+        if url in self.seen:
+            if url in self.depths:
+                count = self.inlinks.get(url, 0) + 1
+                self.inlinks[url] = count
+                # Re-rank lazily at powers of two so stale heap entries stay O(log n) per URL
+                if self.priority == "inlinks" and count & (count - 1) == 0:
+                    self._push(url)
+            return False
+
+        self.seen.add(url)
+        self.depths[url] = depth
+        self.inlinks[url] = 1
+        if sitemap_priority is not None:
+            self.sitemap_priorities[url] = sitemap_priority
+        self._push(url)
+        return True
+
+    def mark_visited(self, url: str) -> None:
+        """Record a URL reached outside the frontier (e.g. after a redirect)."""
+        self.seen.add(url)
+
+    def pop(self) -> Optional[Tuple[str, int]]:
+        """Remove and return the next (url, depth), or None when empty."""
+        while self._fifo or self._heap:
+            if self._fifo:
+                url = self._fifo.popleft()
+            else:
+                url = heapq.heappop(self._heap)[-1]
+
+            # Skip stale heap entries left behind by re-ranking
+            if url not in self.depths:
+                continue
+
+            depth = self.depths.pop(url)
+            self.inlinks.pop(url, None)
+            self.sitemap_priorities.pop(url, None)
+            return url, depth
+
+        return None
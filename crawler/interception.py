@@ -0,0 +1,117 @@
+"""
+Knowledge Reset Crawler - Browser Request Interception
+Aborts browser requests the extractor never needs (images, fonts, media, trackers) and counts them per job.
+"""
+
+from typing import Optional, Dict, Iterable
+from urllib.parse import urlparse
+
+
+# Playwright resource types blocked by default; documents, scripts and XHR are always allowed
+DEFAULT_BLOCKED_RESOURCE_TYPES = ("image", "media", "font")
+
+# Analytics, ads and chat widgets: never needed for text and the usual reason networkidle stalls
+DEFAULT_BLOCKED_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "segment.com",
+    "segment.io",
+    "mixpanel.com",
+    "amplitude.com",
+    "intercom.io",
+    "intercomcdn.com",
+    "hs-scripts.com",
+    "hs-analytics.net",
+    "clarity.ms",
+    "fullstory.com",
+    "nr-data.net",
+    "newrelic.com",
+    "sentry.io",
+    "plausible.io",
+    "heapanalytics.com",
+    "cookielaw.org",
+    "onetrust.com",
+)
+
+
+class RequestInterceptor:
+    """
+    Route handler for a browser context.
+
+    Blocks configured resource types, known tracker hosts and (optionally)
+    every third-party host, while counting what was blocked and how many
+    bytes the allowed responses declared.
+    """
+
+    def __init__(
+        self,
+        allowed_domain: str,
+        blocked_resource_types: Optional[Iterable[str]] = None,
+        blocked_hosts: Optional[Iterable[str]] = None,
+        block_third_party: bool = False,
+    ):
+        self.allowed_domain = allowed_domain
+        self.blocked_resource_types = set(
+            DEFAULT_BLOCKED_RESOURCE_TYPES if blocked_resource_types is None else blocked_resource_types
+        )
+        self.blocked_hosts = tuple(DEFAULT_BLOCKED_HOSTS if blocked_hosts is None else blocked_hosts)
+        self.block_third_party = block_third_party
+
+        # Per-job counters
+        self.blocked_requests = 0
+        self.blocked_by_type: Dict[str, int] = {}
+        self.allowed_requests = 0
+        self.bytes_loaded = 0
+
+    def _host_matches(self, host: str, suffixes: Iterable[str]) -> bool:
+        return any(host == suffix or host.endswith("." + suffix) for suffix in suffixes)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """Decide whether a browser request can be skipped."""
+        if resource_type == "document":
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+
+        host = urlparse(url).hostname or ""
+        if self._host_matches(host, self.blocked_hosts):
+            return True
+        if self.block_third_party and self.allowed_domain not in host:
+            return True
+        return False
+
+    async def handle(self, route) -> None:
+        """Playwright route handler (register with context.route("**/*", ...))."""
+        request = route.request
+        try:
+            if self.should_block(request.resource_type, request.url):
+                self.blocked_requests += 1
+                self.blocked_by_type[request.resource_type] = self.blocked_by_type.get(request.resource_type, 0) + 1
+                await route.abort()
+            else:
+                self.allowed_requests += 1
+                await route.continue_()
+        except Exception:
+            # The page may have navigated away or closed while the request was pending
+            pass
+
+    def record_response(self, response) -> None:
+        """Response listener adding the declared size of every allowed response."""
+        try:
+            self.bytes_loaded += int(response.headers.get("content-length", 0))
+        except (ValueError, TypeError):
+            pass
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_type": self.blocked_by_type,
+            "browser_requests": self.allowed_requests,
+            "browser_bytes_loaded": self.bytes_loaded,
+        }
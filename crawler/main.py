@@ -4,9 +4,11 @@ REST API for managing crawler jobs.
 """
 
 import asyncio
-from typing import Optional
+import os
+from contextlib import asynccontextmanager
+from typing import Optional, List
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 import uvicorn
 
 from db import (
@@ -17,12 +19,42 @@ from db import (
     get_crawl_errors,
     update_application_last_crawl,
 )
-from crawler import start_crawl
+from crawler import start_crawl, MAX_CONCURRENCY
+from frontier import FRONTIER_PRIORITIES
+from fetcher import FETCH_MODES
+from browser_pool import BrowserPool
+from parse_pool import pool as parse_pool
+from embedding_cache import cache as embedding_cache
+from checkpoint import find_resumable_job
+
+# "inline" runs jobs in this process via BackgroundTasks; "queue" only enqueues them for worker.py
+CRAWL_EXECUTION_MODE = os.getenv("CRAWL_EXECUTION_MODE", "inline").lower()
+
+# Warm Chromium shared by all jobs in this instance (disable with BROWSER_POOL_ENABLED=false)
+BROWSER_POOL_ENABLED = os.getenv("BROWSER_POOL_ENABLED", "true").lower() == "true" and CRAWL_EXECUTION_MODE == "inline"
+browser_pool: Optional[BrowserPool] = BrowserPool() if BROWSER_POOL_ENABLED else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Launch the browser pool at startup; close it and the extraction pool at shutdown."""
+    if browser_pool:
+        try:
+            await browser_pool.start()
+        except Exception as e:
+            # Jobs can still start it lazily on their first lease
+            print(f"DEBUG: Browser pool warm-up failed: {str(e)}")
+    yield
+    if browser_pool:
+        await browser_pool.stop()
+    parse_pool.shutdown()
+
 
 app = FastAPI(
     title="Knowledge Reset Crawler",
     description="Web crawler service for Knowledge Reset knowledge base",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -37,6 +69,19 @@ class CrawlRequest(BaseModel):
     delay_ms: int = 1000
     timeout_ms: int = 30000
     max_runtime_seconds: int = 3600
+    concurrency: int = Field(4, ge=1, le=MAX_CONCURRENCY)  # Pages fetched in parallel within the job
+    frontier_priority: str = "depth"  # depth, sitemap or inlinks
+    respect_robots: bool = True
+    use_sitemap: bool = True  # Seed from sitemap.xml and skip unchanged <lastmod> entries
+    fetch_mode: Optional[str] = None  # auto, http or browser; defaults to the app's settings.fetch_mode
+    conditional_requests: bool = True  # Revalidate with ETag / Last-Modified; False forces a full re-extract
+    block_resources: bool = True  # Abort browser requests the extractor never needs
+    blocked_resource_types: Optional[List[str]] = None  # Playwright resource types; default image, media, font
+    block_third_party: bool = False
+    checkpoint_interval_seconds: int = 60  # 0 disables checkpointing
+    resume: bool = False  # Continue the app's last unfinished crawl from its checkpoint
+    readiness_quiet_ms: int = 300  # Rendered page is ready once content exists and the DOM is quiet this long
+    readiness_max_wait_ms: int = 5000
 
 
 class CrawlResponse(BaseModel):
@@ -63,6 +108,7 @@ async def run_crawl_job(job_id: str, tenant_id: str, app_id: str, url: str, conf
             job_id=job_id,
             base_url=url,
             config=config,
+            browser_pool=browser_pool,
         )
         # Update application's last_crawl_at
         update_application_last_crawl(app_id)
@@ -78,6 +124,20 @@ async def root():
     return {"status": "healthy", "service": "Knowledge Reset Crawler"}
 
 
+@app.get("/api/crawler/browser-pool")
+async def get_browser_pool_stats():
+    """Browser pool state: live browsers, leased contexts, pages rendered and memory."""
+    if not browser_pool:
+        return {"enabled": False}
+    return {"enabled": True, **browser_pool.stats()}
+
+
+@app.get("/api/crawler/embedding-cache")
+async def get_embedding_cache_stats():
+    """Embedding cache hit rates for this process."""
+    return embedding_cache.stats()
+
+
 @app.get("/test-pw")
 async def test_pw():
     results = {}
@@ -120,7 +180,8 @@ async def start_crawler(request: CrawlRequest, background_tasks: BackgroundTasks
     """
     Start a new crawl job.
     
-    This endpoint creates a crawl job and starts it in the background.
+    This endpoint creates a crawl job and starts it in the background
+    (or, with CRAWL_EXECUTION_MODE=queue, leaves it for a queue worker).
     Use the returned job_id to check status.
     """
     # Get application details
@@ -136,6 +197,13 @@ async def start_crawler(request: CrawlRequest, background_tasks: BackgroundTasks
     if not crawl_url:
         raise HTTPException(status_code=400, detail="No URL provided and application has no url_doc_base")
     
+    fetch_mode = request.fetch_mode or (app.get("settings") or {}).get("fetch_mode", "auto")
+    if fetch_mode not in FETCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown fetch_mode: {fetch_mode}")
+    
+    if request.frontier_priority not in FRONTIER_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown frontier_priority: {request.frontier_priority}")
+    
     # Create crawl job
     config = {
         "max_depth": request.max_depth,
@@ -143,10 +211,35 @@ async def start_crawler(request: CrawlRequest, background_tasks: BackgroundTasks
         "delay_ms": request.delay_ms,
         "timeout_ms": request.timeout_ms,
         "max_runtime_seconds": request.max_runtime_seconds,
+        "concurrency": request.concurrency,
+        "frontier_priority": request.frontier_priority,
+        "respect_robots": request.respect_robots,
+        "use_sitemap": request.use_sitemap,
+        "fetch_mode": fetch_mode,
+        "conditional_requests": request.conditional_requests,
+        "block_resources": request.block_resources,
+        "blocked_resource_types": request.blocked_resource_types,
+        "block_third_party": request.block_third_party,
+        "checkpoint_interval_seconds": request.checkpoint_interval_seconds,
+        "readiness_quiet_ms": request.readiness_quiet_ms,
+        "readiness_max_wait_ms": request.readiness_max_wait_ms,
         "url": crawl_url,
     }
     
-    job = create_crawl_job(request.tenant_id, request.app_id, config)
+    if request.resume:
+        resume_job_id = find_resumable_job(request.app_id)
+        if not resume_job_id:
+            raise HTTPException(status_code=404, detail="No unfinished checkpointed crawl to resume for this application")
+        config["resume_from_job_id"] = resume_job_id
+    
+    job = create_crawl_job(request.tenant_id, request.app_id, config, execution_mode=CRAWL_EXECUTION_MODE)
+    
+    if CRAWL_EXECUTION_MODE == "queue":
+        return CrawlResponse(
+            job_id=job["id"],
+            status="pending",
+            message="Crawl job queued for a worker"
+        )
     
     # Start crawl in background
     background_tasks.add_task(
@@ -0,0 +1,85 @@
+"""
+Knowledge Reset Crawler - Extraction Process Pool
+Runs HTML parsing, extraction and hashing in worker processes so large pages never block the event loop.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any
+
+from bs4 import BeautifulSoup
+
+from extractors import extract_page
+from chunker import chunk_content
+
+
+# 0 disables the pool and parses on the event loop
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Pages smaller than this are cheaper to parse inline than to ship to a worker
+PARSE_INLINE_MAX_BYTES = int(os.getenv("PARSE_INLINE_MAX_BYTES", "16384"))
+
+
+def parse_page(html: str, url: str, allowed_domain: str) -> Dict[str, Any]:
+    """Parse, extract, chunk and hash one page; runs in a pool worker, so only plain data goes in and out."""
+    soup = BeautifulSoup(html, "lxml")
+    page = extract_page(soup, url, allowed_domain)
+    return {
+        "title": page.title,
+        "content_text": page.content_text,
+        "content_html": page.content_html,
+        "content_hash": hashlib.sha256(page.content_html.encode()).hexdigest(),
+        "breadcrumbs": page.breadcrumbs,
+        "links": page.links,
+        "metadata": page.metadata,
+        "chunks": chunk_content(page.content_html, page.title),
+    }
+
+
+class ParsePool:
+    """
+    Bounded process pool shared by every crawl job in this process.
+
+    Workers are spawned rather than forked: the service holds Playwright
+    and HTTP client threads, which a forked child would inherit in an
+    undefined state. A crashed worker (e.g. killed for memory on a huge
+    page) breaks the executor; it is replaced and the page parsed inline.
+    """
+
+    def __init__(self, max_workers: int = PARSE_WORKERS, inline_max_bytes: int = PARSE_INLINE_MAX_BYTES):
+        self.max_workers = max_workers
+        self.inline_max_bytes = inline_max_bytes
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            print(f"DEBUG: Starting extraction pool with {self.max_workers} workers")
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    async def parse(self, html: str, url: str, allowed_domain: str) -> Dict[str, Any]:
+        if self.max_workers <= 0 or len(html) < self.inline_max_bytes:
+            return parse_page(html, url, allowed_domain)
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_executor(), parse_page, html, url, allowed_domain)
+        except BrokenProcessPool:
+            print(f"DEBUG: Extraction pool broke on {url}; restarting it")
+            self.shutdown(wait=False)
+            return parse_page(html, url, allowed_domain)
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
+
+
+pool = ParsePool()
@@ -0,0 +1,144 @@
+"""
+Knowledge Reset Crawler - Politeness Scheduler
+robots.txt caching and per-host request spacing shared by all crawl jobs in the process.
+"""
+
+import asyncio
+import time
+from typing import Optional, Dict, List
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+
+ROBOTS_TTL_SECONDS = 3600  # Re-fetch robots.txt hourly
+ROBOTS_ERROR_TTL_SECONDS = 300  # Retry sooner when robots.txt could not be fetched
+ROBOTS_TIMEOUT_SECONDS = 10
+MAX_CRAWL_DELAY_SECONDS = 30  # Ignore absurd Crawl-delay values that would stall a job
+
+
+class HostBucket:
+    """Token bucket spacing requests to a single host."""
+    def __init__(self, burst: int = 1):
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+class RobotsEntry:
+    """Parsed robots.txt for a host and when it expires."""
+    def __init__(self, parser: RobotFileParser, expires_at: float):
+        self.parser = parser
+        self.expires_at = expires_at
+
+
+class PolitenessScheduler:
+    """
+    Decides whether a URL may be fetched and when.
+
+    robots.txt is fetched once per host and cached with a TTL. Requests to
+    the same host are spaced by a token bucket refilled at the slower of the
+    host's Crawl-delay and the job's delay_ms; different hosts never wait
+    on each other.
+    """
+
+    def __init__(self, burst: int = 1):
+        self.burst = burst
+        self.robots: Dict[str, RobotsEntry] = {}
+        self.buckets: Dict[str, HostBucket] = {}
+        self._robots_locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    async def _fetch_robots(self, host: str, user_agent: str) -> RobotsEntry:
+        parser = RobotFileParser(f"{host}/robots.txt")
+        ttl = ROBOTS_TTL_SECONDS
+        try:
+            async with httpx.AsyncClient(
+                headers={"User-Agent": user_agent},
+                timeout=ROBOTS_TIMEOUT_SECONDS,
+                follow_redirects=True,
+            ) as client:
+                response = await client.get(f"{host}/robots.txt")
+
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                # No robots.txt (or server error): everything is allowed
+                parser.allow_all = True
+                if response.status_code >= 500:
+                    ttl = ROBOTS_ERROR_TTL_SECONDS
+            else:
+                parser.parse(response.text.splitlines())
+        except Exception as e:
+            print(f"DEBUG: robots.txt fetch failed for {host}: {str(e)}")
+            parser.allow_all = True
+            ttl = ROBOTS_ERROR_TTL_SECONDS
+
+        return RobotsEntry(parser, time.monotonic() + ttl)
+
+    async def get_robots(self, url: str, user_agent: str) -> RobotFileParser:
+        """Return the cached robots.txt parser for the URL's host, fetching it if stale."""
+        host = self.host_key(url)
+        entry = self.robots.get(host)
+        if entry and entry.expires_at > time.monotonic():
+            return entry.parser
+
+        # Only one coroutine fetches a given host's robots.txt at a time
+        lock = self._robots_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            entry = self.robots.get(host)
+            if not entry or entry.expires_at <= time.monotonic():
+                entry = await self._fetch_robots(host, user_agent)
+                self.robots[host] = entry
+        return entry.parser
+
+    async def can_fetch(self, url: str, user_agent: str) -> bool:
+        """Check robots.txt rules for the URL."""
+        parser = await self.get_robots(url, user_agent)
+        return parser.can_fetch(user_agent, url)
+
+    async def sitemaps(self, url: str, user_agent: str) -> List[str]:
+        """Sitemap URLs advertised in the host's robots.txt."""
+        parser = await self.get_robots(url, user_agent)
+        return parser.site_maps() or []
+
+    async def crawl_delay(self, url: str, user_agent: str) -> Optional[float]:
+        """Crawl-delay (seconds) from robots.txt, capped at MAX_CRAWL_DELAY_SECONDS."""
+        parser = await self.get_robots(url, user_agent)
+        delay = parser.crawl_delay(user_agent)
+        if delay is None:
+            return None
+        return min(float(delay), MAX_CRAWL_DELAY_SECONDS)
+
+    async def wait_for_slot(self, url: str, interval_seconds: float) -> None:
+        """Block until the URL's host has a free request slot."""
+        if interval_seconds <= 0:
+            return
+
+        host = self.host_key(url)
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = HostBucket(self.burst)
+
+        async with bucket.lock:
+            while True:
+                now = time.monotonic()
+                bucket.tokens = min(
+                    bucket.burst,
+                    bucket.tokens + (now - bucket.updated) / interval_seconds,
+                )
+                bucket.updated = now
+                if bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    return
+                await asyncio.sleep((1 - bucket.tokens) * interval_seconds)
+
+
+# Shared by every crawl job in this process so concurrent jobs on one host stay polite together
+scheduler = PolitenessScheduler()
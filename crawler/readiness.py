@@ -0,0 +1,101 @@
+"""
+Knowledge Reset Crawler - Page Readiness Detection
+Decides when a rendered page is ready for extraction instead of always waiting for networkidle.
+"""
+
+from typing import Optional, Dict, Any, List
+
+from extractors import CONTENT_SELECTORS
+
+
+DEFAULT_QUIET_MS = 300  # DOM must be unchanged this long once main content exists
+DEFAULT_MAX_WAIT_MS = 5000  # Upper bound, same as the old networkidle timeout
+MIN_ADAPTIVE_CAP_MS = 1000
+ADAPTIVE_MIN_SAMPLES = 5
+
+# Resolves once a main-content container exists and no DOM mutation happened for quietMs, or after maxMs
+READINESS_SCRIPT = """
+({selectors, quietMs, maxMs}) => new Promise((resolve) => {
+    const start = performance.now();
+    let lastChange = start;
+    const hasContent = () => selectors.some((selector) => {
+        try { return document.querySelector(selector) !== null; } catch (e) { return false; }
+    });
+    const observer = new MutationObserver(() => { lastChange = performance.now(); });
+    observer.observe(document.documentElement || document, {childList: true, subtree: true, characterData: true});
+    const tick = () => {
+        const now = performance.now();
+        const found = hasContent();
+        const timedOut = now - start >= maxMs;
+        if ((found && now - lastChange >= quietMs) || timedOut) {
+            observer.disconnect();
+            resolve({waitedMs: Math.round(now - start), contentFound: found, timedOut: timedOut && !found});
+            return;
+        }
+        setTimeout(tick, 50);
+    };
+    tick();
+})
+"""
+
+
+class ReadinessTracker:
+    """
+    Per-job readiness strategy.
+
+    Tracks how long pages of each host actually took to settle and caps
+    the wait for that host at roughly twice its 90th percentile, so a
+    site whose pages settle in 200 ms never pays the full default cap.
+    """
+
+    def __init__(self, quiet_ms: int = DEFAULT_QUIET_MS, max_wait_ms: int = DEFAULT_MAX_WAIT_MS):
+        self.quiet_ms = quiet_ms
+        self.max_wait_ms = max_wait_ms
+        self.samples: Dict[str, List[int]] = {}
+        self.total_wait_ms = 0
+        self.pages = 0
+        self.timeouts = 0
+
+    def cap_for(self, host: str) -> int:
+        """Maximum wait for the next page of this host."""
+        samples = self.samples.get(host) or []
+        if len(samples) < ADAPTIVE_MIN_SAMPLES:
+            return self.max_wait_ms
+        ordered = sorted(samples)
+        p90 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+        return max(MIN_ADAPTIVE_CAP_MS, min(self.max_wait_ms, 2 * p90 + self.quiet_ms))
+
+    def record(self, host: str, waited_ms: int, timed_out: bool) -> None:
+        self.pages += 1
+        self.total_wait_ms += waited_ms
+        if timed_out:
+            # Don't let pages without a recognizable container shrink the cap
+            self.timeouts += 1
+            return
+        samples = self.samples.setdefault(host, [])
+        samples.append(waited_ms)
+        if len(samples) > 200:
+            del samples[:100]
+
+    async def wait_until_ready(self, page, host: str) -> Optional[Dict[str, Any]]:
+        """Wait for the page to settle; returns {"waitedMs", "contentFound", "timedOut", "capMs"}."""
+        cap = self.cap_for(host)
+        try:
+            result = await page.evaluate(
+                READINESS_SCRIPT,
+                {"selectors": CONTENT_SELECTORS, "quietMs": self.quiet_ms, "maxMs": cap},
+            )
+        except Exception as e:
+            # Page navigated or closed mid-wait; extract whatever is there
+            print(f"DEBUG: Readiness check failed: {str(e)}")
+            return None
+        result["capMs"] = cap
+        self.record(host, result["waitedMs"], result["timedOut"])
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "render_pages": self.pages,
+            "render_wait_ms_avg": round(self.total_wait_ms / self.pages) if self.pages else 0,
+            "render_wait_timeouts": self.timeouts,
+        }
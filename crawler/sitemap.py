@@ -0,0 +1,154 @@
+"""
+Knowledge Reset Crawler - Sitemap Discovery
+Finds and parses sitemap.xml files (including sitemap indexes and gzipped sitemaps) to seed the crawl frontier.
+"""
+
+import gzip
+import io
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import Optional, List, Set
+from urllib.parse import urlparse
+
+import httpx
+
+from politeness import scheduler as politeness
+
+
+MAX_SITEMAP_FILES = 50  # Sitemap index fan-out limit per crawl
+MAX_SITEMAP_URLS = 100000  # Total URLs accepted from all sitemaps
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024  # Protocol limit for an uncompressed sitemap
+
+
+class SitemapEntry:
+    """A <url> entry from a sitemap."""
+    def __init__(self, url: str, lastmod: Optional[datetime] = None, priority: Optional[float] = None):
+        self.url = url
+        self.lastmod = lastmod
+        self.priority = priority
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a W3C datetime (sitemap <lastmod>) or Postgres timestamptz string.
+    Dates without a timezone are treated as UTC. Returns None if unparseable.
+    """
+    if not value:
+        return None
+    value = value.strip().replace("Z", "+00:00")
+    # Pad/truncate fractional seconds to 6 digits for older fromisoformat versions
+    value = re.sub(r"\.(\d+)", lambda m: "." + m.group(1)[:6].ljust(6, "0"), value)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _local_name(tag: str) -> str:
+    """Strip the XML namespace from a tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(element: ET.Element, name: str) -> Optional[str]:
+    for child in element:
+        if _local_name(child.tag) == name:
+            return (child.text or "").strip() or None
+    return None
+
+
+def _decode_body(url: str, body: bytes) -> bytes:
+    """Decompress gzipped sitemaps (sitemap.xml.gz served without Content-Encoding)."""
+    if body[:2] == b"\x1f\x8b" or url.endswith(".gz"):
+        with gzip.GzipFile(fileobj=io.BytesIO(body)) as f:
+            return f.read(MAX_SITEMAP_BYTES)
+    return body[:MAX_SITEMAP_BYTES]
+
+
+def in_scope(url: str, base_url: str, allowed_domain: str) -> bool:
+    """Same domain as the crawl and under the base URL's directory."""
+    parsed = urlparse(url)
+    if allowed_domain not in parsed.netloc:
+        return False
+    base_path = urlparse(base_url).path
+    prefix = base_path[:base_path.rfind("/") + 1] or "/"
+    return (parsed.path or "/").startswith(prefix)
+
+
+async def discover_sitemaps(base_url: str, user_agent: str) -> List[str]:
+    """Sitemaps advertised in robots.txt, falling back to /sitemap.xml."""
+    sitemaps = await politeness.sitemaps(base_url, user_agent)
+    default = f"{politeness.host_key(base_url)}/sitemap.xml"
+    if default not in sitemaps:
+        sitemaps = sitemaps + [default]
+    return sitemaps
+
+
+async def fetch_sitemap_entries(
+    base_url: str,
+    allowed_domain: str,
+    user_agent: str,
+    timeout_ms: int = 30000,
+    delay_ms: int = 0,
+) -> List[SitemapEntry]:
+    """
+    Collect in-scope <url> entries from every sitemap reachable from base_url.
+    Sitemap indexes are followed breadth-first; unreachable sitemaps are skipped.
+    """
+    pending = await discover_sitemaps(base_url, user_agent)
+    fetched: Set[str] = set()
+    seen_urls: Set[str] = set()
+    entries: List[SitemapEntry] = []
+
+    async with httpx.AsyncClient(
+        headers={"User-Agent": user_agent},
+        timeout=timeout_ms / 1000,
+        follow_redirects=True,
+    ) as client:
+        while pending and len(fetched) < MAX_SITEMAP_FILES and len(entries) < MAX_SITEMAP_URLS:
+            sitemap_url = pending.pop(0)
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+
+            try:
+                await politeness.wait_for_slot(sitemap_url, delay_ms / 1000)
+                response = await client.get(sitemap_url)
+                if response.status_code >= 400:
+                    print(f"DEBUG: Sitemap {sitemap_url} returned HTTP {response.status_code}")
+                    continue
+                root = ET.fromstring(_decode_body(sitemap_url, response.content))
+            except Exception as e:
+                print(f"DEBUG: Failed to read sitemap {sitemap_url}: {str(e)}")
+                continue
+
+            kind = _local_name(root.tag)
+            for element in root:
+                loc = _child_text(element, "loc")
+                if not loc:
+                    continue
+
+                if kind == "sitemapindex":
+                    pending.append(loc)
+                    continue
+
+                url = loc.split("#", 1)[0]
+                if url in seen_urls or not in_scope(url, base_url, allowed_domain):
+                    continue
+                seen_urls.add(url)
+
+                priority = _child_text(element, "priority")
+                try:
+                    priority = float(priority) if priority else None
+                except ValueError:
+                    priority = None
+
+                entries.append(SitemapEntry(url, parse_timestamp(_child_text(element, "lastmod")), priority))
+                if len(entries) >= MAX_SITEMAP_URLS:
+                    break
+
+    print(f"DEBUG: Found {len(entries)} URLs in {len(fetched)} sitemap(s) for {base_url}")
+    return entries
@@ -0,0 +1,57 @@
+"""
+Knowledge Reset Crawler - Checkpoint Tests
+"""
+
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SECRET_KEY", "test")
+
+import checkpoint
+from crawler import Crawler, CrawlerConfig
+
+
+class FakeCheckpoints:
+    """crawl_checkpoints stand-in that enforces UNIQUE (job_id, seq)."""
+
+    def __init__(self):
+        self.rows = []
+
+    def insert(self, job_id, app_id, seq, payload, is_final=False):
+        if any(row["job_id"] == job_id and row["seq"] == seq for row in self.rows):
+            raise ValueError("duplicate key value violates unique constraint")
+        self.rows.append({"job_id": job_id, "app_id": app_id, "seq": seq, "payload": payload, "is_final": is_final})
+
+    def list(self, job_id):
+        return sorted((row for row in self.rows if row["job_id"] == job_id), key=lambda row: row["seq"])
+
+
+def test_reclaimed_job_resumes_from_its_own_checkpoints(monkeypatch):
+    table = FakeCheckpoints()
+    monkeypatch.setattr(checkpoint, "insert_crawl_checkpoint", table.insert)
+    monkeypatch.setattr(checkpoint, "list_crawl_checkpoints", table.list)
+
+    # First attempt: two checkpoints, then the lease lapses
+    first = checkpoint.CrawlCheckpointer("job-1", "app-1")
+    first.record_added("https://example.com/", 0)
+    first.record_added("https://example.com/a", 1)
+    first.flush()
+    first.record_done("https://example.com/")
+    first.flush()
+
+    # Second attempt of the same job, as Worker.run_job sets it up
+    config = CrawlerConfig(resume_from_job_id="job-1")
+    second = Crawler("tenant-1", "app-1", "job-1", "https://example.com/", config=config)
+    second.manifest = {}
+    assert second.restore_checkpoint()
+    assert [row["seq"] for row in table.rows] == [0, 1, 2]
+
+    second.checkpointer.record_done("https://example.com/a")
+    second.checkpointer.flush(final=True)
+    assert [row["seq"] for row in table.rows] == [0, 1, 2, 3]
+    assert table.rows[-1]["is_final"]
+    assert not second.checkpointer.added and not second.checkpointer.done
+
+    state = checkpoint.load_checkpoint("job-1")
+    assert state.pending == []
+    assert state.max_seq == 3
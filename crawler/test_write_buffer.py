@@ -0,0 +1,60 @@
+"""
+Knowledge Reset Crawler - Write Buffer Tests
+"""
+
+import os
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SECRET_KEY", "test")
+
+import write_buffer
+from write_buffer import DocumentWriteBuffer
+
+
+class FakeDocuments:
+    """documents table stand-in that enforces the parent_id foreign key and PostgREST's identical-keys rule."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def upsert(self, rows):
+        if len({frozenset(row) for row in rows}) > 1:
+            raise ValueError("All object keys must match")
+        for row in rows:
+            if row.get("parent_id") and row["parent_id"] not in self.rows:
+                raise ValueError("violates foreign key constraint documents_parent_id_fkey")
+        for row in rows:
+            self.rows[row["id"]] = row
+
+
+def test_parent_without_embedding_is_written_before_child(monkeypatch):
+    table = FakeDocuments()
+    monkeypatch.setattr(write_buffer, "upsert_documents", table.upsert)
+    monkeypatch.setattr(write_buffer, "log_crawl_error", lambda *args: None)
+
+    buffer = DocumentWriteBuffer("job-1")
+    buffer.add_document({"id": "earlier", "source_url": "https://example.com/x", "parent_id": None, "embedding": "[0.3,0.4]"})
+    # The parent's embedding failed, so its row has no embedding key; the child's has one
+    buffer.add_document({"id": "parent", "source_url": "https://example.com/", "parent_id": None})
+    buffer.add_document({
+        "id": "child",
+        "source_url": "https://example.com/a",
+        "parent_id": "parent",
+        "embedding": "[0.1,0.2]",
+    })
+
+    assert buffer.flush() == 0
+    assert set(table.rows) == {"earlier", "parent", "child"}
+    assert buffer.stats()["rows_failed"] == 0
+
+
+def test_rows_with_the_same_keys_share_one_request(monkeypatch):
+    requests = []
+    monkeypatch.setattr(write_buffer, "upsert_documents", requests.append)
+
+    buffer = DocumentWriteBuffer("job-1")
+    for i in range(3):
+        buffer.add_document({"id": f"doc-{i}", "source_url": f"https://example.com/{i}", "embedding": "[0.1]"})
+
+    assert buffer.flush() == 0
+    assert [len(rows) for rows in requests] == [3]
@@ -0,0 +1,164 @@
+"""
+Knowledge Reset Crawler - Queue Worker
+Claims queued crawl jobs from crawl_jobs with a heartbeated lease and runs them outside the HTTP service.
+
+Usage:
+    python worker.py --processes 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+from typing import Optional, Dict, Any
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WORKER_PROCESSES = int(os.getenv("CRAWL_WORKER_PROCESSES", "1"))
+LEASE_SECONDS = int(os.getenv("CRAWL_LEASE_SECONDS", "120"))
+POLL_INTERVAL_SECONDS = float(os.getenv("CRAWL_POLL_SECONDS", "5"))
+MAX_ATTEMPTS = int(os.getenv("CRAWL_MAX_ATTEMPTS", "3"))
+
+
+class QueueWorker:
+    """One worker process: claims a job, runs it while heartbeating its lease, repeats."""
+
+    def __init__(self, worker_id: str):
+        # Imported here so each spawned process creates its own clients
+        from browser_pool import BrowserPool
+
+        self.worker_id = worker_id
+        self.browser_pool = BrowserPool()
+        self.current_crawler = None
+        self.shutting_down = False
+
+    def shutdown(self) -> None:
+        """Stop claiming; hand the running job back once its in-flight pages finish."""
+        print(f"DEBUG: Worker {self.worker_id} shutting down")
+        self.shutting_down = True
+        if self.current_crawler:
+            self.current_crawler.stop("shutdown")
+
+    async def heartbeat(self, job_id: str) -> None:
+        """Keep the lease alive; stop the crawl if the job was reclaimed or cancelled."""
+        from db import heartbeat_crawl_job
+
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            try:
+                owned = heartbeat_crawl_job(job_id, self.worker_id, LEASE_SECONDS)
+            except Exception as e:
+                print(f"DEBUG: Heartbeat failed for job {job_id}: {str(e)}")
+                continue
+            if not owned:
+                print(f"DEBUG: Worker {self.worker_id} lost lease on job {job_id}")
+                if self.current_crawler:
+                    self.current_crawler.stop("lease_lost")
+                return
+
+    async def run_job(self, job: Dict[str, Any]) -> None:
+        from crawler import Crawler, config_from_dict
+        from checkpoint import load_checkpoint
+        from db import update_crawl_job_status, update_application_last_crawl, release_crawl_job
+
+        job_id = job["id"]
+        config = dict(job.get("config") or {})
+        print(f"DEBUG: Worker {self.worker_id} claimed job {job_id} (attempt {job.get('attempts')})")
+
+        # A reclaimed job continues from its own checkpoints instead of starting over
+        if (job.get("attempts") or 1) > 1 and load_checkpoint(job_id):
+            config["resume_from_job_id"] = job_id
+
+        self.current_crawler = Crawler(
+            tenant_id=job["tenant_id"],
+            app_id=job["app_id"],
+            job_id=job_id,
+            base_url=config["url"],
+            config=config_from_dict(config),
+            browser_pool=self.browser_pool,
+        )
+        heartbeat_task = asyncio.create_task(self.heartbeat(job_id))
+        stop_reason: Optional[str] = None
+        try:
+            await self.current_crawler.run()
+            stop_reason = self.current_crawler.stop_reason
+            if stop_reason is None:
+                update_application_last_crawl(job["app_id"])
+        except Exception as e:
+            update_crawl_job_status(job_id, "failed", {"error": str(e)})
+        finally:
+            heartbeat_task.cancel()
+            self.current_crawler = None
+            if stop_reason != "lease_lost":
+                # On shutdown, put the job straight back to pending instead of waiting for the lease to lapse
+                release_crawl_job(job_id, self.worker_id, requeue=stop_reason == "shutdown")
+
+    async def run(self) -> None:
+        from db import claim_crawl_job
+
+        print(f"DEBUG: Worker {self.worker_id} started (lease {LEASE_SECONDS}s)")
+        try:
+            while not self.shutting_down:
+                try:
+                    job = claim_crawl_job(self.worker_id, LEASE_SECONDS, MAX_ATTEMPTS)
+                except Exception as e:
+                    print(f"DEBUG: Claim failed for worker {self.worker_id}: {str(e)}")
+                    job = None
+
+                if job is None:
+                    await asyncio.sleep(POLL_INTERVAL_SECONDS)
+                    continue
+                await self.run_job(job)
+        finally:
+            from parse_pool import pool as parse_pool
+
+            await self.browser_pool.stop()
+            parse_pool.shutdown()
+
+
+def run_worker_process(index: int) -> None:
+    """Entry point for one worker process."""
+    worker = QueueWorker(f"{socket.gethostname()}:{os.getpid()}:{index}")
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.shutdown)
+    try:
+        loop.run_until_complete(worker.run())
+    finally:
+        loop.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Knowledge Reset crawl queue workers")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES, help="Worker processes on this node")
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        run_worker_process(0)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker_process, args=(i,), name=f"crawl-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Knowledge Reset Crawler - Document Write-Behind Buffer
+Collects a job's document rows, chunks and versions and writes them as bulk upserts instead of one request per change.
+"""
+
+import os
+import time
+from typing import Dict, Any, List
+
+from db import upsert_documents, replace_document_chunks, create_document_versions, enqueue_embedding_work, log_crawl_error
+
+
+# Flush when any limit is reached
+WRITE_BUFFER_ROWS = int(os.getenv("WRITE_BUFFER_ROWS", "50"))
+WRITE_BUFFER_BYTES = int(os.getenv("WRITE_BUFFER_BYTES", str(4 * 1024 * 1024)))  # Keep request bodies reasonable
+WRITE_BUFFER_SECONDS = float(os.getenv("WRITE_BUFFER_SECONDS", "5"))
+
+
+def row_size(row: Dict[str, Any]) -> int:
+    """Rough request size of a row: its text fields, including the embedding's pgvector text."""
+    return sum(len(value) for value in row.values() if isinstance(value, str))
+
+
+def key_set_runs(rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Split rows, in order, into runs of consecutive rows that have the same keys."""
+    runs: List[List[Dict[str, Any]]] = []
+    for row in rows:
+        if runs and runs[-1][0].keys() == row.keys():
+            runs[-1].append(row)
+        else:
+            runs.append([row])
+    return runs
+
+
+class DocumentWriteBuffer:
+    """
+    Write-behind buffer for one crawl job.
+
+    Document rows carry their id (generated client-side for new pages),
+    so each page becomes one upsert row including its embedding; rows for
+    the same document are merged. Rows are sent in submission order, in
+    runs of consecutive rows with the same keys (PostgREST bulk upserts
+    need identical keys), so a parent page is written before the children
+    saved after it even when only one of them has an embedding. Documents are written
+    first, then chunks, then versions, then embedding work items (which
+    reference the rows written before them). A document's chunks are held until
+    its whole new chunk set has arrived and then replace the stored set in
+    one transaction, so search never sees half of an old and half of a new
+    page. If a bulk request fails, its rows are retried one by one (chunk
+    sets document by document) so a single bad page cannot drop the rest
+    of the batch.
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        max_rows: int = WRITE_BUFFER_ROWS,
+        max_bytes: int = WRITE_BUFFER_BYTES,
+        max_seconds: float = WRITE_BUFFER_SECONDS,
+    ):
+        self.job_id = job_id
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.chunk_sets: Dict[str, Dict[str, Any]] = {}  # document_id -> {"count": n, "rows": {chunk_index: row}}
+        self.versions: List[Dict[str, Any]] = []
+        self.embedding_work: Dict[tuple, Dict[str, Any]] = {}  # (document_id, chunk_index) -> work item
+        self.pending_bytes = 0
+        self.last_flush = time.time()
+
+        # Per-job counters
+        self.flushes = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.vectors_reused = 0
+
+    def __len__(self) -> int:
+        chunks = sum(len(chunk_set["rows"]) for chunk_set in self.chunk_sets.values())
+        return len(self.documents) + chunks + len(self.versions) + len(self.embedding_work)
+
+    def add_document(self, row: Dict[str, Any]) -> None:
+        """Queue a document row (must include "id")."""
+        pending = self.documents.get(row["id"])
+        if pending:
+            pending.update(row)
+        else:
+            self.documents[row["id"]] = dict(row)
+        self.pending_bytes += row_size(row)
+
+    def expect_chunks(self, document_id: str, count: int) -> None:
+        """Start a document's new chunk set; it is written once all count rows have been added."""
+        self.chunk_sets[document_id] = {"count": count, "rows": {}}
+
+    def add_chunk(self, row: Dict[str, Any]) -> None:
+        """Queue a passage row of a set started with expect_chunks."""
+        self.chunk_sets[row["document_id"]]["rows"][row["chunk_index"]] = row
+        self.pending_bytes += row_size(row)
+
+    def add(self, table: str, row: Dict[str, Any]) -> None:
+        if table == "document_chunks":
+            self.add_chunk(row)
+        else:
+            self.add_document(row)
+
+    def add_version(self, row: Dict[str, Any]) -> None:
+        self.versions.append(row)
+        self.pending_bytes += row_size(row)
+
+    def add_embedding_work(self, item: Dict[str, Any]) -> None:
+        """Queue an embedding_queue item for a document (chunk_index -1) or chunk written through this buffer."""
+        self.embedding_work[(item["document_id"], item["chunk_index"])] = item
+
+    def due(self) -> bool:
+        if not len(self):
+            return False
+        return (
+            len(self) >= self.max_rows
+            or self.pending_bytes >= self.max_bytes
+            or time.time() - self.last_flush >= self.max_seconds
+        )
+
+    def flush(self) -> int:
+        """Write everything buffered except incomplete chunk sets; returns the number of rows that could not be written."""
+        self.last_flush = time.time()
+        chunk_sets = {
+            document_id: chunk_set
+            for document_id, chunk_set in self.chunk_sets.items()
+            if len(chunk_set["rows"]) == chunk_set["count"]
+        }
+        for document_id in chunk_sets:
+            del self.chunk_sets[document_id]
+        # Work for chunks of a set still being embedded waits until the set is written
+        work = {key: item for key, item in self.embedding_work.items() if key[0] not in self.chunk_sets}
+        if not self.documents and not self.versions and not chunk_sets and not work:
+            return 0
+
+        documents, versions = list(self.documents.values()), self.versions
+        self.documents, self.versions = {}, []
+        for key in work:
+            del self.embedding_work[key]
+        self.pending_bytes = sum(
+            row_size(row) for chunk_set in self.chunk_sets.values() for row in chunk_set["rows"].values()
+        )
+
+        failed = 0
+        for rows in key_set_runs(documents):
+            failed += self._write(upsert_documents, rows)
+        if chunk_sets:
+            failed += self._write_chunk_sets(chunk_sets)
+        if versions:
+            failed += self._write(create_document_versions, versions)
+        if work:
+            failed += self._write(enqueue_embedding_work, list(work.values()))
+
+        chunks = sum(chunk_set["count"] for chunk_set in chunk_sets.values())
+        self.flushes += 1
+        self.rows_written += len(documents) + chunks + len(versions) + len(work) - failed
+        self.rows_failed += failed
+        print(
+            f"DEBUG: Flushed {len(documents)} documents, {chunks} chunks, {len(versions)} versions "
+            f"and {len(work)} embedding work items for job {self.job_id} ({failed} failed)"
+        )
+        return failed
+
+    def _replace_chunks(self, chunk_sets: Dict[str, Dict[str, Any]]) -> None:
+        rows = [row for chunk_set in chunk_sets.values() for _, row in sorted(chunk_set["rows"].items())]
+        counts = {document_id: chunk_set["count"] for document_id, chunk_set in chunk_sets.items()}
+        self.vectors_reused += replace_document_chunks(rows, counts)
+
+    def _write_chunk_sets(self, chunk_sets: Dict[str, Dict[str, Any]]) -> int:
+        try:
+            self._replace_chunks(chunk_sets)
+            return 0
+        except Exception as e:
+            if len(chunk_sets) == 1:
+                document_id, chunk_set = next(iter(chunk_sets.items()))
+                self._log_failure({"document_id": document_id}, e)
+                return max(chunk_set["count"], 1)
+            print(f"DEBUG: Chunk write for {len(chunk_sets)} documents failed for job {self.job_id}, retrying one by one: {str(e)}")
+
+        failed = 0
+        for document_id, chunk_set in chunk_sets.items():
+            try:
+                self._replace_chunks({document_id: chunk_set})
+            except Exception as e:
+                self._log_failure({"document_id": document_id}, e)
+                failed += max(chunk_set["count"], 1)
+        return failed
+
+    def _write(self, write, rows: List[Dict[str, Any]]) -> int:
+        try:
+            write(rows)
+            return 0
+        except Exception as e:
+            if len(rows) == 1:
+                self._log_failure(rows[0], e)
+                return 1
+            print(f"DEBUG: Bulk write of {len(rows)} rows failed for job {self.job_id}, retrying one by one: {str(e)}")
+
+        failed = 0
+        for row in rows:
+            try:
+                write([row])
+            except Exception as e:
+                self._log_failure(row, e)
+                failed += 1
+        return failed
+
+    def _log_failure(self, row: Dict[str, Any], error: Exception) -> None:
+        url = row.get("source_url") or row.get("document_id") or row.get("id")
+        print(f"DEBUG: Write failed for {url} in job {self.job_id}: {str(error)}")
+        try:
+            log_crawl_error(self.job_id, url, "WRITE_FAILED", str(error))
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "write_flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "chunk_vectors_reused": self.vectors_reused,
+        }
@@ -0,0 +1,10 @@
+-- Migration: 009_add_document_validators
+-- Description: Store HTTP cache validators and outgoing links so recrawls can use conditional GETs
+-- Date: 2026-10-18
+
+-- HTTP validators from the last successful fetch (sent back as If-None-Match / If-Modified-Since)
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS http_etag TEXT;
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS http_last_modified TEXT;
+
+-- Internal links discovered on the page, re-queued when the page answers 304 Not Modified
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS outlinks JSONB DEFAULT '[]';
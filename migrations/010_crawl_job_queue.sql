@@ -0,0 +1,79 @@
+-- Migration: 010_crawl_job_queue
+-- Description: Lease-based claiming of crawl jobs by queue workers
+-- Date: 2026-10-18
+
+-- Jobs created with execution_mode = 'queue' are picked up by worker processes
+-- instead of running inside the API process that created them.
+ALTER TABLE crawl_jobs ADD COLUMN IF NOT EXISTS execution_mode TEXT NOT NULL DEFAULT 'inline'
+    CHECK (execution_mode IN ('inline', 'queue'));
+ALTER TABLE crawl_jobs ADD COLUMN IF NOT EXISTS worker_id TEXT;
+ALTER TABLE crawl_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ;
+ALTER TABLE crawl_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+ALTER TABLE crawl_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_crawl_jobs_claimable ON crawl_jobs(created_at)
+    WHERE execution_mode = 'queue' AND status IN ('pending', 'running');
+
+-- Claim the oldest pending queue job, or a running one whose worker stopped heartbeating.
+-- SKIP LOCKED lets any number of workers call this concurrently without double-claiming.
+CREATE OR REPLACE FUNCTION claim_crawl_job(
+    p_worker_id TEXT,
+    p_lease_seconds INT DEFAULT 120,
+    p_max_attempts INT DEFAULT 3
+)
+RETURNS SETOF crawl_jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Give up on jobs that have already lost their lease too many times
+    UPDATE crawl_jobs
+    SET status = 'failed',
+        finished_at = NOW(),
+        worker_id = NULL,
+        lease_expires_at = NULL,
+        stats = COALESCE(stats, '{}'::jsonb)
+            || jsonb_build_object('error', 'Worker lease expired after ' || attempts || ' attempts')
+    WHERE execution_mode = 'queue'
+        AND status = 'running'
+        AND lease_expires_at < NOW()
+        AND attempts >= p_max_attempts;
+
+    RETURN QUERY
+    UPDATE crawl_jobs j
+    SET status = 'running',
+        worker_id = p_worker_id,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+        heartbeat_at = NOW(),
+        attempts = j.attempts + 1,
+        started_at = COALESCE(j.started_at, NOW())
+    WHERE j.id = (
+        SELECT c.id FROM crawl_jobs c
+        WHERE c.execution_mode = 'queue'
+            AND (c.status = 'pending' OR (c.status = 'running' AND c.lease_expires_at < NOW()))
+        ORDER BY c.created_at
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING j.*;
+END;
+$$;
+
+-- Extend a worker's lease; returns FALSE if the job was reclaimed, cancelled or finished.
+CREATE OR REPLACE FUNCTION heartbeat_crawl_job(
+    p_job_id UUID,
+    p_worker_id TEXT,
+    p_lease_seconds INT DEFAULT 120
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE crawl_jobs
+    SET heartbeat_at = NOW(),
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE id = p_job_id
+        AND worker_id = p_worker_id
+        AND status = 'running';
+    RETURN FOUND;
+END;
+$$;
@@ -0,0 +1,26 @@
+-- Migration: 011_create_crawl_checkpoints
+-- Description: Incremental crawl frontier checkpoints so interrupted crawls can resume
+-- Date: 2026-10-18
+
+-- Each row is a delta since the previous checkpoint of the same job:
+-- payload = base64(gzip(JSON {"added": [[url, depth, sitemap_priority], ...], "done": [url, ...]}))
+-- The queue at any checkpoint is every added URL that is not yet done.
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_id UUID NOT NULL REFERENCES crawl_jobs(id) ON DELETE CASCADE,
+    app_id UUID NOT NULL REFERENCES applications(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    is_final BOOLEAN NOT NULL DEFAULT FALSE,  -- Written when the crawl drained its queue
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    UNIQUE (job_id, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_crawl_checkpoints_app_created ON crawl_checkpoints(app_id, created_at DESC);
+
+ALTER TABLE crawl_checkpoints ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role can manage crawl checkpoints"
+    ON crawl_checkpoints
+    FOR ALL
+    USING (auth.role() = 'service_role');
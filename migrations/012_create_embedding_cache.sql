@@ -0,0 +1,63 @@
+-- Migration: 012_create_embedding_cache
+-- Description: Content-addressed embedding cache shared by all tenants, apps and crawler processes
+-- Date: 2026-10-18
+
+-- cache_key = sha256 of (model, dimensions, task_type, truncated text), so identical
+-- text is embedded once no matter which page, app or tenant it came from.
+-- Holds vectors only, never the text itself.
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    task_type TEXT NOT NULL,
+    embedding vector NOT NULL,  -- Unconstrained so models with other dimensions can share the table
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_used_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used_at);
+
+ALTER TABLE embedding_cache ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role can manage embedding cache"
+    ON embedding_cache
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+-- Look up cached vectors, bumping last_used_at (at most hourly per entry to avoid a write per hit)
+CREATE OR REPLACE FUNCTION get_cached_embeddings(p_keys TEXT[])
+RETURNS TABLE (cache_key TEXT, embedding vector)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE embedding_cache c
+    SET last_used_at = NOW()
+    WHERE c.cache_key = ANY(p_keys)
+        AND c.last_used_at < NOW() - INTERVAL '1 hour';
+
+    RETURN QUERY
+    SELECT c.cache_key, c.embedding
+    FROM embedding_cache c
+    WHERE c.cache_key = ANY(p_keys);
+END;
+$$;
+
+-- Size-based eviction: keep the p_max_rows most recently used entries
+CREATE OR REPLACE FUNCTION evict_embedding_cache(p_max_rows INT)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deleted INT;
+BEGIN
+    DELETE FROM embedding_cache
+    WHERE cache_key IN (
+        SELECT c.cache_key
+        FROM embedding_cache c
+        ORDER BY c.last_used_at DESC
+        OFFSET p_max_rows
+    );
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$;
@@ -0,0 +1,109 @@
+-- Migration: 013_create_document_chunks
+-- Description: Heading-aware passages of each document with their own embeddings, and passage search
+-- Date: 2026-10-18
+
+-- Passages of a document in reading order. The document embedding only sees the
+-- first 8,000 characters; chunks cover the whole page.
+CREATE TABLE IF NOT EXISTS document_chunks (
+    document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    tenant_id UUID NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    app_id UUID NOT NULL REFERENCES applications(id) ON DELETE CASCADE,
+
+    -- Content
+    heading_path TEXT[] NOT NULL DEFAULT '{}',  -- Headings above the passage, outermost first
+    anchor TEXT,  -- Fragment of the nearest heading, for linking to source_url#anchor
+    content_text TEXT NOT NULL,
+    content_hash TEXT NOT NULL,  -- SHA-256 of the embedded text (title, headings and passage)
+
+    embedding vector(1536),
+
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (document_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_tenant_id ON document_chunks(tenant_id);
+CREATE INDEX IF NOT EXISTS idx_document_chunks_app_id ON document_chunks(app_id);
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding ON document_chunks
+    USING ivfflat (embedding vector_cosine_ops)
+    WITH (lists = 100);
+
+CREATE TRIGGER update_document_chunks_updated_at
+    BEFORE UPDATE ON document_chunks
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Number of chunks written for the current content; NULL until the document is first chunked
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunk_count INTEGER;
+
+ALTER TABLE document_chunks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own tenant document chunks"
+    ON document_chunks
+    FOR SELECT
+    USING (tenant_id::text = auth.jwt() ->> 'tenant_id');
+
+CREATE POLICY "Service role can manage document chunks"
+    ON document_chunks
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+-- Drop chunks past the new end of each document after its content shrank
+CREATE OR REPLACE FUNCTION trim_document_chunks(p_document_ids UUID[], p_chunk_counts INT[])
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deleted INT;
+BEGIN
+    DELETE FROM document_chunks c
+    USING unnest(p_document_ids, p_chunk_counts) AS t(document_id, chunk_count)
+    WHERE c.document_id = t.document_id
+        AND c.chunk_index >= t.chunk_count;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$;
+
+-- Passage search: like search_documents, but returns the matching passage instead of the whole page
+CREATE OR REPLACE FUNCTION search_document_chunks(
+    query_embedding vector(1536),
+    query_tenant_id UUID,
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10
+)
+RETURNS TABLE (
+    document_id UUID,
+    chunk_index INT,
+    title TEXT,
+    source_url TEXT,
+    heading_path TEXT[],
+    anchor TEXT,
+    content_text TEXT,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        c.document_id,
+        c.chunk_index,
+        d.title,
+        d.source_url,
+        c.heading_path,
+        c.anchor,
+        c.content_text,
+        1 - (c.embedding <=> query_embedding) AS similarity
+    FROM document_chunks c
+    JOIN documents d ON d.id = c.document_id
+    WHERE c.tenant_id = query_tenant_id
+        AND c.embedding IS NOT NULL
+        AND 1 - (c.embedding <=> query_embedding) > match_threshold
+    ORDER BY c.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,75 @@
+-- Migration: 014_replace_document_chunks
+-- Description: Transactional chunk-set replacement that reuses stored vectors of unchanged passages
+-- Date: 2026-10-18
+
+-- Superseded by replace_document_chunks, which trims in the same transaction
+DROP FUNCTION IF EXISTS trim_document_chunks(UUID[], INT[]);
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_content_hash ON document_chunks(document_id, content_hash);
+
+-- Write the complete new chunk sets of several documents in one transaction.
+-- p_chunks rows carry document_id, chunk_index, tenant_id, app_id, heading_path,
+-- anchor, content_text, content_hash and embedding. A row without an embedding
+-- takes the stored vector of the same document's chunk with the same content_hash
+-- (a passage that only moved), or stays NULL. Chunks at or past each document's
+-- new count are deleted. Returns the number of vectors reused.
+CREATE OR REPLACE FUNCTION replace_document_chunks(
+    p_chunks JSONB,
+    p_document_ids UUID[],
+    p_chunk_counts INT[]
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    reused INT;
+BEGIN
+    -- Every part of the statement sees the chunks as they were before the insert
+    WITH incoming AS (
+        SELECT
+            i.*,
+            CASE WHEN i.embedding IS NULL THEN (
+                SELECT c.embedding
+                FROM document_chunks c
+                WHERE c.document_id = i.document_id
+                    AND c.content_hash = i.content_hash
+                    AND c.embedding IS NOT NULL
+                LIMIT 1
+            ) END AS previous_embedding
+        FROM jsonb_to_recordset(p_chunks) AS i(
+            document_id UUID,
+            chunk_index INT,
+            tenant_id UUID,
+            app_id UUID,
+            heading_path TEXT[],
+            anchor TEXT,
+            content_text TEXT,
+            content_hash TEXT,
+            embedding vector
+        )
+    ), written AS (
+        INSERT INTO document_chunks (
+            document_id, chunk_index, tenant_id, app_id, heading_path, anchor, content_text, content_hash, embedding
+        )
+        SELECT
+            document_id, chunk_index, tenant_id, app_id, COALESCE(heading_path, '{}'), anchor, content_text, content_hash,
+            COALESCE(embedding, previous_embedding)
+        FROM incoming
+        ON CONFLICT (document_id, chunk_index) DO UPDATE SET
+            heading_path = EXCLUDED.heading_path,
+            anchor = EXCLUDED.anchor,
+            content_text = EXCLUDED.content_text,
+            content_hash = EXCLUDED.content_hash,
+            embedding = EXCLUDED.embedding
+        RETURNING 1
+    )
+    SELECT COUNT(*) FILTER (WHERE previous_embedding IS NOT NULL) INTO reused FROM incoming;
+
+    DELETE FROM document_chunks c
+    USING unnest(p_document_ids, p_chunk_counts) AS t(document_id, chunk_count)
+    WHERE c.document_id = t.document_id
+        AND c.chunk_index >= t.chunk_count;
+
+    RETURN reused;
+END;
+$$;
@@ -0,0 +1,236 @@
+-- Migration: 015_create_embedding_queue
+-- Description: Table-backed embedding work queue drained by embedding workers, and a backfill of missing or stale embeddings
+-- Date: 2026-10-18
+
+-- content_hash the stored document embedding was computed from; a mismatch means the vector is stale
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS embedding_hash TEXT;
+
+-- Embeddings written before this column existed were computed from the stored content
+UPDATE documents
+SET embedding_hash = content_hash
+WHERE embedding IS NOT NULL AND embedding_hash IS NULL;
+
+-- One work item per embedding target: the document itself (chunk_index = -1) or one of its chunks.
+-- Re-enqueueing a target replaces its item, so only the latest content_hash is ever embedded.
+CREATE TABLE IF NOT EXISTS embedding_queue (
+    document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL DEFAULT -1,
+    tenant_id UUID NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    content_hash TEXT NOT NULL,  -- Hash of the content to embed; stale items are dropped, not embedded
+
+    -- Claiming
+    attempts INTEGER NOT NULL DEFAULT 0,  -- Failed tries (rate limits do not count)
+    available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),  -- Retry / backoff time
+    worker_id TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    last_error TEXT,
+
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (document_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_embedding_queue_available ON embedding_queue(available_at);
+
+ALTER TABLE embedding_queue ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role can manage embedding queue"
+    ON embedding_queue
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+-- Add or replace work items (document_id, chunk_index, tenant_id, content_hash); they become available immediately
+CREATE OR REPLACE FUNCTION enqueue_embedding_work(p_items JSONB)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    queued INT;
+BEGIN
+    INSERT INTO embedding_queue (document_id, chunk_index, tenant_id, content_hash)
+    SELECT i.document_id, i.chunk_index, i.tenant_id, i.content_hash
+    FROM jsonb_to_recordset(p_items) AS i(document_id UUID, chunk_index INT, tenant_id UUID, content_hash TEXT)
+    ON CONFLICT ON CONSTRAINT embedding_queue_pkey DO UPDATE SET
+        content_hash = EXCLUDED.content_hash,
+        attempts = 0,
+        available_at = NOW(),
+        worker_id = NULL,
+        lease_expires_at = NULL,
+        last_error = NULL;
+    GET DIAGNOSTICS queued = ROW_COUNT;
+    RETURN queued;
+END;
+$$;
+
+-- Lease up to p_limit available items with the text to embed.
+-- SKIP LOCKED lets any number of workers call this concurrently without double-claiming.
+-- current_hash is the target's hash now; when it differs from content_hash (or the
+-- target is gone) the item is obsolete and the worker just completes it.
+CREATE OR REPLACE FUNCTION claim_embedding_work(
+    p_worker_id TEXT,
+    p_limit INT DEFAULT 100,
+    p_lease_seconds INT DEFAULT 300,
+    p_max_attempts INT DEFAULT 5
+)
+RETURNS TABLE (
+    document_id UUID,
+    chunk_index INT,
+    content_hash TEXT,
+    attempts INT,
+    current_hash TEXT,
+    title TEXT,
+    heading_path TEXT[],
+    content_text TEXT
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    RETURN QUERY
+    WITH claimed AS (
+        UPDATE embedding_queue q
+        SET worker_id = p_worker_id,
+            lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+        WHERE (q.document_id, q.chunk_index) IN (
+            SELECT e.document_id, e.chunk_index
+            FROM embedding_queue e
+            WHERE e.available_at <= NOW()
+                AND (e.lease_expires_at IS NULL OR e.lease_expires_at < NOW())
+                AND e.attempts < p_max_attempts
+            ORDER BY e.available_at
+            FOR UPDATE SKIP LOCKED
+            LIMIT p_limit
+        )
+        RETURNING q.document_id, q.chunk_index, q.content_hash, q.attempts
+    )
+    SELECT
+        w.document_id,
+        w.chunk_index,
+        w.content_hash,
+        w.attempts,
+        CASE WHEN w.chunk_index < 0 THEN d.content_hash ELSE c.content_hash END,
+        d.title,
+        c.heading_path,
+        CASE WHEN w.chunk_index < 0 THEN d.content_text ELSE c.content_text END
+    FROM claimed w
+    LEFT JOIN documents d ON d.id = w.document_id
+    LEFT JOIN document_chunks c ON c.document_id = w.document_id AND c.chunk_index = w.chunk_index;
+END;
+$$;
+
+-- Store finished vectors and remove their items in one transaction. A vector is only written
+-- if its target still has the hash it was computed from; items re-enqueued with a newer hash stay.
+-- Items in p_items without an embedding are obsolete and are just removed.
+CREATE OR REPLACE FUNCTION complete_embedding_work(p_items JSONB)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    stored INT;
+    chunks_stored INT;
+BEGIN
+    UPDATE documents d
+    SET embedding = i.embedding,
+        embedding_hash = i.content_hash
+    FROM jsonb_to_recordset(p_items) AS i(document_id UUID, chunk_index INT, content_hash TEXT, embedding vector)
+    WHERE i.chunk_index < 0
+        AND i.embedding IS NOT NULL
+        AND d.id = i.document_id
+        AND d.content_hash = i.content_hash;
+    GET DIAGNOSTICS stored = ROW_COUNT;
+
+    UPDATE document_chunks c
+    SET embedding = i.embedding
+    FROM jsonb_to_recordset(p_items) AS i(document_id UUID, chunk_index INT, content_hash TEXT, embedding vector)
+    WHERE i.chunk_index >= 0
+        AND i.embedding IS NOT NULL
+        AND c.document_id = i.document_id
+        AND c.chunk_index = i.chunk_index
+        AND c.content_hash = i.content_hash;
+    GET DIAGNOSTICS chunks_stored = ROW_COUNT;
+
+    DELETE FROM embedding_queue q
+    USING jsonb_to_recordset(p_items) AS i(document_id UUID, chunk_index INT, content_hash TEXT)
+    WHERE q.document_id = i.document_id
+        AND q.chunk_index = i.chunk_index
+        AND q.content_hash = i.content_hash;
+
+    RETURN stored + chunks_stored;
+END;
+$$;
+
+-- Hand leased items back. Provider failures count an attempt and back off exponentially from
+-- p_retry_seconds (capped at an hour); rate limits (p_count_attempt = FALSE) retry after p_retry_seconds.
+CREATE OR REPLACE FUNCTION fail_embedding_work(
+    p_items JSONB,
+    p_error TEXT,
+    p_retry_seconds INT,
+    p_count_attempt BOOLEAN DEFAULT TRUE
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE embedding_queue q
+    SET attempts = q.attempts + CASE WHEN p_count_attempt THEN 1 ELSE 0 END,
+        available_at = NOW() + make_interval(secs => CASE
+            WHEN p_count_attempt THEN LEAST(p_retry_seconds * power(2, q.attempts), 3600)
+            ELSE p_retry_seconds
+        END),
+        worker_id = NULL,
+        lease_expires_at = NULL,
+        last_error = p_error
+    FROM jsonb_to_recordset(p_items) AS i(document_id UUID, chunk_index INT)
+    WHERE q.document_id = i.document_id
+        AND q.chunk_index = i.chunk_index;
+END;
+$$;
+
+-- Queue every document whose embedding is missing or stale and every chunk without one
+-- (optionally for one tenant or app). Items that ran out of attempts are revived.
+CREATE OR REPLACE FUNCTION enqueue_embedding_backfill(
+    p_tenant_id UUID DEFAULT NULL,
+    p_app_id UUID DEFAULT NULL,
+    p_limit INT DEFAULT 10000
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    documents_queued INT;
+    chunks_queued INT;
+BEGIN
+    INSERT INTO embedding_queue (document_id, chunk_index, tenant_id, content_hash)
+    SELECT d.id, -1, d.tenant_id, d.content_hash
+    FROM documents d
+    WHERE (p_tenant_id IS NULL OR d.tenant_id = p_tenant_id)
+        AND (p_app_id IS NULL OR d.app_id = p_app_id)
+        AND d.content_hash IS NOT NULL
+        AND (d.embedding IS NULL OR d.embedding_hash IS DISTINCT FROM d.content_hash)
+    LIMIT p_limit
+    ON CONFLICT ON CONSTRAINT embedding_queue_pkey DO UPDATE SET
+        content_hash = EXCLUDED.content_hash,
+        attempts = 0,
+        available_at = NOW(),
+        last_error = NULL
+    WHERE embedding_queue.lease_expires_at IS NULL OR embedding_queue.lease_expires_at < NOW();
+    GET DIAGNOSTICS documents_queued = ROW_COUNT;
+
+    INSERT INTO embedding_queue (document_id, chunk_index, tenant_id, content_hash)
+    SELECT c.document_id, c.chunk_index, c.tenant_id, c.content_hash
+    FROM document_chunks c
+    WHERE (p_tenant_id IS NULL OR c.tenant_id = p_tenant_id)
+        AND (p_app_id IS NULL OR c.app_id = p_app_id)
+        AND c.embedding IS NULL
+    LIMIT p_limit
+    ON CONFLICT ON CONSTRAINT embedding_queue_pkey DO UPDATE SET
+        content_hash = EXCLUDED.content_hash,
+        attempts = 0,
+        available_at = NOW(),
+        last_error = NULL
+    WHERE embedding_queue.lease_expires_at IS NULL OR embedding_queue.lease_expires_at < NOW();
+    GET DIAGNOSTICS chunks_queued = ROW_COUNT;
+
+    RETURN documents_queued + chunks_queued;
+END;
+$$;
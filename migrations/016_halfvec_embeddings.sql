@@ -0,0 +1,49 @@
+-- Migration: 016_halfvec_embeddings
+-- Description: Optional - store embeddings as half-precision halfvec (pgvector 0.7+), halving vector storage and index size
+-- Date: 2026-10-18
+
+-- Vectors are unit length, so float16's ~3 significant digits cost little recall:
+-- 1536 dims take 3 KB per row instead of 6 KB, for documents, passages and the cache.
+-- Clients keep sending and receiving the same "[...]" text, and the functions keep
+-- their vector(1536) parameters: vector casts implicitly to halfvec (but not back),
+-- so "embedding <=> query_embedding" resolves to the halfvec operator and uses the
+-- halfvec indexes below. Skip this migration on pgvector older than 0.7.
+
+-- The vector_cosine_ops indexes cannot be converted in place
+DROP INDEX IF EXISTS idx_documents_embedding;
+DROP INDEX IF EXISTS idx_document_chunks_embedding;
+
+ALTER TABLE documents
+    ALTER COLUMN embedding TYPE halfvec(1536) USING embedding::halfvec(1536);
+
+ALTER TABLE document_chunks
+    ALTER COLUMN embedding TYPE halfvec(1536) USING embedding::halfvec(1536);
+
+ALTER TABLE embedding_cache
+    ALTER COLUMN embedding TYPE halfvec USING embedding::halfvec;
+
+CREATE INDEX IF NOT EXISTS idx_documents_embedding ON documents
+    USING ivfflat (embedding halfvec_cosine_ops)
+    WITH (lists = 100);
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding ON document_chunks
+    USING ivfflat (embedding halfvec_cosine_ops)
+    WITH (lists = 100);
+
+-- RETURN QUERY needs the declared column type, which stays vector for callers
+CREATE OR REPLACE FUNCTION get_cached_embeddings(p_keys TEXT[])
+RETURNS TABLE (cache_key TEXT, embedding vector)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE embedding_cache c
+    SET last_used_at = NOW()
+    WHERE c.cache_key = ANY(p_keys)
+        AND c.last_used_at < NOW() - INTERVAL '1 hour';
+
+    RETURN QUERY
+    SELECT c.cache_key, c.embedding::vector
+    FROM embedding_cache c
+    WHERE c.cache_key = ANY(p_keys);
+END;
+$$;
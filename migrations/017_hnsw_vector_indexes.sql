@@ -0,0 +1,188 @@
+-- Migration: 017_hnsw_vector_indexes
+-- Description: HNSW indexes for document and passage embeddings, per-query ef_search / probes, and exact search for recall benchmarks
+-- Date: 2026-10-18
+
+-- The ivfflat indexes were built with lists = 100 on empty tables: their centroids
+-- describe no data, and recall drops as the tables grow. HNSW needs no training
+-- data, keeps its recall as rows are added, and is tuned per query with
+-- hnsw.ef_search (default 40) instead of a rebuild.
+--
+-- The build takes a write lock on the table. On large tables run it by hand
+-- outside a transaction instead, so crawls keep writing meanwhile:
+--   SET maintenance_work_mem = '2GB';
+--   CREATE INDEX CONCURRENTLY idx_documents_embedding_hnsw ON documents
+--       USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
+--   DROP INDEX CONCURRENTLY idx_documents_embedding;
+--   ALTER INDEX idx_documents_embedding_hnsw RENAME TO idx_documents_embedding;
+-- (halfvec_cosine_ops if migration 016 was applied; the same for document_chunks.)
+DO $$
+DECLARE
+    target RECORD;
+    ops TEXT;
+BEGIN
+    FOR target IN
+        SELECT * FROM (VALUES
+            ('documents', 'idx_documents_embedding'),
+            ('document_chunks', 'idx_document_chunks_embedding')
+        ) AS t(table_name, index_name)
+    LOOP
+        -- Match the column type: vector, or halfvec after migration 016
+        SELECT CASE WHEN t.typname = 'halfvec' THEN 'halfvec_cosine_ops' ELSE 'vector_cosine_ops' END
+        INTO ops
+        FROM pg_attribute a
+        JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = target.table_name::regclass
+            AND a.attname = 'embedding';
+
+        EXECUTE format('DROP INDEX IF EXISTS %I', target.index_name);
+        EXECUTE format(
+            'CREATE INDEX %I ON %I USING hnsw (embedding %s) WITH (m = 16, ef_construction = 64)',
+            target.index_name, target.table_name, ops
+        );
+    END LOOP;
+END;
+$$;
+
+-- New parameters change the signatures; drop the old ones so PostgREST sees one candidate
+DROP FUNCTION IF EXISTS search_documents(vector, UUID, FLOAT, INT);
+DROP FUNCTION IF EXISTS search_document_chunks(vector, UUID, FLOAT, INT);
+
+-- Set the ANN search knobs for the rest of this call's transaction. An HNSW scan returns
+-- at most ef_search rows, so ef_search is raised to match_count when it is lower.
+CREATE OR REPLACE FUNCTION set_vector_search_options(
+    match_count INT,
+    ef_search INT DEFAULT NULL,
+    probes INT DEFAULT NULL
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM set_config(
+        'hnsw.ef_search',
+        LEAST(GREATEST(COALESCE(ef_search, current_setting('hnsw.ef_search', true)::INT, 40), match_count), 1000)::TEXT,
+        true
+    );
+    IF probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', probes::TEXT, true);
+    END IF;
+END;
+$$;
+
+-- Semantic search; ef_search / probes trade latency for recall per query
+CREATE OR REPLACE FUNCTION search_documents(
+    query_embedding vector(1536),
+    query_tenant_id UUID,
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10,
+    ef_search INT DEFAULT NULL,
+    probes INT DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    content_text TEXT,
+    source_url TEXT,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM set_vector_search_options(match_count, ef_search, probes);
+
+    RETURN QUERY
+    SELECT
+        d.id,
+        d.title,
+        d.content_text,
+        d.source_url,
+        1 - (d.embedding <=> query_embedding) AS similarity
+    FROM documents d
+    WHERE d.tenant_id = query_tenant_id
+        AND d.embedding IS NOT NULL
+        AND 1 - (d.embedding <=> query_embedding) > match_threshold
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- Passage search: like search_documents, but returns the matching passage instead of the whole page
+CREATE OR REPLACE FUNCTION search_document_chunks(
+    query_embedding vector(1536),
+    query_tenant_id UUID,
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10,
+    ef_search INT DEFAULT NULL,
+    probes INT DEFAULT NULL
+)
+RETURNS TABLE (
+    document_id UUID,
+    chunk_index INT,
+    title TEXT,
+    source_url TEXT,
+    heading_path TEXT[],
+    anchor TEXT,
+    content_text TEXT,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM set_vector_search_options(match_count, ef_search, probes);
+
+    RETURN QUERY
+    SELECT
+        c.document_id,
+        c.chunk_index,
+        d.title,
+        d.source_url,
+        c.heading_path,
+        c.anchor,
+        c.content_text,
+        1 - (c.embedding <=> query_embedding) AS similarity
+    FROM document_chunks c
+    JOIN documents d ON d.id = c.document_id
+    WHERE c.tenant_id = query_tenant_id
+        AND c.embedding IS NOT NULL
+        AND 1 - (c.embedding <=> query_embedding) > match_threshold
+    ORDER BY c.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- Exact top-k for recall benchmarks: ordering by "distance + 0" keeps the planner off
+-- the ANN indexes, so this is a full scan of the tenant's vectors. Not for serving.
+-- chunk_index is -1 for documents, as in embedding_queue.
+CREATE OR REPLACE FUNCTION search_vectors_exact(
+    query_embedding vector(1536),
+    query_tenant_id UUID,
+    match_count INT DEFAULT 10,
+    passages BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (
+    document_id UUID,
+    chunk_index INT,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF passages THEN
+        RETURN QUERY
+        SELECT c.document_id, c.chunk_index, 1 - (c.embedding <=> query_embedding)
+        FROM document_chunks c
+        WHERE c.tenant_id = query_tenant_id
+            AND c.embedding IS NOT NULL
+        ORDER BY (c.embedding <=> query_embedding) + 0
+        LIMIT match_count;
+    ELSE
+        RETURN QUERY
+        SELECT d.id, -1, 1 - (d.embedding <=> query_embedding)
+        FROM documents d
+        WHERE d.tenant_id = query_tenant_id
+            AND d.embedding IS NOT NULL
+        ORDER BY (d.embedding <=> query_embedding) + 0
+        LIMIT match_count;
+    END IF;
+END;
+$$;
@@ -0,0 +1,242 @@
+-- Migration: 018_scoped_vector_search
+-- Description: Tenant- and app-scoped vector search: exact ranking for small scopes, iterative HNSW scans for large ones
+-- Date: 2026-10-18
+
+-- An ANN scan walks the whole platform's graph and filters tenant_id afterwards: a
+-- small tenant's rows are rarely among the ef_search candidates (few or no results),
+-- and every tenant pays for the others' vectors. Search now picks a plan per scope:
+--   * scopes of at most exact_max_rows vectors are read through the btree below
+--     and ranked exactly, so cost follows the scope's size and recall is 1.0;
+--   * larger scopes use the HNSW index with iterative scans (pgvector 0.8+), which
+--     keep walking the graph until match_count rows pass the tenant / app filter.
+CREATE INDEX IF NOT EXISTS idx_documents_tenant_app_embedded ON documents(tenant_id, app_id)
+    WHERE embedding IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_document_chunks_tenant_app_embedded ON document_chunks(tenant_id, app_id)
+    WHERE embedding IS NOT NULL;
+
+-- Set the ANN search knobs for the rest of this call's transaction (see migration 017).
+-- Iterative scans only exist from pgvector 0.8; older versions keep plain filtering.
+CREATE OR REPLACE FUNCTION set_vector_search_options(
+    match_count INT,
+    ef_search INT DEFAULT NULL,
+    probes INT DEFAULT NULL
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM set_config(
+        'hnsw.ef_search',
+        LEAST(GREATEST(COALESCE(ef_search, current_setting('hnsw.ef_search', true)::INT, 40), match_count), 1000)::TEXT,
+        true
+    );
+    IF probes IS NOT NULL THEN
+        PERFORM set_config('ivfflat.probes', probes::TEXT, true);
+    END IF;
+    IF (SELECT string_to_array(e.extversion, '.')::INT[] >= ARRAY[0, 8] FROM pg_extension e WHERE e.extname = 'vector') THEN
+        PERFORM set_config('hnsw.iterative_scan', 'strict_order', true);
+    END IF;
+END;
+$$;
+
+-- Signatures change again (app scope, app_id in the results)
+DROP FUNCTION IF EXISTS search_documents(vector, UUID, FLOAT, INT, INT, INT);
+DROP FUNCTION IF EXISTS search_document_chunks(vector, UUID, FLOAT, INT, INT, INT);
+DROP FUNCTION IF EXISTS search_vectors_exact(vector, UUID, INT, BOOLEAN);
+
+-- Semantic search within a tenant, optionally one application
+CREATE OR REPLACE FUNCTION search_documents(
+    query_embedding vector(1536),
+    query_tenant_id UUID,
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10,
+    ef_search INT DEFAULT NULL,
+    probes INT DEFAULT NULL,
+    query_app_id UUID DEFAULT NULL,
+    exact_max_rows INT DEFAULT 10000
+)
+RETURNS TABLE (
+    id UUID,
+    app_id UUID,
+    title TEXT,
+    content_text TEXT,
+    source_url TEXT,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    scope_rows INT;
+BEGIN
+    -- Counting stops at exact_max_rows + 1, so this costs at most that many index entries
+    SELECT COUNT(*) INTO scope_rows
+    FROM (
+        SELECT 1
+        FROM documents d
+        WHERE d.tenant_id = query_tenant_id
+            AND (query_app_id IS NULL OR d.app_id = query_app_id)
+            AND d.embedding IS NOT NULL
+        LIMIT exact_max_rows + 1
+    ) AS scope;
+
+    IF scope_rows <= exact_max_rows THEN
+        -- "+ 0" keeps the planner on the scope's btree instead of the platform-wide ANN index
+        RETURN QUERY
+        SELECT
+            d.id,
+            d.app_id,
+            d.title,
+            d.content_text,
+            d.source_url,
+            1 - (d.embedding <=> query_embedding) AS similarity
+        FROM documents d
+        WHERE d.tenant_id = query_tenant_id
+            AND (query_app_id IS NULL OR d.app_id = query_app_id)
+            AND d.embedding IS NOT NULL
+            AND 1 - (d.embedding <=> query_embedding) > match_threshold
+        ORDER BY (d.embedding <=> query_embedding) + 0
+        LIMIT match_count;
+        RETURN;
+    END IF;
+
+    PERFORM set_vector_search_options(match_count, ef_search, probes);
+
+    RETURN QUERY
+    SELECT
+        d.id,
+        d.app_id,
+        d.title,
+        d.content_text,
+        d.source_url,
+        1 - (d.embedding <=> query_embedding) AS similarity
+    FROM documents d
+    WHERE d.tenant_id = query_tenant_id
+        AND (query_app_id IS NULL OR d.app_id = query_app_id)
+        AND d.embedding IS NOT NULL
+        AND 1 - (d.embedding <=> query_embedding) > match_threshold
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- Passage search: like search_documents, but returns the matching passage instead of the whole page
+CREATE OR REPLACE FUNCTION search_document_chunks(
+    query_embedding vector(1536),
+    query_tenant_id UUID,
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 10,
+    ef_search INT DEFAULT NULL,
+    probes INT DEFAULT NULL,
+    query_app_id UUID DEFAULT NULL,
+    exact_max_rows INT DEFAULT 10000
+)
+RETURNS TABLE (
+    document_id UUID,
+    chunk_index INT,
+    app_id UUID,
+    title TEXT,
+    source_url TEXT,
+    heading_path TEXT[],
+    anchor TEXT,
+    content_text TEXT,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    scope_rows INT;
+BEGIN
+    SELECT COUNT(*) INTO scope_rows
+    FROM (
+        SELECT 1
+        FROM document_chunks c
+        WHERE c.tenant_id = query_tenant_id
+            AND (query_app_id IS NULL OR c.app_id = query_app_id)
+            AND c.embedding IS NOT NULL
+        LIMIT exact_max_rows + 1
+    ) AS scope;
+
+    IF scope_rows <= exact_max_rows THEN
+        RETURN QUERY
+        SELECT
+            c.document_id,
+            c.chunk_index,
+            c.app_id,
+            d.title,
+            d.source_url,
+            c.heading_path,
+            c.anchor,
+            c.content_text,
+            1 - (c.embedding <=> query_embedding) AS similarity
+        FROM document_chunks c
+        JOIN documents d ON d.id = c.document_id
+        WHERE c.tenant_id = query_tenant_id
+            AND (query_app_id IS NULL OR c.app_id = query_app_id)
+            AND c.embedding IS NOT NULL
+            AND 1 - (c.embedding <=> query_embedding) > match_threshold
+        ORDER BY (c.embedding <=> query_embedding) + 0
+        LIMIT match_count;
+        RETURN;
+    END IF;
+
+    PERFORM set_vector_search_options(match_count, ef_search, probes);
+
+    RETURN QUERY
+    SELECT
+        c.document_id,
+        c.chunk_index,
+        c.app_id,
+        d.title,
+        d.source_url,
+        c.heading_path,
+        c.anchor,
+        c.content_text,
+        1 - (c.embedding <=> query_embedding) AS similarity
+    FROM document_chunks c
+    JOIN documents d ON d.id = c.document_id
+    WHERE c.tenant_id = query_tenant_id
+        AND (query_app_id IS NULL OR c.app_id = query_app_id)
+        AND c.embedding IS NOT NULL
+        AND 1 - (c.embedding <=> query_embedding) > match_threshold
+    ORDER BY c.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+-- Exact top-k for recall benchmarks (see migration 017), now optionally for one application
+CREATE OR REPLACE FUNCTION search_vectors_exact(
+    query_embedding vector(1536),
+    query_tenant_id UUID,
+    match_count INT DEFAULT 10,
+    passages BOOLEAN DEFAULT FALSE,
+    query_app_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    document_id UUID,
+    chunk_index INT,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF passages THEN
+        RETURN QUERY
+        SELECT c.document_id, c.chunk_index, 1 - (c.embedding <=> query_embedding)
+        FROM document_chunks c
+        WHERE c.tenant_id = query_tenant_id
+            AND (query_app_id IS NULL OR c.app_id = query_app_id)
+            AND c.embedding IS NOT NULL
+        ORDER BY (c.embedding <=> query_embedding) + 0
+        LIMIT match_count;
+    ELSE
+        RETURN QUERY
+        SELECT d.id, -1, 1 - (d.embedding <=> query_embedding)
+        FROM documents d
+        WHERE d.tenant_id = query_tenant_id
+            AND (query_app_id IS NULL OR d.app_id = query_app_id)
+            AND d.embedding IS NOT NULL
+        ORDER BY (d.embedding <=> query_embedding) + 0
+        LIMIT match_count;
+    END IF;
+END;
+$$;
@@ -0,0 +1,15 @@
+-- Migration: 019_add_outlinks_hash
+-- Description: Store a fingerprint of each document's outlinks so the crawl manifest need not load the links themselves
+-- Date: 2026-10-18
+
+-- sha256 of the distinct links sorted by code point and joined with newlines
+-- (crawler.outlinks_hash); the crawler compares it to decide whether a page's
+-- links changed and only reads outlinks when a 304 page's links are followed.
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS outlinks_hash TEXT;
+
+UPDATE documents d
+SET outlinks_hash = encode(sha256(convert_to(COALESCE((
+    SELECT string_agg(link, E'\n' ORDER BY link COLLATE "C")
+    FROM (SELECT DISTINCT jsonb_array_elements_text(COALESCE(d.outlinks, '[]'::JSONB)) AS link) AS links
+), ''), 'UTF8')), 'hex')
+WHERE d.outlinks_hash IS NULL;